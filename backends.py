@@ -0,0 +1,809 @@
+"""
+Model Backends - Shared generation interface for all three projects
+
+Every backend turns a batch of prompts into completions with token usage:
+
+    completions = backend.generate(prompts)
+
+Implementations:
+- MockBackend: answers from a project's canned mock tables (no model, no network)
+- OpenAICompatibleBackend: any OpenAI-compatible chat completions endpoint,
+  with token-bucket rate limiting, exponential-backoff retries and timeouts
+- HuggingFaceBackend: a local causal LM loaded through logit_lens.get_model
+
+Each backend declares `batch_size` (prompts per generate call) and
+`max_concurrency` (generate calls in flight). `generate_all` uses both, so one
+scheduler drives any backend at full throughput.
+
+The projects import this module by adding the repository root to sys.path.
+"""
+
+import asyncio
+import email.utils
+import json
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+LOGIT_LENS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project2-logit-lens")
+
+
+# ============================================================================
+# BACKEND PROTOCOL
+# ============================================================================
+
+@dataclass
+class Completion:
+    """
+    One generated answer and what it cost.
+    
+    Times are seconds from when the prompt was handed to the backend, so
+    `latency` includes `queue_wait`: waiting for rate limits, concurrency or
+    batch slots, and any failed attempts before the one that answered.
+    """
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0  # Until the whole answer was back
+    error: Optional[str] = None  # Set when the call failed permanently
+    metadata: Dict = field(default_factory=dict)  # Backend-specific extras, e.g. mock correctness
+    time_to_first_token: Optional[float] = None  # None when the backend cannot observe it
+    queue_wait: float = 0.0  # Before the model started on this prompt
+    retries: int = 0
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class Backend:
+    """
+    Base class for model backends.
+    
+    Subclasses implement `generate` (blocking) and may override `agenerate`
+    when they have a native asyncio implementation.
+    """
+    
+    name = "backend"
+    batch_size = 1  # Prompts per generate() call
+    max_concurrency = 1  # generate() calls in flight at once
+    model_name = ""
+    
+    def generate(self, prompts: List[str]) -> List[Completion]:
+        """
+        Generates one completion per prompt.
+        
+        Failed calls come back as completions with `error` set rather than
+        raising, so one bad prompt does not lose the rest of its batch.
+        """
+        raise NotImplementedError
+    
+    async def agenerate(self, prompts: List[str]) -> List[Completion]:
+        """Runs `generate` on a worker thread so the event loop stays free."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.generate, prompts)
+    
+    def close(self):
+        pass
+
+
+async def generate_all(backend: Backend, prompts: List[str],
+                       on_complete: Optional[Callable[[int, Completion], None]] = None) -> List[Completion]:
+    """
+    Generates completions for any number of prompts at the backend's throughput.
+    
+    Prompts are split into chunks of `backend.batch_size`, and up to
+    `backend.max_concurrency` chunks run at once.
+    
+    Args:
+        backend: The backend to drive
+        prompts: All prompts, in any order
+        on_complete: Called with (prompt index, completion) as each result arrives
+    
+    Returns:
+        One completion per prompt, in prompt order
+    """
+    completions: List[Optional[Completion]] = [None] * len(prompts)
+    semaphore = asyncio.Semaphore(backend.max_concurrency)
+    
+    async def run_chunk(start: int):
+        async with semaphore:
+            chunk = await backend.agenerate(prompts[start:start + backend.batch_size])
+        for offset, completion in enumerate(chunk):
+            completions[start + offset] = completion
+            if on_complete is not None:
+                on_complete(start + offset, completion)
+    
+    await asyncio.gather(*(run_chunk(start) for start in range(0, len(prompts), backend.batch_size)))
+    return completions
+
+
+def run_all(backend: Backend, prompts: List[str]) -> List[Completion]:
+    """Blocking wrapper around `generate_all` for scripts without an event loop."""
+    return asyncio.run(generate_all(backend, prompts))
+
+
+# ============================================================================
+# MOCK BACKEND
+# ============================================================================
+
+class MockBackend(Backend):
+    """
+    Answers every prompt with a project-supplied function over its mock tables.
+    
+    Prompts are answered in order on the calling thread, so mocks that draw
+    from a seeded `random` stay reproducible.
+    
+    Mock answers take no time, so their timings are simulated (not slept):
+    `time_to_first_token` plus `seconds_per_token` per completion token,
+    unless the respond function set a latency itself. Every completion is
+    marked with `metadata["simulated"]`, so reports do not mix these
+    timings with wall-clock time.
+    """
+    
+    name = "mock"
+    batch_size = 64
+    
+    def __init__(self, respond: Callable[[str], Completion], model_name: str = "mock",
+                 time_to_first_token: float = 0.0, seconds_per_token: float = 0.0):
+        self.respond = respond
+        self.model_name = model_name
+        self.time_to_first_token = time_to_first_token
+        self.seconds_per_token = seconds_per_token
+    
+    def generate(self, prompts: List[str]) -> List[Completion]:
+        completions = [self.respond(prompt) for prompt in prompts]
+        for completion in completions:
+            completion.metadata["simulated"] = True
+            if completion.latency == 0.0 and completion.time_to_first_token is None:
+                completion.time_to_first_token = self.time_to_first_token
+                completion.latency = self.time_to_first_token + self.seconds_per_token * completion.completion_tokens
+        return completions
+    
+    async def agenerate(self, prompts: List[str]) -> List[Completion]:
+        return self.generate(prompts)
+
+
+# ============================================================================
+# OPENAI-COMPATIBLE HTTP BACKEND
+# ============================================================================
+
+class APIError(Exception):
+    """An API call that failed, with enough detail to decide on a retry."""
+    
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self._retryable = retryable
+    
+    @property
+    def retryable(self) -> bool:
+        if self._retryable is not None:
+            return self._retryable
+        # No status means a network error or timeout
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header, given either as seconds or as an HTTP date.
+    
+    Returns:
+        Seconds to wait (never negative), or None if missing or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)  # HTTP dates are always GMT
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _usage_tokens(usage: Optional[Dict]) -> Tuple[int, int]:
+    """Prompt and completion tokens from a usage block; a missing block counts as 0 tokens."""
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens")
+    if completion_tokens is None:
+        completion_tokens = max(0, (usage.get("total_tokens") or prompt_tokens) - prompt_tokens)
+    return prompt_tokens, completion_tokens
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for one per-minute budget.
+    
+    The bucket starts full and refills continuously at `per_minute / 60` units
+    per second. `acquire` waits until the requested amount is available, and
+    waiters are served in arrival order.
+    """
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self, amount: float):
+        amount = min(amount, self.capacity)  # A single oversized call must not wait forever
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+    
+    def adjust(self, amount: float):
+        """Debits (or refunds, if negative) the difference between a reservation and real usage."""
+        self._refill()
+        self.available = min(self.capacity, self.available - amount)
+
+
+class OpenAICompatibleBackend(Backend):
+    """
+    Chat completions over HTTP against any OpenAI-compatible endpoint.
+    
+    Calls run concurrently under a concurrency limit, request/token rate
+    limits, per-call timeouts and exponential-backoff retries. Blocking HTTP
+    calls run on a dedicated thread pool sized to the concurrency limit, so
+    no extra dependencies are needed.
+    
+    With `stream`, answers are read as server-sent events, which is the only
+    way to observe time to first token; otherwise the whole answer arrives
+    at once and `time_to_first_token` is left unset.
+    """
+    
+    name = "openai"
+    
+    def __init__(self, api_base: str = "https://api.openai.com/v1", api_key: str = "",
+                 model_name: str = "gpt-3.5-turbo", temperature: float = 0.7,
+                 max_tokens: Optional[int] = None, max_concurrency: int = 16,
+                 requests_per_minute: float = 500, tokens_per_minute: float = 90000,
+                 estimated_completion_tokens: int = 150, max_retries: int = 5,
+                 retry_base_delay: float = 1.0, retry_max_delay: float = 30.0, timeout: float = 60.0,
+                 stream: bool = False):
+        self.api_base = api_base
+        self.api_key = api_key
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_concurrency = max_concurrency
+        self.estimated_completion_tokens = estimated_completion_tokens
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.timeout = timeout
+        self.stream = stream
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.retries = 0
+        self._loop = None
+        self._semaphore = None
+    
+    def _bind_loop(self):
+        """Recreates loop-bound primitives when called from a new event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.request_bucket._lock = asyncio.Lock()
+            self.token_bucket._lock = asyncio.Lock()
+    
+    def _post(self, prompt: str) -> Completion:
+        """
+        Sends one chat completion request (blocking).
+        
+        Raises:
+            APIError: On HTTP errors, network errors, timeouts and malformed
+                response bodies
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature
+        }
+        if self.max_tokens is not None:
+            payload["max_tokens"] = self.max_tokens
+        if self.stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        request = urllib.request.Request(
+            f"{self.api_base.rstrip('/')}/chat/completions",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        )
+        
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                if self.stream:
+                    return self._read_stream(response, start)
+                raw = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            raise APIError(
+                f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')[:200]}",
+                status=e.code,
+                retry_after=parse_retry_after(e.headers.get("Retry-After") if e.headers else None)
+            )
+        except (urllib.error.URLError, OSError) as e:
+            raise APIError(f"Request failed: {e}")
+        
+        try:
+            body = json.loads(raw.decode("utf-8"))
+            text = body["choices"][0]["message"]["content"] or ""
+            prompt_tokens, completion_tokens = _usage_tokens(body.get("usage"))
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            raise APIError(f"Malformed response ({type(e).__name__}): {raw[:200].decode('utf-8', 'replace')}",
+                           status=status)
+        return Completion(
+            text=text,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=time.perf_counter() - start
+        )
+    
+    def _read_stream(self, response, start: float) -> Completion:
+        """
+        Reads a server-sent event stream of chat completion chunks.
+        
+        Raises:
+            APIError: If a chunk is not valid JSON of the expected shape
+        """
+        parts = []
+        first_token = None
+        usage = None
+        for line in response:
+            line = line.decode("utf-8", "replace").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+                for choice in chunk.get("choices") or []:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(content)
+                usage = chunk.get("usage") or usage
+            except (ValueError, TypeError, AttributeError) as e:
+                raise APIError(f"Malformed stream chunk ({type(e).__name__}): {data[:200]}", status=response.status)
+        
+        prompt_tokens, completion_tokens = _usage_tokens(usage)
+        return Completion(
+            text="".join(parts),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=time.perf_counter() - start,
+            time_to_first_token=first_token
+        )
+    
+    def _backoff_delay(self, attempt: int, error: APIError) -> float:
+        if error.retry_after is not None:
+            return min(error.retry_after, self.retry_max_delay)
+        delay = min(self.retry_base_delay * 2 ** attempt, self.retry_max_delay)
+        return delay * (0.5 + random.random() / 2)  # Jitter spreads out synchronized retries
+    
+    async def _call(self, prompt: str) -> Completion:
+        """
+        Sends one prompt, retrying transient failures.
+        
+        The returned completion's times run from this call. `queue_wait` is
+        everything before the successful attempt started: rate-limit and
+        concurrency waits, failed attempts and backoff.
+        
+        Never raises: a call that cannot succeed comes back as a completion
+        with `error` set, so one bad reply cannot abort a whole batch.
+        """
+        loop = asyncio.get_running_loop()
+        reserved = len(prompt) // 4 + self.estimated_completion_tokens  # ~4 characters per token
+        submitted = time.perf_counter()
+        queue_wait = 0.0
+        
+        for attempt in range(self.max_retries + 1):
+            waiting = time.perf_counter()
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(reserved)
+            try:
+                async with self._semaphore:
+                    attempt_start = time.perf_counter()
+                    queue_wait += attempt_start - waiting
+                    completion = await asyncio.wait_for(
+                        loop.run_in_executor(self.executor, self._post, prompt),
+                        timeout=self.timeout
+                    )
+                self.token_bucket.adjust(completion.total_tokens - reserved)
+                if completion.time_to_first_token is not None:
+                    completion.time_to_first_token += attempt_start - submitted
+                completion.latency = time.perf_counter() - submitted
+                completion.queue_wait = attempt_start - submitted  # Includes failed attempts and backoff
+                completion.retries = attempt
+                return completion
+            except asyncio.TimeoutError:
+                error = APIError(f"Timed out after {self.timeout:.0f}s")
+            except APIError as e:
+                error = e
+            except Exception as e:
+                error = APIError(f"Unexpected {type(e).__name__}: {e}", retryable=False)
+            
+            # A failed call used no tokens
+            self.token_bucket.adjust(-reserved)
+            if not error.retryable or attempt == self.max_retries:
+                return Completion(text="", error=str(error), latency=time.perf_counter() - submitted,
+                                  queue_wait=queue_wait, retries=attempt)
+            self.retries += 1
+            await asyncio.sleep(self._backoff_delay(attempt, error))
+    
+    async def agenerate(self, prompts: List[str]) -> List[Completion]:
+        self._bind_loop()
+        return list(await asyncio.gather(*(self._call(prompt) for prompt in prompts)))
+    
+    def generate(self, prompts: List[str]) -> List[Completion]:
+        return asyncio.run(self.agenerate(prompts))
+    
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# ============================================================================
+# LOCAL HUGGING FACE BACKEND
+# ============================================================================
+
+def _import_logit_lens():
+    """Imports project2's logit_lens, whose model registry loads local models."""
+    if LOGIT_LENS_DIR not in sys.path:
+        sys.path.insert(0, LOGIT_LENS_DIR)
+    import logit_lens
+    return logit_lens
+
+
+def _cache_layers(past_key_values) -> List[Tuple]:
+    """Returns a KV cache as one (keys, values) pair per layer, whatever its format."""
+    if isinstance(past_key_values, (tuple, list)):
+        return [(layer[0], layer[1]) for layer in past_key_values]
+    if hasattr(past_key_values, "layers"):  # transformers >= 4.56
+        return [(layer.keys, layer.values) for layer in past_key_values.layers]
+    return list(zip(past_key_values.key_cache, past_key_values.value_cache))
+
+
+def _build_cache(layers: List[Tuple]):
+    """Wraps (keys, values) pairs, shaped (batch, heads, length, head_dim), in a DynamicCache."""
+    from transformers import DynamicCache
+    
+    cache = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(layers):
+        cache.update(keys, values, layer_idx)
+    return cache
+
+
+def _error_completion(error: Exception) -> Completion:
+    """Returns an empty completion recording why a local generation failed."""
+    return Completion(text="", error=f"{type(error).__name__}: {error}")
+
+
+def _pad_left(tensor, length: int, dim: int):
+    """Left-pads a tensor with zeros along `dim` up to `length`."""
+    import torch
+    
+    missing = length - tensor.shape[dim]
+    if missing == 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class HuggingFaceBackend(Backend):
+    """
+    Generates with a local causal LM on CPU using continuous batching.
+    
+    The model comes from logit_lens's process-wide registry, so it is loaded
+    once and shared with any logit lens analysis in the same process.
+    
+    Up to `max_batch_size` sequences decode together, one token per forward
+    pass on top of a shared KV cache. Prompts of different lengths are
+    left-padded, with explicit position IDs so padding never shifts GPT-2's
+    absolute positions. Each sequence stops on its own EOS or
+    `max_new_tokens`; finished rows are dropped from the batch and cache at
+    once, and queued prompts are prefilled and merged into the free slots.
+    Token throughput is tracked in `generated_tokens` / `generation_seconds`.
+    
+    `generate_shared_prefix` answers many prompts that start with the same
+    text: the prefix is encoded once and its KV cache is shared by every
+    row, so only each prompt's own suffix is prefilled. Prefilled prompt
+    tokens are counted in `prefilled_tokens`.
+    
+    Failures come back as completions with `error` set. If a batch fails
+    (e.g. out of memory), its unfinished prompts are retried one at a time,
+    so only the prompts that fail on their own are lost.
+    """
+    
+    name = "local"
+    batch_size = 256  # Prompts queued per generate() call; the engine batches them internally
+    
+    def __init__(self, model_name: Optional[str] = None, dtype: Optional[str] = None,
+                 max_new_tokens: int = 128, temperature: float = 0.0, max_batch_size: int = 8):
+        self.model_name = model_name or _import_logit_lens().MODEL_NAME
+        self.dtype = dtype
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = 1  # torch already spreads one batch over every core
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+        self.prefilled_tokens = 0
+    
+    @property
+    def tokens_per_second(self) -> float:
+        """Generated tokens per second of wall-clock generation time so far."""
+        return self.generated_tokens / self.generation_seconds if self.generation_seconds > 0 else 0.0
+    
+    def _next_tokens(self, logits):
+        """Greedy decoding at temperature 0, sampling otherwise."""
+        import torch
+        
+        if self.temperature <= 0:
+            return logits.argmax(dim=-1)
+        probs = torch.softmax(logits.float() / self.temperature, dim=-1)
+        return torch.multinomial(probs, 1).squeeze(-1)
+    
+    def _prefill(self, model, token_id_lists: List[List[int]], pad_id: int, device: str,
+                 prefix_layers: Optional[List[Tuple]] = None):
+        """
+        Runs left-padded prompts through the model.
+        
+        With `prefix_layers` (the KV cache of one shared prefix), the prompts
+        are suffixes: the prefix cache is repeated for every row and the
+        padding sits between prefix and suffix, masked out.
+        
+        Returns:
+            tuple: (next token per row, KV cache layers, attention mask)
+        """
+        import torch
+        
+        max_len = max(len(ids) for ids in token_id_lists)
+        input_ids = torch.full((len(token_id_lists), max_len), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(token_id_lists), max_len), dtype=torch.long)
+        for row, ids in enumerate(token_id_lists):
+            input_ids[row, max_len - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, max_len - len(ids):] = 1
+        past_key_values = None
+        if prefix_layers is not None:
+            rows = len(token_id_lists)
+            attention_mask = torch.cat([attention_mask.new_ones((rows, prefix_layers[0][0].shape[2])), attention_mask], dim=1)
+            past_key_values = _build_cache([
+                (k.expand(rows, -1, -1, -1).contiguous(), v.expand(rows, -1, -1, -1).contiguous())
+                for k, v in prefix_layers
+            ])
+        position_ids = (attention_mask.cumsum(dim=1) - 1).clamp(min=0)[:, -max_len:]
+        self.prefilled_tokens += sum(len(ids) for ids in token_id_lists)
+        
+        output = model(
+            input_ids.to(device),
+            attention_mask=attention_mask.to(device),
+            position_ids=position_ids.to(device),
+            past_key_values=past_key_values,
+            use_cache=True
+        )
+        return self._next_tokens(output.logits[:, -1]), _cache_layers(output.past_key_values), attention_mask.to(device)
+    
+    def _load(self):
+        """Returns (model, tokenizer, device, context length) from logit_lens's registry."""
+        logit_lens = _import_logit_lens()
+        model, tokenizer = logit_lens.get_model(self.model_name, dtype=self.dtype)
+        max_positions = getattr(model.config, "n_positions", None) or model.config.max_position_embeddings
+        return model, tokenizer, logit_lens.DEVICE, max_positions
+    
+    def generate(self, prompts: List[str]) -> List[Completion]:
+        try:
+            model, tokenizer, device, max_positions = self._load()
+            token_id_lists = [tokenizer.encode(prompt)[-(max_positions - 1):] for prompt in prompts]
+        except Exception as e:
+            return [_error_completion(e) for _ in prompts]
+        return self._decode(model, tokenizer, device, max_positions, token_id_lists)
+    
+    def generate_shared_prefix(self, prefix: str, suffixes: List[str]) -> List[Completion]:
+        """
+        Completes `prefix + suffix` for every suffix, encoding the prefix once.
+        
+        The prefix and each suffix are tokenized separately. A suffix whose
+        tokens differ from those of the whole prompt (BPE merged across the
+        join) is generated from the whole prompt instead, without the cache.
+        
+        Args:
+            prefix: Text shared by every prompt
+            suffixes: The rest of each prompt
+            
+        Returns:
+            One completion per suffix; prompt tokens include the prefix. An
+            empty suffix, or one that overflows the context, gets an error
+        """
+        completions: List[Optional[Completion]] = [None] * len(suffixes)
+        try:
+            model, tokenizer, device, max_positions = self._load()
+            prefix_ids = tokenizer.encode(prefix)
+            suffix_id_lists = [tokenizer.encode(suffix) for suffix in suffixes]
+            joint_id_lists = [tokenizer.encode(prefix + suffix) for suffix in suffixes]
+            if not prefix_ids:
+                raise ValueError("The shared prefix must encode to at least one token")
+            import torch
+            
+            start = time.perf_counter()
+            with torch.no_grad():
+                output = model(torch.tensor([prefix_ids], device=device), use_cache=True)
+            self.prefilled_tokens += len(prefix_ids)
+            self.generation_seconds += time.perf_counter() - start
+        except Exception as e:
+            return [_error_completion(e) for _ in suffixes]
+        
+        valid, unshared = [], []
+        for i, ids in enumerate(suffix_id_lists):
+            if not ids:
+                completions[i] = Completion("", error="The suffix must encode to at least one token")
+            elif joint_id_lists[i] != prefix_ids + ids:
+                unshared.append(i)
+            elif len(prefix_ids) + len(ids) >= max_positions:
+                completions[i] = Completion("", error=f"Prefix plus suffix exceeds the model's {max_positions}-token context")
+            else:
+                valid.append(i)
+        decoded = self._decode(model, tokenizer, device, max_positions, [suffix_id_lists[i] for i in valid],
+                               prefix_layers=_cache_layers(output.past_key_values))
+        if unshared:
+            decoded += self._decode(model, tokenizer, device, max_positions,
+                                    [joint_id_lists[i][-(max_positions - 1):] for i in unshared])
+        for i, completion in zip(valid + unshared, decoded):
+            completions[i] = completion
+        return completions
+    
+    def _decode(self, model, tokenizer, device: str, max_positions: int, token_id_lists: List[List[int]],
+                prefix_layers: Optional[List[Tuple]] = None) -> List[Completion]:
+        """
+        Runs the continuous batching loop over encoded prompts (or suffixes
+        of one cached prefix).
+        
+        If the batch fails, its unfinished prompts are retried alone; a
+        prompt that fails by itself comes back with `error` set.
+        """
+        completions: List[Optional[Completion]] = [None] * len(token_id_lists)
+        failure = None
+        start = time.perf_counter()
+        try:
+            self._decode_batch(model, tokenizer, device, max_positions, token_id_lists, prefix_layers, completions)
+        except Exception as e:
+            failure = e
+        self.generation_seconds += time.perf_counter() - start
+        
+        if failure is not None:
+            unfinished = [i for i, completion in enumerate(completions) if completion is None]
+            for i in unfinished:
+                if len(token_id_lists) == 1:
+                    completions[i] = _error_completion(failure)
+                else:
+                    completions[i] = self._decode(model, tokenizer, device, max_positions, [token_id_lists[i]],
+                                                  prefix_layers)[0]
+        return completions
+    
+    def _decode_batch(self, model, tokenizer, device: str, max_positions: int, token_id_lists: List[List[int]],
+                      prefix_layers: Optional[List[Tuple]], completions: List[Optional[Completion]]):
+        """Continuous batching loop; fills `completions` in place as rows finish."""
+        import torch
+        
+        eos_id = tokenizer.eos_token_id
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else eos_id
+        prefix_len = prefix_layers[0][0].shape[2] if prefix_layers is not None else 0
+        queue = deque(range(len(token_id_lists)))
+        
+        # Per active row: prompt index, generated tokens and time to first token
+        rows: List[int] = []
+        generated: List[List[int]] = []
+        first_token: List[float] = []
+        admitted_after: Dict[int, float] = {}  # Queue wait per prompt
+        layers = None  # KV cache (keys, values) per layer, all rows share one length
+        attention_mask = None  # (rows, cache length); 0 marks left padding
+        next_tokens = None  # Last generated token per row, fed (and cached) on the next step
+        
+        start = time.perf_counter()
+        with torch.no_grad():
+            while queue or rows:
+                if queue and len(rows) < self.max_batch_size:
+                    # Admit queued prompts into the free slots
+                    admitted = [queue.popleft() for _ in range(min(self.max_batch_size - len(rows), len(queue)))]
+                    admitted_after.update((i, time.perf_counter() - start) for i in admitted)
+                    new_tokens, new_layers, new_mask = self._prefill(
+                        model, [token_id_lists[i] for i in admitted], pad_id, device, prefix_layers
+                    )
+                    if layers is None:
+                        layers, attention_mask, next_tokens = new_layers, new_mask, new_tokens
+                    else:
+                        # Left-pad the shorter cache so both share one length, then stack the rows
+                        length = max(attention_mask.shape[1], new_mask.shape[1])
+                        layers = [
+                            (torch.cat([_pad_left(k, length, 2), _pad_left(new_k, length, 2)]),
+                             torch.cat([_pad_left(v, length, 2), _pad_left(new_v, length, 2)]))
+                            for (k, v), (new_k, new_v) in zip(layers, new_layers)
+                        ]
+                        attention_mask = torch.cat([_pad_left(attention_mask, length, 1), _pad_left(new_mask, length, 1)])
+                        next_tokens = torch.cat([next_tokens, new_tokens])
+                    now = time.perf_counter() - start
+                    rows += admitted
+                    generated += [[token] for token in new_tokens.tolist()]
+                    first_token += [now] * len(admitted)
+                    self.generated_tokens += len(admitted)
+                else:
+                    # One decode step for every active row
+                    attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(rows), 1))], dim=1)
+                    position_ids = attention_mask.sum(dim=1, keepdim=True) - 1
+                    output = model(
+                        next_tokens[:, None],
+                        attention_mask=attention_mask,
+                        position_ids=position_ids,
+                        past_key_values=_build_cache(layers),
+                        use_cache=True
+                    )
+                    layers = _cache_layers(output.past_key_values)
+                    next_tokens = self._next_tokens(output.logits[:, -1])
+                    for row_tokens, token in zip(generated, next_tokens.tolist()):
+                        row_tokens.append(token)
+                    self.generated_tokens += len(rows)
+                
+                # Retire rows that hit EOS, max_new_tokens or the context limit
+                lengths = attention_mask.sum(dim=1).tolist()
+                keep = []
+                for slot, prompt_idx in enumerate(rows):
+                    tokens = generated[slot]
+                    done = tokens[-1] == eos_id or len(tokens) >= self.max_new_tokens \
+                        or lengths[slot] >= max_positions
+                    if not done:
+                        keep.append(slot)
+                        continue
+                    completions[prompt_idx] = Completion(
+                        text=tokenizer.decode(tokens, skip_special_tokens=True),
+                        prompt_tokens=prefix_len + len(token_id_lists[prompt_idx]),
+                        completion_tokens=len(tokens),
+                        latency=time.perf_counter() - start,
+                        time_to_first_token=first_token[slot],
+                        queue_wait=admitted_after[prompt_idx]
+                    )
+                
+                if len(keep) < len(rows):
+                    if not keep:
+                        rows, generated, first_token = [], [], []
+                        layers = attention_mask = next_tokens = None
+                        continue
+                    index = torch.tensor(keep, device=attention_mask.device)
+                    attention_mask = attention_mask.index_select(0, index)
+                    # Columns that are padding in every remaining row can go
+                    first = int(attention_mask.any(dim=0).nonzero()[0])
+                    attention_mask = attention_mask[:, first:]
+                    layers = [(k.index_select(0, index)[:, :, first:], v.index_select(0, index)[:, :, first:]) for k, v in layers]
+                    next_tokens = next_tokens.index_select(0, index)
+                    rows = [rows[slot] for slot in keep]
+                    generated = [generated[slot] for slot in keep]
+                    first_token = [first_token[slot] for slot in keep]
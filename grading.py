@@ -0,0 +1,393 @@
+"""
+Answer Grading - Shared answer extraction and grading for the CoT benchmarks
+
+Replaces substring matching ("5" in "15" is not a correct answer) with:
+- Final-answer span extraction: the text after the last "answer is",
+  "answer:", "####" or \\boxed{...} (graded by its first number);
+  otherwise the last sentence that contains a number, graded by the value
+  after its last "=", the number that ends the clause after its last
+  "so"/"therefore", or else its last number. When the response has digits,
+  a standalone "one" or "first" ("to make one widget") is not a number
+- Numeric normalisation: currency ($.05), thousands separators, decimals,
+  exponents (7.5e3), fractions (1/2), percentages, cents (5 cents = 0.05),
+  scale words (3 thousand), number words ("twenty-five", "two hundred")
+  and ordinals ("second" = 2); trailing units are ignored
+- Text answers ("The match") matched on word boundaries
+
+All patterns are compiled once at import, and parsed expected answers are
+memoised, so grading thousands of responses costs one regex scan each.
+`grade_batch` compares all numeric answers in one vectorised numpy step and
+records its throughput in `GRADING_STATS`. `majority_vote` and
+`vote_settled` vote over sampled answers for self-consistency.
+
+The projects import this module by adding the repository root to sys.path.
+"""
+
+import math
+import re
+import time
+from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# ============================================================================
+# PATTERNS
+# ============================================================================
+
+CARDINALS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18,
+    "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60,
+    "seventy": 70, "eighty": 80, "ninety": 90
+}
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7,
+    "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "twentieth": 20
+}
+SCALES = {
+    "hundred": 100, "thousand": 1000, "million": 10 ** 6, "billion": 10 ** 9,
+    "hundredth": 100, "thousandth": 1000
+}
+WORD_VALUES = {**CARDINALS, **ORDINALS}
+
+_WORD = "|".join(sorted(list(WORD_VALUES) + list(SCALES), key=len, reverse=True))
+_SCALE = "|".join(sorted(SCALES, key=len, reverse=True))
+
+# One pattern for every numeric form, so the earliest number in a span is one search.
+# Number words are matched as whole phrases ("twenty-five", "two hundred and five"),
+# so a compound is never read as its first word.
+NUMBER_RE = re.compile(
+    r"""
+    (?<![\w.])
+    (?:
+        (?P<sign>-)?\s*(?P<currency>[$£€])?\s*
+        (?P<value>\d+(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)
+        (?:[eE](?P<exponent>[+-]?\d+)\b)?
+        (?:\s*/\s*(?P<denominator>\d+))?
+        (?:\s+(?P<scale>""" + _SCALE + r""")\b)?
+        (?:(?P<percent>\s*%)|\s*(?P<cents>cents?\b|¢)|(?:st|nd|rd|th)\b)?
+      |
+        (?P<words>(?:""" + _WORD + r""")\b
+            (?:(?:\s*-\s*|\s+|(?<=hundred)\s+and\s+|(?<=thousand)\s+and\s+)(?:""" + _WORD + r""")\b)*)
+    )
+    """,
+    re.VERBOSE | re.IGNORECASE
+)
+WORD_SPLIT_RE = re.compile(r"[\s-]+(?:and\s+)?", re.IGNORECASE)
+ANSWER_MARKER_RE = re.compile(
+    r"(?:final answer|answer)\s*(?:is|:|=)\s*|####\s*|\\boxed\{",
+    re.IGNORECASE
+)
+CONCLUSION_RE = re.compile(r"\b(?:so|therefore|thus|hence)\b", re.IGNORECASE)
+CLAUSE_END_RE = re.compile(r"[,;:](?:\s|$)")  # Not the comma of "1,000"
+DIGIT_RE = re.compile(r"\d")
+# Number words that are usually a pronoun or determiner ("one widget", "first, ...")
+WEAK_NUMBER_WORDS = {"one", "first"}
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+PARENTHETICAL_RE = re.compile(r"\s*\(.*\)\s*$", re.DOTALL)
+NON_WORD_RE = re.compile(r"[^\w\s]")
+LEADING_ARTICLE_RE = re.compile(r"^(?:the|a|an)\s+")
+
+# Grading throughput, accumulated over every grade_batch call
+GRADING_STATS: Dict[str, float] = {"graded": 0, "seconds": 0.0}
+
+# ============================================================================
+# EXTRACTION
+# ============================================================================
+
+def _words_value(words: str) -> Fraction:
+    """
+    Value of a number-word phrase: "twenty-five" = 25, "two hundred and five"
+    = 205, "three thousand" = 3000. A phrase starting with a scale word
+    ("hundred") counts as one of it. Reading stops at the first word that
+    cannot continue the number ("the first one" = 1, "twenty twenty" = 20).
+    """
+    total, current = 0, 0
+    for word in WORD_SPLIT_RE.split(words.lower()):
+        if word in SCALES:
+            scale = SCALES[word]
+            if scale == 100:
+                current = (current or 1) * scale
+            else:
+                total += (current or 1) * scale
+                current = 0
+        else:
+            value, below_hundred = WORD_VALUES[word], current % 100
+            if below_hundred and not (value < 10 and below_hundred >= 20 and below_hundred % 10 == 0):
+                break  # e.g. a second unit, or tens after tens
+            current += value
+        if word in ORDINALS or (word in SCALES and word.endswith("th")):
+            break  # An ordinal ends the number
+    return Fraction(total + current)
+
+
+def _match_value(match) -> Fraction:
+    """Converts one NUMBER_RE match into an exact value."""
+    if match.group("words"):
+        return _words_value(match.group("words"))
+    value = Fraction(match.group("value").replace(",", ""))
+    if match.group("exponent"):
+        value *= Fraction(10) ** int(match.group("exponent"))
+    if match.group("scale"):
+        value *= SCALES[match.group("scale").lower()]
+    if match.group("denominator"):
+        value /= int(match.group("denominator"))
+    if match.group("percent"):
+        value /= 100
+    if match.group("cents"):
+        value /= 100  # Answers in cents are compared in dollars
+    if match.group("sign"):
+        value = -value
+    return value
+
+
+def first_number(text: str) -> Optional[Fraction]:
+    """
+    Returns the first number in a piece of text, normalised.
+
+    Returns:
+        The exact value, or None if the text has no number
+    """
+    match = NUMBER_RE.search(text)
+    return _match_value(match) if match else None
+
+
+def last_number(text: str) -> Optional[Fraction]:
+    """
+    Returns the last number in a piece of text, normalised.
+
+    Returns:
+        The exact value, or None if the text has no number
+    """
+    match = None
+    for match in NUMBER_RE.finditer(text):
+        pass
+    return _match_value(match) if match else None
+
+
+def _numbers(text: str, skip_weak: bool) -> list:
+    """NUMBER_RE matches in a text, without standalone WEAK_NUMBER_WORDS if `skip_weak`."""
+    return [match for match in NUMBER_RE.finditer(text)
+            if not (skip_weak and (match.group("words") or "").lower() in WEAK_NUMBER_WORDS)]
+
+
+def _final_span(response: str) -> Tuple[str, bool]:
+    """Returns (final-answer span, whether it follows an explicit answer marker)."""
+    markers = list(ANSWER_MARKER_RE.finditer(response))
+    if markers:
+        return response[markers[-1].end():], True
+    skip_weak = bool(DIGIT_RE.search(response))
+    sentences = [s for s in SENTENCE_END_RE.split(response.strip()) if s]
+    for sentence in reversed(sentences):
+        if _numbers(sentence, skip_weak):
+            return sentence, False
+    return response, False
+
+
+def extract_final_answer(response: str) -> str:
+    """
+    Extracts the span that holds a response's final answer.
+
+    Chain-of-thought responses mention many numbers along the way; the
+    answer is the text after the last explicit answer marker, or else the
+    last sentence that contains a number. Short answers come back whole.
+
+    Args:
+        response: The model's response
+
+    Returns:
+        The final-answer span (possibly the whole response)
+    """
+    return _final_span(response)[0]
+
+
+def final_number(response: str) -> Optional[Fraction]:
+    """
+    Returns a response's final numeric answer.
+
+    After an answer marker the answer comes first ("The answer is 5 cents
+    (0.05)"). Without one, the last sentence is a worked conclusion, so the
+    answer is the value after its last "=" ("x = 4 - 3 = 1"), else the last
+    number of the clause after its last "so" / "therefore" / "thus" /
+    "hence" ("So 100 machines take 5 minutes"; "So I'm now second, and they
+    drop to third"), else its last number. If the response has digits,
+    standalone "one" and "first" are not numbers ("5 minutes, because each
+    machine takes 5 minutes to make one widget").
+
+    Returns:
+        The exact value, or None if the final-answer span has no number
+    """
+    span, marked = _final_span(response)
+    if marked:
+        return first_number(span)
+    skip_weak = bool(DIGIT_RE.search(response))
+    if "=" in span:
+        numbers = _numbers(span[span.rindex("=") + 1:], skip_weak)
+        if numbers:
+            return _match_value(numbers[0])
+    conclusions = list(CONCLUSION_RE.finditer(span))
+    if conclusions:
+        clause = CLAUSE_END_RE.split(span[conclusions[-1].end():], maxsplit=1)[0]
+        numbers = _numbers(clause, skip_weak)
+        if numbers:
+            return _match_value(numbers[-1])
+    numbers = _numbers(span, skip_weak)
+    return _match_value(numbers[-1]) if numbers else last_number(span)
+
+
+def _normalize_text(text: str) -> str:
+    text = NON_WORD_RE.sub(" ", text.lower())
+    return LEADING_ARTICLE_RE.sub("", " ".join(text.split()))
+
+
+@lru_cache(maxsize=65536)
+def parse_expected(expected_answer: str) -> Union[Fraction, "re.Pattern"]:
+    """
+    Parses an expected answer once.
+
+    A trailing parenthesised explanation ("12 (all months have 28 days)") is
+    dropped. Answers that start with a number become that number; anything
+    else becomes a compiled word-boundary pattern for its normalised text.
+
+    Returns:
+        The expected value, or a pattern to search normalised responses with
+    """
+    answer = PARENTHETICAL_RE.sub("", expected_answer).strip()
+    match = NUMBER_RE.match(answer)
+    if match:
+        return _match_value(match)
+    return re.compile(r"\b" + re.escape(_normalize_text(answer)) + r"\b")
+
+
+# ============================================================================
+# GRADING
+# ============================================================================
+
+def grade(response: str, expected_answer: str) -> bool:
+    """
+    Grades one response.
+
+    Args:
+        response: The model's response
+        expected_answer: The correct answer
+
+    Returns:
+        True if the response's final answer matches
+    """
+    return bool(grade_batch([response], [expected_answer])[0])
+
+
+def grade_batch(responses: Sequence[str], expected_answers: Sequence[str]) -> np.ndarray:
+    """
+    Grades many responses at once.
+
+    Each response is scanned once for its final answer; all numeric answers
+    are then compared against their expected values in one vectorised step
+    (relative tolerance 1e-6). Text answers must appear, on word boundaries,
+    in the normalised final-answer span or, failing that, the whole response.
+
+    Args:
+        responses: Model responses
+        expected_answers: Correct answer for each response
+
+    Returns:
+        Boolean array, one entry per response
+    """
+    start = time.perf_counter()
+    n = len(responses)
+    correct = np.zeros(n, dtype=bool)
+    got = np.full(n, np.nan)
+    wanted = np.full(n, np.nan)
+
+    for i, (response, expected_answer) in enumerate(zip(responses, expected_answers)):
+        expected = parse_expected(expected_answer)
+        if isinstance(expected, Fraction):
+            value = final_number(response)
+            wanted[i] = float(expected)
+            if value is not None:
+                got[i] = float(value)
+        else:
+            span = extract_final_answer(response)
+            correct[i] = bool(expected.search(_normalize_text(span)) or expected.search(_normalize_text(response)))
+
+    numeric = ~np.isnan(wanted)
+    with np.errstate(invalid="ignore"):
+        correct[numeric] = np.isclose(got[numeric], wanted[numeric], rtol=1e-6, atol=1e-9)
+
+    GRADING_STATS["graded"] += n
+    GRADING_STATS["seconds"] += time.perf_counter() - start
+    return correct
+
+
+def grading_throughput() -> float:
+    """Responses graded per second so far."""
+    seconds = GRADING_STATS["seconds"]
+    return GRADING_STATS["graded"] / seconds if seconds > 0 else 0.0
+
+
+# ============================================================================
+# MAJORITY VOTING
+# ============================================================================
+
+def answer_key(response: str) -> Optional[str]:
+    """
+    Canonical form of a response's final answer, for voting.
+
+    Numbers are compared by value ("$0.05" and "5 cents" share a key);
+    anything else by its normalised final-answer text.
+
+    Returns:
+        The key, or None if the response gives no answer
+    """
+    value = final_number(response)
+    if value is not None:
+        return str(value)
+    return _normalize_text(extract_final_answer(response)) or None
+
+
+def majority_vote(responses: Sequence[str]) -> Tuple[Optional[int], Counter]:
+    """
+    Majority vote over the final answers of several sampled responses.
+
+    Responses without an answer do not vote; ties go to the answer seen first.
+
+    Returns:
+        tuple: (index of the first response giving the winning answer or
+        None if nobody answered, votes per answer key)
+    """
+    keys = [answer_key(response) for response in responses]
+    votes = Counter(key for key in keys if key is not None)
+    if not votes:
+        return None, votes
+    return keys.index(votes.most_common(1)[0][0]), votes
+
+
+def vote_settled(votes: Counter, remaining: int, confidence: float = 0.95) -> bool:
+    """
+    Whether more samples are worth drawing for a vote.
+
+    A vote is settled when the remaining samples could not overturn the
+    leader, or when a one-sided sign test between the leader and the
+    runner-up rejects "they are equally likely" at `confidence`.
+
+    Args:
+        votes: Votes per answer so far
+        remaining: Samples that could still be drawn
+        confidence: Required confidence that the leader is the more likely answer
+
+    Returns:
+        True if sampling can stop
+    """
+    ranked = votes.most_common(2) + [(None, 0), (None, 0)]
+    leader, runner_up = ranked[0][1], ranked[1][1]
+    if leader - runner_up > remaining:
+        return True
+    n = leader + runner_up
+    if n == 0:
+        return False
+    p_value = sum(math.comb(n, k) for k in range(leader, n + 1)) / 2 ** n
+    return p_value <= 1 - confidence
@@ -0,0 +1,231 @@
+"""
+Call Instrumentation - Latency and cost metrics for every model call
+
+`CallMetrics` collects one sample per model call from the `Completion`s the
+backends return: end-to-end latency, time to first token, queue wait,
+retries, tokens and dollar cost. Samples are grouped by a label (the
+prompting strategy), so a benchmark can report the latency price of
+reasoning next to its token price:
+
+    metrics = CallMetrics(price_per_million_prompt=0.5, price_per_million_completion=1.5)
+    metrics.record("cot", completion)
+    metrics.summary()["cot"]["latency"]["p95"]
+
+Reports give p50/p95/p99 per timing, throughput, tokens/sec and cost per
+strategy, and export to JSON or the Prometheus text exposition format.
+
+The projects import this module by adding the repository root to sys.path.
+"""
+
+import json
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backends import Completion
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = "cot_benchmark"  # Prometheus metric name prefix
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+class CallMetrics:
+    """
+    Per-strategy samples of model call latency, tokens and cost.
+    
+    Token counts default to the completion's own usage; pass the counts a
+    benchmark uses (e.g. local tokenizer counts) to keep reports consistent.
+    Failed calls count towards calls, errors and latency, not tokens.
+    Calls with simulated timings (`metadata["simulated"]`, set by the mock
+    backend) are reported as simulated.
+    """
+    
+    def __init__(self, price_per_million_prompt: float = 0.0, price_per_million_completion: float = 0.0):
+        self.price_per_million_prompt = price_per_million_prompt
+        self.price_per_million_completion = price_per_million_completion
+        self._samples: Dict[str, Dict[str, List]] = {}
+    
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """Dollar cost of one call."""
+        return (prompt_tokens * self.price_per_million_prompt
+                + completion_tokens * self.price_per_million_completion) / 1e6
+    
+    def record(self, strategy: str, completion: Completion, prompt_tokens: Optional[int] = None,
+               completion_tokens: Optional[int] = None):
+        """
+        Adds one model call.
+        
+        Args:
+            strategy: Label the call is reported under
+            completion: The backend's completion, with its timings
+            prompt_tokens: Prompt tokens to charge (default: the completion's usage)
+            completion_tokens: Completion tokens to charge (default: the completion's usage)
+        """
+        prompt_tokens = completion.prompt_tokens if prompt_tokens is None else prompt_tokens
+        completion_tokens = completion.completion_tokens if completion_tokens is None else completion_tokens
+        if completion.error is not None:
+            prompt_tokens = completion_tokens = 0
+        
+        samples = self._samples.setdefault(strategy, {
+            "latency": [], "time_to_first_token": [], "queue_wait": [], "retries": [],
+            "prompt_tokens": [], "completion_tokens": [], "errors": [], "finished": [], "simulated": []
+        })
+        samples["latency"].append(completion.latency)
+        samples["time_to_first_token"].append(
+            np.nan if completion.time_to_first_token is None else completion.time_to_first_token
+        )
+        samples["queue_wait"].append(completion.queue_wait)
+        samples["retries"].append(completion.retries)
+        samples["prompt_tokens"].append(prompt_tokens)
+        samples["completion_tokens"].append(completion_tokens)
+        samples["errors"].append(completion.error is not None)
+        samples["finished"].append(time.perf_counter())
+        samples["simulated"].append(bool(completion.metadata.get("simulated")))
+    
+    @property
+    def strategies(self) -> List[str]:
+        return list(self._samples)
+    
+    def _quantiles(self, values: np.ndarray) -> Optional[Dict[str, float]]:
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return None
+        stats = {f"p{round(q * 100)}": float(np.quantile(values, q)) for q in QUANTILES}
+        stats["mean"] = float(values.mean())
+        return stats
+    
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Summarises every strategy.
+        
+        Throughput is calls per second of wall-clock time between the first
+        call starting and the last finishing; tokens/sec is completion tokens
+        per second the model spent on them (latency minus queue wait, summed).
+        If any of a strategy's timings are simulated, they have no place on
+        the wall clock, so throughput is instead computed from the recorded
+        latencies alone, as if the calls ran one after another, and the
+        strategy is flagged 'simulated'.
+        
+        Returns:
+            Dictionary per strategy with 'calls', 'errors', 'retries',
+            'prompt_tokens', 'completion_tokens', 'cost', 'cost_per_call',
+            'throughput', 'tokens_per_second', 'simulated' and, for
+            'latency', 'time_to_first_token' and 'queue_wait',
+            p50/p95/p99/mean seconds (None when never observed)
+        """
+        report = {}
+        for strategy, samples in self._samples.items():
+            latency = np.asarray(samples["latency"], dtype=float)
+            queue_wait = np.asarray(samples["queue_wait"], dtype=float)
+            finished = np.asarray(samples["finished"], dtype=float)
+            prompt_tokens = int(np.sum(samples["prompt_tokens"]))
+            completion_tokens = int(np.sum(samples["completion_tokens"]))
+            simulated = any(samples["simulated"])
+            if simulated:
+                span = float(latency.sum())
+            else:
+                span = float(finished.max() - (finished - latency).min())
+            busy = float(np.sum(latency - queue_wait))
+            cost = self.cost(prompt_tokens, completion_tokens)
+            report[strategy] = {
+                "calls": len(latency),
+                "errors": int(np.sum(samples["errors"])),
+                "retries": int(np.sum(samples["retries"])),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": cost,
+                "cost_per_call": cost / len(latency),
+                "throughput": len(latency) / span if span > 0 else 0.0,
+                "tokens_per_second": completion_tokens / busy if busy > 0 else 0.0,
+                "simulated": simulated,
+                "latency": self._quantiles(latency),
+                "time_to_first_token": self._quantiles(np.asarray(samples["time_to_first_token"], dtype=float)),
+                "queue_wait": self._quantiles(queue_wait)
+            }
+        return report
+    
+    def report_lines(self, baseline: Optional[str] = None) -> List[str]:
+        """
+        Formats the summary as one line per strategy and timing, for printing.
+        
+        Args:
+            baseline: Strategy to compare the others' median latency against
+        """
+        summary = self.summary()
+        lines = []
+        for strategy, stats in summary.items():
+            latency, ttft = stats["latency"], stats["time_to_first_token"]
+            simulated = " (simulated timings)" if stats["simulated"] else ""
+            lines.append(f"{strategy}{simulated}: {stats['calls']} calls, {stats['throughput']:.1f} calls/s, "
+                         f"{stats['tokens_per_second']:.1f} tokens/s, {stats['retries']} retries, "
+                         f"${stats['cost_per_call']:.6f}/call")
+            lines.append(f"  latency p50/p95/p99: {latency['p50']:.3f}s / {latency['p95']:.3f}s / {latency['p99']:.3f}s")
+            if ttft is not None:
+                lines.append(f"  time to first token p50/p95: {ttft['p50']:.3f}s / {ttft['p95']:.3f}s")
+            if stats["queue_wait"]["p95"] >= 0.001:
+                lines.append(f"  queue wait p50/p95: {stats['queue_wait']['p50']:.3f}s / {stats['queue_wait']['p95']:.3f}s")
+        base = summary.get(baseline)
+        if base is not None and base["latency"]["p50"] > 0:
+            for strategy, stats in summary.items():
+                if strategy != baseline:
+                    lines.append(f"{strategy} median latency is {stats['latency']['p50'] / base['latency']['p50']:.2f}x {baseline}'s")
+        return lines
+    
+    def to_json(self, path: str):
+        """Writes the summary, plus the prices it used, as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "price_per_million_prompt": self.price_per_million_prompt,
+                "price_per_million_completion": self.price_per_million_completion,
+                "strategies": self.summary()
+            }, f, indent=2)
+    
+    def to_prometheus(self, prefix: str = METRIC_PREFIX) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        
+        Timings are summaries with quantile labels; calls, errors, retries,
+        tokens and cost are counters. Every series carries a `strategy` label.
+        """
+        lines = []
+        summary = self.summary()
+        
+        def counter(name: str, help_text: str, field: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for strategy, stats in summary.items():
+                lines.append(f'{prefix}_{name}{{strategy="{strategy}"}} {stats[field]}')
+        
+        counter("calls_total", "Model calls.", "calls")
+        counter("errors_total", "Model calls that failed permanently.", "errors")
+        counter("retries_total", "Retried attempts.", "retries")
+        counter("prompt_tokens_total", "Prompt tokens.", "prompt_tokens")
+        counter("completion_tokens_total", "Completion tokens.", "completion_tokens")
+        counter("cost_dollars_total", "Dollar cost of all calls.", "cost")
+        
+        for name, help_text in (("latency", "End-to-end latency per call."),
+                                ("time_to_first_token", "Time to first token per call."),
+                                ("queue_wait", "Time queued before the model started per call.")):
+            lines.append(f"# HELP {prefix}_{name}_seconds {help_text}")
+            lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+            for strategy, samples in self._samples.items():
+                values = np.asarray(samples[name], dtype=float)
+                values = values[~np.isnan(values)]
+                for q in QUANTILES:
+                    value = float(np.quantile(values, q)) if len(values) else float("nan")
+                    lines.append(f'{prefix}_{name}_seconds{{strategy="{strategy}",quantile="{q}"}} {value}')
+                lines.append(f'{prefix}_{name}_seconds_sum{{strategy="{strategy}"}} {float(values.sum())}')
+                lines.append(f'{prefix}_{name}_seconds_count{{strategy="{strategy}"}} {len(values)}')
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str, prefix: str = METRIC_PREFIX):
+        """Writes `to_prometheus()` to a file (e.g. for node_exporter's textfile collector)."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
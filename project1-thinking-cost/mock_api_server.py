@@ -0,0 +1,170 @@
+"""
+Mock API Server - Local OpenAI-compatible endpoint for the benchmark
+Serves POST /v1/chat/completions with canned answers so the concurrent
+execution engine can be exercised without an API key.
+
+Responses come from the benchmark's mock backend (`mock_completion`): the
+MOCK_RESPONSES text for the MATH_PROBLEMS, and a generic short (Zero-Shot) or
+long (CoT) answer for any other question. Latency, rate limiting and transient
+failures can be simulated to test throttling and retries. Requests with
+`"stream": true` get server-sent events, one word per chunk, so time to
+first token can be measured.
+
+Usage:
+    python3 mock_api_server.py --port 8000 --latency 0.5 --error-rate 0.05
+
+Then, in thinking_cost_benchmark.py:
+    BACKEND = "openai"
+    API_BASE = "http://127.0.0.1:8000/v1"
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from thinking_cost_benchmark import mock_completion
+
+# ============================================================================
+# CONFIGURATION (overridden by command-line flags)
+# ============================================================================
+
+SETTINGS = {
+    "latency": 0.2,  # Mean seconds per response (before the first token when streaming)
+    "seconds_per_token": 0.01,  # Delay between streamed chunks
+    "error_rate": 0.0,  # Fraction of requests answered with HTTP 500
+    "max_requests_per_second": None  # Answer HTTP 429 above this rate
+}
+
+_STATS = {"requests": 0, "errors": 0, "throttled": 0}
+_STATS_LOCK = threading.Lock()
+_RECENT_REQUESTS = []  # Timestamps within the last second
+
+
+def _throttled() -> bool:
+    limit = SETTINGS["max_requests_per_second"]
+    if limit is None:
+        return False
+    now = time.monotonic()
+    with _STATS_LOCK:
+        while _RECENT_REQUESTS and now - _RECENT_REQUESTS[0] > 1.0:
+            _RECENT_REQUESTS.pop(0)
+        if len(_RECENT_REQUESTS) >= limit:
+            return True
+        _RECENT_REQUESTS.append(now)
+    return False
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_stream(self, model: str, text: str, usage: dict):
+        """Streams `text` as chat.completion.chunk events, then usage and [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        
+        def event(payload):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i > 0:
+                time.sleep(SETTINGS["seconds_per_token"])
+            content = word if i == 0 else " " + word
+            event({"object": "chat.completion.chunk", "model": model,
+                   "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]})
+        event({"object": "chat.completion.chunk", "model": model,
+               "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        event({"object": "chat.completion.chunk", "model": model, "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+    
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = request["messages"][-1]["content"]
+        with _STATS_LOCK:
+            _STATS["requests"] += 1
+        
+        if _throttled():
+            with _STATS_LOCK:
+                _STATS["throttled"] += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "1"})
+            return
+        
+        time.sleep(random.expovariate(1.0 / SETTINGS["latency"]) if SETTINGS["latency"] > 0 else 0)
+        
+        if random.random() < SETTINGS["error_rate"]:
+            with _STATS_LOCK:
+                _STATS["errors"] += 1
+            self._send_json(500, {"error": {"message": "Simulated server error"}})
+            return
+        
+        text = mock_completion(prompt).text
+        # Rough whitespace token counts are enough for a mock
+        prompt_tokens, completion_tokens = len(prompt.split()), len(text.split())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if request.get("stream"):
+            self._send_stream(request.get("model", "mock"), text, usage)
+            return
+        self._send_json(200, {
+            "id": f"mock-{_STATS['requests']}",
+            "object": "chat.completion",
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+    
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet under load
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=SETTINGS["latency"], help="Mean response latency (s)")
+    parser.add_argument("--seconds-per-token", type=float, default=SETTINGS["seconds_per_token"],
+                        help="Delay between streamed chunks (s)")
+    parser.add_argument("--error-rate", type=float, default=SETTINGS["error_rate"], help="Fraction of HTTP 500s")
+    parser.add_argument("--max-rps", type=float, default=None, help="Answer HTTP 429 above this request rate")
+    args = parser.parse_args()
+    
+    SETTINGS["latency"] = args.latency
+    SETTINGS["seconds_per_token"] = args.seconds_per_token
+    SETTINGS["error_rate"] = args.error_rate
+    SETTINGS["max_requests_per_second"] = args.max_rps
+    
+    server = ThreadingHTTPServer((args.host, args.port), MockAPIHandler)
+    print(f"Mock API listening on http://{args.host}:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nServed {_STATS['requests']} requests "
+              f"({_STATS['errors']} simulated errors, {_STATS['throttled']} throttled)")
+
+
+if __name__ == "__main__":
+    main()
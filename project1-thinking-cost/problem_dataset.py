@@ -0,0 +1,286 @@
+"""
+Problem Datasets - Streaming loader for thinking_cost_benchmark.py
+Reads math word problems from JSONL, CSV or Parquet files in GSM8K-style
+schema and yields them in MATH_PROBLEMS format ({"id", "question", "answer"}).
+
+Everything is a generator, so a pipeline such as
+
+    problems = take(sample(shard(iter_problems("gsm8k.jsonl"), 0, 4), 0.1), 1000)
+
+holds one problem at a time however large the file is. Sharding and
+sampling hash each problem's id, so they are deterministic and do not depend
+on file order. `ProblemIndex` gives random access by id through an on-disk
+index, without reading the whole file.
+
+GSM8K answers end with "#### <final answer>"; only the final answer is kept.
+Rows without an id get "<file stem>-<row number>".
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ID_FIELD = "id"
+QUESTION_FIELD = "question"
+ANSWER_FIELD = "answer"
+FINAL_ANSWER_MARKER = "####"  # GSM8K puts the final answer after this marker
+
+# ============================================================================
+# READERS
+# ============================================================================
+
+def _file_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    formats = {".jsonl": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+    if extension not in formats:
+        raise ValueError(f"Unsupported dataset file {path!r}; expected .jsonl, .csv or .parquet")
+    return formats[extension]
+
+
+def _normalize(row: Dict, path: str, row_number: int) -> Dict:
+    """Converts one raw row into MATH_PROBLEMS format."""
+    answer = str(row[ANSWER_FIELD])
+    if FINAL_ANSWER_MARKER in answer:
+        answer = answer.rsplit(FINAL_ANSWER_MARKER, 1)[1]
+    problem_id = row.get(ID_FIELD)
+    if problem_id in (None, ""):
+        problem_id = f"{os.path.splitext(os.path.basename(path))[0]}-{row_number}"
+    return {"id": str(problem_id), "question": str(row[QUESTION_FIELD]).strip(), "answer": answer.strip()}
+
+
+def _iter_jsonl_rows(f) -> Iterator[Tuple[int, Dict]]:
+    """Yields (byte offset, row) for every non-empty line of a binary file."""
+    while True:
+        offset = f.tell()
+        line = f.readline()
+        if not line:
+            return
+        if line.strip():
+            yield offset, json.loads(line)
+
+
+def _read_csv_record(f) -> bytes:
+    """
+    Reads one CSV record from a binary file.
+    
+    Lines are joined while a quoted field is still open, so records with
+    embedded newlines come back whole.
+    """
+    record = f.readline()
+    while record.count(b'"') % 2 == 1:
+        more = f.readline()
+        if not more:
+            break
+        record += more
+    return record
+
+
+def _iter_csv_rows(f) -> Iterator[Tuple[int, Dict]]:
+    """Yields (byte offset, row) for every record of a binary CSV file."""
+    header = None
+    while True:
+        offset = f.tell()
+        record = _read_csv_record(f)
+        if not record:
+            return
+        if not record.strip():
+            continue
+        values = next(csv.reader(io.StringIO(record.decode("utf-8-sig" if header is None else "utf-8"))))
+        if header is None:
+            header = values
+            continue
+        yield offset, dict(zip(header, values))
+
+
+def _csv_header(f) -> list:
+    f.seek(0)
+    return next(csv.reader(io.StringIO(f.readline().decode("utf-8-sig"))))
+
+
+def _parquet_file(path: str):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet datasets needs pyarrow: pip install pyarrow")
+    return pq.ParquetFile(path)
+
+
+def _iter_parquet_rows(path: str) -> Iterator[Tuple[Tuple[int, int], Dict]]:
+    """Yields ((row group, row within group), row), one row group in memory at a time."""
+    parquet = _parquet_file(path)
+    for group in range(parquet.num_row_groups):
+        for row_in_group, row in enumerate(parquet.read_row_group(group).to_pylist()):
+            yield (group, row_in_group), row
+
+
+def _iter_located(path: str) -> Iterator[Tuple[object, Dict]]:
+    """Yields (location, normalized problem); the location is what the index stores."""
+    file_format = _file_format(path)
+    if file_format == "parquet":
+        for row_number, (location, row) in enumerate(_iter_parquet_rows(path)):
+            yield location, _normalize(row, path, row_number)
+        return
+    
+    with open(path, "rb") as f:
+        rows = _iter_jsonl_rows(f) if file_format == "jsonl" else _iter_csv_rows(f)
+        for row_number, (offset, row) in enumerate(rows):
+            yield offset, _normalize(row, path, row_number)
+
+
+def iter_problems(path: str) -> Iterator[Dict]:
+    """
+    Streams the problems of a JSONL, CSV or Parquet file.
+    
+    Args:
+        path: Dataset file; the format follows the extension
+    
+    Yields:
+        Problems in MATH_PROBLEMS format
+    """
+    for _, problem in _iter_located(path):
+        yield problem
+
+
+# ============================================================================
+# PIPELINE STAGES
+# ============================================================================
+
+def _id_hash(problem_id: str, salt: str = "") -> int:
+    """Stable 64-bit hash of an id (Python's hash() changes between runs)."""
+    return int.from_bytes(hashlib.sha1(f"{salt}:{problem_id}".encode("utf-8")).digest()[:8], "big")
+
+
+def shard(problems: Iterable[Dict], index: int, count: int) -> Iterator[Dict]:
+    """
+    Keeps the problems that belong to one of `count` disjoint shards.
+    
+    A problem's shard depends only on its id, so every shard is the same
+    across runs and machines, and the shards together cover every problem.
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index {index} is outside 0..{count - 1}")
+    for problem in problems:
+        if _id_hash(problem["id"], "shard") % count == index:
+            yield problem
+
+
+def sample(problems: Iterable[Dict], fraction: float, seed: int = 0) -> Iterator[Dict]:
+    """
+    Keeps a deterministic pseudo-random `fraction` of the problems.
+    
+    Selection hashes each id with the seed, so the same seed always picks the
+    same problems, and a larger fraction keeps a superset of a smaller one.
+    """
+    threshold = fraction * 2 ** 64
+    for problem in problems:
+        if _id_hash(problem["id"], f"sample-{seed}") < threshold:
+            yield problem
+
+
+def filter_ids(problems: Iterable[Dict], ids: Iterable[str], exclude: bool = False) -> Iterator[Dict]:
+    """Keeps only the problems whose id is in `ids` (or, with `exclude`, not in it)."""
+    ids: Set[str] = set(ids)
+    for problem in problems:
+        if (problem["id"] in ids) != exclude:
+            yield problem
+
+
+def take(problems: Iterable[Dict], limit: Optional[int]) -> Iterator[Dict]:
+    """Stops after `limit` problems (None keeps all)."""
+    for count, problem in enumerate(problems):
+        if limit is not None and count >= limit:
+            return
+        yield problem
+
+
+# ============================================================================
+# RANDOM ACCESS BY ID
+# ============================================================================
+
+class ProblemIndex:
+    """
+    On-disk index from problem id to its location in a dataset file.
+    
+    The index is a SQLite file next to the dataset (`<path>.index.sqlite3`)
+    holding one (id, location) row per problem: a byte offset for JSONL and
+    CSV, a (row group, row) pair for Parquet. It is built on first use and
+    rebuilt when the dataset's size or modification time changes. Lookups
+    read a single record (Parquet: a single row group).
+    """
+    
+    def __init__(self, path: str, index_path: Optional[str] = None):
+        self.path = path
+        self.index_path = index_path or f"{path}.index.sqlite3"
+        self.format = _file_format(path)
+        self._conn = sqlite3.connect(self.index_path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS locations (id TEXT PRIMARY KEY, a INTEGER, b INTEGER)")
+        if self._stored_signature() != self._signature():
+            self.build()
+    
+    def _signature(self) -> str:
+        stat = os.stat(self.path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    
+    def _stored_signature(self) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        return row[0] if row else None
+    
+    def build(self):
+        """(Re)indexes the whole file in one streaming pass."""
+        self._conn.execute("DELETE FROM locations")
+        
+        def rows():
+            for location, problem in _iter_located(self.path):
+                group, row = location if isinstance(location, tuple) else (location, 0)
+                yield problem["id"], group, row
+        
+        self._conn.executemany("INSERT OR REPLACE INTO locations VALUES (?, ?, ?)", rows())
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (self._signature(),))
+        self._conn.commit()
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+    
+    def __contains__(self, problem_id: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM locations WHERE id = ?", (problem_id,)).fetchone() is not None
+    
+    def get(self, problem_id: str) -> Dict:
+        """
+        Reads one problem by id.
+        
+        Raises:
+            KeyError: If the id is not in the dataset
+        """
+        row = self._conn.execute("SELECT a, b FROM locations WHERE id = ?", (problem_id,)).fetchone()
+        if row is None:
+            raise KeyError(problem_id)
+        location, row_in_group = row
+        
+        if self.format == "parquet":
+            raw = _parquet_file(self.path).read_row_group(location).slice(row_in_group, 1).to_pylist()[0]
+        else:
+            with open(self.path, "rb") as f:
+                if self.format == "jsonl":
+                    f.seek(location)
+                    raw = json.loads(f.readline())
+                else:
+                    header = _csv_header(f)
+                    f.seek(location)
+                    record = _read_csv_record(f)
+                    raw = dict(zip(header, next(csv.reader(io.StringIO(record.decode("utf-8"))))))
+        # Row numbers are only needed for generated ids, and those are the id we looked up
+        problem = _normalize(raw, self.path, 0)
+        problem["id"] = problem_id
+        return problem
+    
+    def close(self):
+        self._conn.close()
@@ -10,19 +10,105 @@ The goal is to quantify why researchers want Latent CoT by showing that
 explicit reasoning is more accurate but costs 2-4x more tokens.
 """
 
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend for file saving
 import matplotlib.pyplot as plt
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Shared model backends live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backends import (Backend, Completion, HuggingFaceBackend, MockBackend,
+                      OpenAICompatibleBackend, generate_all, run_all)
+from grading import GRADING_STATS, grade, grade_batch, grading_throughput, majority_vote, vote_settled
+from instrumentation import CallMetrics
+from problem_dataset import filter_ids, iter_problems, sample, shard, take
+from token_accounting import get_counter
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-MOCK_MODE = True  # Set to False to use actual OpenAI API
-API_KEY = "your-api-key-here"  # Only needed when MOCK_MODE = False
+# Which model answers the questions:
+# "mock"   - canned MOCK_RESPONSES (no API key or model needed)
+# "openai" - any OpenAI-compatible API at API_BASE
+# "local"  - a Hugging Face causal LM on CPU, loaded through project2's logit_lens
+BACKEND = "mock"
+API_KEY = "your-api-key-here"  # Only needed for the "openai" backend
 MODEL_NAME = "gpt-3.5-turbo"
+API_BASE = "https://api.openai.com/v1"  # Any OpenAI-compatible endpoint, e.g. mock_api_server.py
+TEMPERATURE = 0.7
+LOCAL_MODEL_NAME = "gpt2"  # Hugging Face model ID for the "local" backend
+LOCAL_BATCH_SIZE = 8  # Sequences decoded together by the "local" backend (continuous batching)
+MAX_NEW_TOKENS = 256  # Completion length cap for the "local" backend
+
+# Concurrent execution engine ("openai" backend)
+MAX_CONCURRENCY = 16  # Calls in flight at once
+REQUESTS_PER_MINUTE = 500  # Token-bucket limit on requests
+TOKENS_PER_MINUTE = 90000  # Token-bucket limit on prompt + completion tokens
+ESTIMATED_COMPLETION_TOKENS = 150  # Reserved per call, corrected once the real usage is known
+MAX_RETRIES = 5  # Retries on 429 / 5xx / timeouts
+RETRY_BASE_DELAY = 1.0  # Seconds; doubles with every retry (plus jitter)
+RETRY_MAX_DELAY = 30.0
+REQUEST_TIMEOUT = 60.0  # Seconds per call
+
+# Response cache (every backend but "mock"): re-running to tweak grading or charts makes no new calls
+# "read_through" - answer from the cache, call the API only on a miss
+# "write_only"   - always call the API and refresh the cache
+# "bypass"       - neither read nor write the cache
+CACHE_MODE = "read_through"
+RESPONSE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache.sqlite3")
+CACHE_TTL_SECONDS = None  # Entries older than this count as misses; None keeps them forever
+CACHE_MAX_ENTRIES = 100000  # Least recently used entries beyond this are evicted
+STRATEGY_VERSION = "v1"  # Part of the cache key - bump when the prompting strategies change
+
+# Streaming results: every finished call is appended to a JSONL file right away
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+RESUME = True  # Skip calls already recorded for the same backend, model and strategy version
+RESULTS_CHUNK_SIZE = 256  # Problems in flight at once; bounds memory on large runs
+
+# Token accounting: the CoT multiplier is computed on completion tokens only
+# "tokenizer" - count prompt and completion tokens locally with TOKENIZER_NAME
+# "usage"     - trust the prompt / completion token usage the backend reports
+TOKEN_COUNTING = "tokenizer"
+TOKENIZER_NAME = "gpt2"  # Local BPE tokenizer (Hugging Face ID or directory), loaded once
+
+# Latency and cost instrumentation: every model call is timed and priced; metrics are
+# written next to the results file as <name>.metrics.json and <name>.prom (Prometheus)
+PRICE_PER_MILLION_PROMPT_TOKENS = 0.50  # Dollars
+PRICE_PER_MILLION_COMPLETION_TOKENS = 1.50
+STREAM_RESPONSES = True  # "openai" backend: stream answers so time to first token is measured
+MOCK_TIME_TO_FIRST_TOKEN = 0.25  # Simulated seconds for the mock backend (nothing is slept)
+MOCK_SECONDS_PER_TOKEN = 0.02
+
+# Self-consistency: a third strategy that samples the CoT prompt several times per question
+# (concurrently, in waves) and majority-votes the extracted answers, stopping early once the
+# vote is settled. Needs TEMPERATURE > 0; 0 samples turns it off
+SELF_CONSISTENCY_SAMPLES = 0  # Most samples per question, e.g. 8
+SELF_CONSISTENCY_MIN_SAMPLES = 3  # Drawn before the first vote
+SELF_CONSISTENCY_WAVE = 2  # More samples per unsettled question per wave
+SELF_CONSISTENCY_CONFIDENCE = 0.95  # Stop once the leader beats the runner-up at this confidence
+MOCK_SAMPLE_ERROR_RATE = 0.3  # Mock samples slip to the Zero-Shot answer this often
+
+# Problem set: None uses the 5 built-in MATH_PROBLEMS; otherwise a GSM8K-style
+# .jsonl / .csv / .parquet file, streamed through problem_dataset.py
+DATASET_PATH = None
+DATASET_IDS = None  # Only these problem ids (None keeps all)
+DATASET_SHARD = None  # (index, count): keep one of `count` deterministic shards
+DATASET_SAMPLE = None  # Keep this deterministic fraction of problems (e.g. 0.1)
+DATASET_SEED = 0  # Seed for DATASET_SAMPLE
+DATASET_LIMIT = None  # Stop after this many problems
+CHART_MAX_QUESTIONS = 25  # Questions shown in the chart; totals still cover every question
 
 # ============================================================================
 # DATA: 5 CHALLENGING MATH PROBLEMS
@@ -56,8 +142,31 @@ MATH_PROBLEMS = [
     }
 ]
 
+def load_problems() -> Iterable[Dict]:
+    """
+    Builds the configured problem stream.
+    
+    Returns:
+        MATH_PROBLEMS, or a lazy generator over DATASET_PATH with the id
+        filter, shard, sample and limit stages applied in that order
+    """
+    if DATASET_PATH is None:
+        problems = MATH_PROBLEMS
+    else:
+        problems = iter_problems(DATASET_PATH)
+    if DATASET_IDS is not None:
+        problems = filter_ids(problems, DATASET_IDS)
+    if DATASET_SHARD is not None:
+        problems = shard(problems, *DATASET_SHARD)
+    if DATASET_SAMPLE is not None:
+        problems = sample(problems, DATASET_SAMPLE, DATASET_SEED)
+    if DATASET_LIMIT is not None:
+        problems = take(problems, DATASET_LIMIT)
+    return problems
+
+
 # ============================================================================
-# MOCK RESPONSES (Used when MOCK_MODE = True)
+# MOCK RESPONSES (Used by the "mock" backend)
 # ============================================================================
 
 MOCK_RESPONSES = {
@@ -142,66 +251,138 @@ def mock_api_call(question_id: str, is_cot: bool) -> Dict:
     return MOCK_RESPONSES[question_id][mode]
 
 
-def real_api_call(question: str, is_cot: bool) -> Dict:
+def build_prompt(question: str, is_cot: bool) -> str:
     """
-    Makes an actual OpenAI API call.
+    Builds the prompt for one strategy.
     
     Args:
         question: The math problem to solve
         is_cot: True for Chain-of-Thought, False for Zero-Shot
     
     Returns:
-        Dictionary with 'text', 'tokens', and 'correct' keys
+        The prompt text
     """
-    try:
-        import openai
-        openai.api_key = API_KEY
-        
-        if is_cot:
-            prompt = f"Think step by step and then answer: {question}"
-        else:
-            prompt = f"Answer this question immediately with just the number: {question}"
-        
-        response = openai.ChatCompletion.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+    if is_cot:
+        return f"Think step by step and then answer: {question}"
+    return f"Answer this question immediately with just the number: {question}"
+
+
+def mock_completion(prompt: str) -> Completion:
+    """
+    Answers a prompt built by `build_prompt` from the mock tables.
+    
+    Prompts for one of the MATH_PROBLEMS get their MOCK_RESPONSES entry,
+    including its pre-judged correctness; any other question gets a generic
+    short (Zero-Shot) or long (CoT) answer that is graded normally.
+    
+    Args:
+        prompt: The prompt text
+    
+    Returns:
+        The simulated completion
+    """
+    is_cot = prompt.startswith(build_prompt("", is_cot=True))
+    for problem in MATH_PROBLEMS:
+        if prompt == build_prompt(problem["question"], is_cot):
+            response = mock_api_call(problem["id"], is_cot)
+            return Completion(response["text"], prompt_tokens=len(prompt.split()), completion_tokens=response["tokens"],
+                              metadata={"correct": response["correct"]})
+    
+    if is_cot:
+        text = "Let me think step by step. " + "First, I restate the problem. " * 5 + "The answer is 42."
+    else:
+        text = "42"
+    return Completion(text, prompt_tokens=len(prompt.split()), completion_tokens=len(text.split()))
+
+
+def create_backend(name: Optional[str] = None) -> Backend:
+    """
+    Builds the backend selected by BACKEND from this file's configuration.
+    
+    Args:
+        name: "mock", "openai" or "local" (default: BACKEND)
+    
+    Returns:
+        The backend instance
+    """
+    name = name or BACKEND
+    if name == "mock":
+        return MockBackend(mock_completion, time_to_first_token=MOCK_TIME_TO_FIRST_TOKEN,
+                           seconds_per_token=MOCK_SECONDS_PER_TOKEN)
+    if name == "openai":
+        return OpenAICompatibleBackend(
+            api_base=API_BASE,
+            api_key=API_KEY,
+            model_name=MODEL_NAME,
+            temperature=TEMPERATURE,
+            max_concurrency=MAX_CONCURRENCY,
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            tokens_per_minute=TOKENS_PER_MINUTE,
+            estimated_completion_tokens=ESTIMATED_COMPLETION_TOKENS,
+            max_retries=MAX_RETRIES,
+            retry_base_delay=RETRY_BASE_DELAY,
+            retry_max_delay=RETRY_MAX_DELAY,
+            timeout=REQUEST_TIMEOUT,
+            stream=STREAM_RESPONSES
         )
-        
-        text = response['choices'][0]['message']['content']
-        tokens = response['usage']['total_tokens']
-        
-        return {
-            "text": text,
-            "tokens": tokens,
-            "correct": None  # Will be checked separately
-        }
-    except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        return {"text": "", "tokens": 0, "correct": False}
+    if name == "local":
+        return HuggingFaceBackend(
+            model_name=LOCAL_MODEL_NAME,
+            max_new_tokens=MAX_NEW_TOKENS,
+            temperature=TEMPERATURE,
+            max_batch_size=LOCAL_BATCH_SIZE
+        )
+    raise ValueError(f"Unknown backend {name!r}; expected 'mock', 'openai' or 'local'")
 
 
-def get_response(question_id: str, question: str, is_cot: bool) -> Dict:
+def _to_response(completion: Completion) -> Dict:
     """
-    Gets response from either mock or real API based on MOCK_MODE.
+    Converts a completion into the response dictionary used by run_benchmark.
+    
+    Returns:
+        Dictionary with 'text', 'prompt_tokens', 'completion_tokens',
+        'tokens' (their sum), 'correct' and 'error' keys; 'correct' is None
+        unless the backend already judged the answer, and 'error' is None
+        unless the call failed
+    """
+    if completion.error is not None:
+        print(f"Error calling the model: {completion.error}")
+        return {"text": "", "prompt_tokens": 0, "completion_tokens": 0, "tokens": 0, "correct": False,
+                "error": completion.error}
+    return {"text": completion.text, "prompt_tokens": completion.prompt_tokens,
+            "completion_tokens": completion.completion_tokens, "tokens": completion.total_tokens,
+            "correct": completion.metadata.get("correct"), "error": None}
+
+
+def get_response(question_id: str, question: str, is_cot: bool, backend: Optional[Backend] = None,
+                 metrics: Optional[CallMetrics] = None) -> Dict:
+    """
+    Gets one response from a backend (no cache, no batching).
     
     Args:
         question_id: The question ID (Q1, Q2, etc.)
         question: The math problem text
         is_cot: True for Chain-of-Thought, False for Zero-Shot
+        backend: Backend to ask (default: a new one from BACKEND)
+        metrics: Records the call's latency, tokens and cost
     
     Returns:
         Dictionary with response data
     """
-    if MOCK_MODE:
-        return mock_api_call(question_id, is_cot)
-    else:
-        return real_api_call(question, is_cot)
+    backend = backend or create_backend()
+    completion = run_all(backend, [build_prompt(question, is_cot)])[0]
+    if metrics is not None:
+        metrics.record(STRATEGIES[is_cot], completion)
+    return _to_response(completion)
 
 
 def check_correctness(response_text: str, expected_answer: str) -> bool:
     """
-    Checks if the response contains the correct answer.
+    Checks if the response's final answer is the correct answer.
+    
+    Numbers are compared after normalisation ("$0.05", "5 cents" and
+    "second place" all parse), so "15" no longer counts as containing "5".
+    See grading.py; run_benchmark grades whole chunks with grade_batch.
     
     Args:
         response_text: The model's response
@@ -210,134 +391,834 @@ def check_correctness(response_text: str, expected_answer: str) -> bool:
     Returns:
         True if correct, False otherwise
     """
-    # Simple check: see if the expected answer appears in the response
-    return expected_answer.lower() in response_text.lower()
+    return grade(response_text, expected_answer)
+
+
+def audit_mock_labels() -> List[Tuple[str, str, bool]]:
+    """
+    Re-grades MOCK_RESPONSES and lists the canned `correct` flags the grader
+    disagrees with.
+    
+    Returns:
+        (question_id, strategy, canned flag) for every disagreement
+    """
+    answers = {problem["id"]: problem["answer"] for problem in MATH_PROBLEMS}
+    labelled = [(q_id, mode, response) for q_id, modes in MOCK_RESPONSES.items()
+                for mode, response in modes.items()]
+    graded = grade_batch([response["text"] for _, _, response in labelled],
+                         [answers[q_id] for q_id, _, _ in labelled])
+    return [(q_id, mode, response["correct"])
+            for (q_id, mode, response), correct in zip(labelled, graded)
+            if correct != response["correct"]]
 
 
 def extract_token_count(response: Dict) -> int:
     """
-    Extracts token count from response.
+    Extracts the completion token count from a response or record.
+    
+    Records written before prompt and completion tokens were split only
+    have their total, which is used instead.
     
     Args:
         response: Response dictionary
     
     Returns:
-        Number of tokens used
+        Number of completion tokens
     """
-    return response.get("tokens", 0)
+    return response.get("completion_tokens", response.get("tokens", 0))
+
+
+def count_response_tokens(responses: Dict[Tuple, Dict], prompts: Dict[Tuple, str]):
+    """
+    Replaces reported token usage with local counts (TOKEN_COUNTING = "tokenizer").
+    
+    All prompts and response texts are counted in one batched, memoised
+    call; failed calls keep their zero counts.
+    
+    Args:
+        responses: Response dictionaries from fetch_all_responses, updated in place
+        prompts: The prompt sent for each response
+    """
+    keys = [key for key, response in responses.items() if response["text"]]
+    counts = get_counter(TOKENIZER_NAME).count(
+        [prompts[key] for key in keys] + [responses[key]["text"] for key in keys]
+    )
+    for key, prompt_tokens, completion_tokens in zip(keys, counts, counts[len(keys):]):
+        responses[key].update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              tokens=prompt_tokens + completion_tokens)
 
 
 # ============================================================================
-# MAIN EXECUTION
+# RESPONSE CACHE
 # ============================================================================
 
-def run_benchmark() -> Dict:
+class ResponseCache:
     """
-    Runs the full benchmark comparing Zero-Shot vs Explicit CoT.
+    Persistent SQLite cache of model responses.
     
-    Returns:
-        Dictionary containing all results
+    Entries are keyed by the exact prompt text, backend, endpoint, model
+    name, temperature, completion token limit and `STRATEGY_VERSION`, so a
+    run against mock_api_server.py never answers a later real run, and
+    store the response text, token usage and latency.
+    `mode` is one of CACHE_MODE's values. Entries older than `ttl` seconds are
+    treated as misses; beyond `max_entries`, the least recently used entries
+    are deleted.
+    
+    Only used from the event loop thread, so one connection is enough.
     """
-    print("=" * 70)
-    print("THINKING COST BENCHMARK - Explicit CoT vs Zero-Shot")
-    print("=" * 70)
-    print(f"\nMode: {'MOCK (Simulated)' if MOCK_MODE else 'REAL API'}")
-    print(f"\nRunning benchmark on {len(MATH_PROBLEMS)} math problems...\n")
     
-    results = {
-        "question_ids": [],
-        "questions": [],
-        "expected_answers": [],
-        "zero_shot": {
-            "tokens": [],
-            "correct": [],
-            "responses": []
-        },
-        "cot": {
-            "tokens": [],
-            "correct": [],
-            "responses": []
-        }
-    }
+    MODES = ("read_through", "write_only", "bypass")
     
-    for problem in MATH_PROBLEMS:
-        q_id = problem["id"]
-        question = problem["question"]
-        expected = problem["answer"]
-        
-        print(f"\n{q_id}: {question[:60]}...")
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, mode: str = CACHE_MODE,
+                 ttl: Optional[float] = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES,
+                 model: str = MODEL_NAME, temperature: float = TEMPERATURE, backend: str = BACKEND,
+                 endpoint: Optional[str] = None, max_tokens: Optional[int] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}; expected one of {self.MODES}")
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model = model
+        self.temperature = temperature
+        self.backend = backend
+        self.endpoint = endpoint
+        self.max_tokens = max_tokens
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._conn = None
+        if mode != "bypass":
+            self._conn = sqlite3.connect(path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, temperature REAL, strategy_version TEXT, "
+                "prompt TEXT, text TEXT, tokens INTEGER, latency REAL, created REAL, last_used REAL, "
+                "prompt_tokens INTEGER, completion_tokens INTEGER, backend TEXT, endpoint TEXT, max_tokens INTEGER)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+            # Caches written before tokens were split, or before backend and endpoint were recorded
+            for column, kind in (("prompt_tokens", "INTEGER"), ("completion_tokens", "INTEGER"),
+                                 ("backend", "TEXT"), ("endpoint", "TEXT"), ("max_tokens", "INTEGER")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE responses ADD COLUMN {column} {kind}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._conn.commit()
+    
+    @classmethod
+    def for_backend(cls, backend: Backend, **kwargs) -> "ResponseCache":
+        """
+        A cache for the requests a backend makes: its name, endpoint
+        (`api_base`, if any), model and completion token limit
+        (`max_tokens` or `max_new_tokens`, if any).
+        """
+        max_tokens = getattr(backend, "max_tokens", getattr(backend, "max_new_tokens", None))
+        return cls(model=backend.model_name, backend=backend.name, endpoint=getattr(backend, "api_base", None),
+                   max_tokens=max_tokens, **kwargs)
+    
+    def key(self, prompt: str, sample: int = 0) -> str:
+        """
+        Hashes one request for this cache's backend, endpoint, model,
+        temperature and token limit.
         
-        # Zero-Shot Pass
-        zero_shot_response = get_response(q_id, question, is_cot=False)
-        zero_shot_tokens = extract_token_count(zero_shot_response)
+        Args:
+            prompt: The exact prompt text
+            sample: Which sample of the prompt (self-consistency draws several);
+                sample 0 is the ordinary single call
         
-        if MOCK_MODE:
-            zero_shot_correct = zero_shot_response["correct"]
-        else:
-            zero_shot_correct = check_correctness(zero_shot_response["text"], expected)
+        Returns:
+            Hex digest identifying the request
+        """
+        request = [prompt, self.backend, self.endpoint, self.model, self.temperature, self.max_tokens, STRATEGY_VERSION]
+        if sample > 0:
+            request.append(sample)
+        payload = json.dumps(request)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, prompt: str, sample: int = 0) -> Optional[Dict]:
+        """
+        Looks up the response to a prompt (read-through mode only).
         
-        print(f"  Zero-Shot: {zero_shot_tokens} tokens | {'✓ Correct' if zero_shot_correct else '✗ Wrong'}")
+        Returns:
+            Dictionary with 'text', 'prompt_tokens', 'completion_tokens',
+            'tokens' and 'latency' keys, or None on a miss
+        """
+        if self.mode != "read_through":
+            return None
+        key = self.key(prompt, sample)
+        row = self._conn.execute(
+            "SELECT text, tokens, latency, created, prompt_tokens, completion_tokens FROM responses WHERE key = ?",
+            (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (self.ttl is not None and now - row[3] > self.ttl):
+            self.misses += 1
+            return None
         
-        # Explicit CoT Pass
-        cot_response = get_response(q_id, question, is_cot=True)
-        cot_tokens = extract_token_count(cot_response)
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        text, tokens, latency, _, prompt_tokens, completion_tokens = row
+        if completion_tokens is None:  # Entries from before the split only have the total
+            prompt_tokens, completion_tokens = 0, tokens
+        return {"text": text, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "tokens": tokens, "latency": latency}
+    
+    def put(self, prompt: str, completion: Completion, sample: int = 0):
+        """
+        Stores a successful completion, evicting old entries if needed.
         
-        if MOCK_MODE:
-            cot_correct = cot_response["correct"]
+        Args:
+            prompt: The exact prompt text that was sent
+            completion: The backend's completion
+            sample: Which sample of the prompt this is
+        """
+        if self.mode == "bypass":
+            return
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, temperature, strategy_version, prompt, text, "
+            "tokens, latency, created, last_used, prompt_tokens, completion_tokens, backend, endpoint, max_tokens) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.key(prompt, sample), self.model, self.temperature, STRATEGY_VERSION, prompt, completion.text,
+             completion.total_tokens, completion.latency, now, now, completion.prompt_tokens,
+             completion.completion_tokens, self.backend, self.endpoint, self.max_tokens)
+        )
+        self._evict(now)
+        self._conn.commit()
+        self.writes += 1
+    
+    def _evict(self, now: float):
+        """Drops expired entries, then the least recently used ones above `max_entries`."""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+            )
+    
+    def invalidate(self):
+        """Deletes every cached entry."""
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+    
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dictionary with 'mode', 'hits', 'misses' and 'writes' counters
+        """
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "writes": self.writes}
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ============================================================================
+# CONCURRENT EXECUTION ENGINE
+# ============================================================================
+
+async def fetch_all_responses(problems: List[Dict], backend: Backend,
+                              cache: Optional[ResponseCache] = None,
+                              skip: Optional[Set[Tuple[str, str]]] = None,
+                              metrics: Optional[CallMetrics] = None) -> Dict[Tuple[str, bool], Dict]:
+    """
+    Gets the Zero-Shot and CoT responses for every problem concurrently.
+    
+    Args:
+        problems: Problems in MATH_PROBLEMS format
+        backend: Backend that answers the prompts, driven at its declared
+            batch size and concurrency
+        cache: Response cache consulted before, and filled after, each call
+        skip: (question_id, strategy) pairs that are already recorded
+        metrics: Records the latency, tokens and cost of every model call
+            (cached answers are not calls)
+    
+    Returns:
+        Dictionary mapping (question_id, is_cot) to a response dictionary
+        with 'text', 'prompt_tokens', 'completion_tokens', 'tokens',
+        'correct' and 'error' keys. With TOKEN_COUNTING = "tokenizer" the
+        token counts are local tokenizer counts, otherwise the backend's usage
+    """
+    skip = skip or set()
+    calls = [
+        ((problem["id"], is_cot), build_prompt(problem["question"], is_cot), STRATEGIES[is_cot], 0)
+        for problem in problems for is_cot in (False, True)
+        if (problem["id"], STRATEGIES[is_cot]) not in skip
+    ]
+    return await fetch_calls(calls, backend, cache, metrics)
+
+
+async def fetch_calls(calls: List[Tuple[Tuple, str, str, int]], backend: Backend,
+                      cache: Optional[ResponseCache] = None,
+                      metrics: Optional[CallMetrics] = None) -> Dict[Tuple, Dict]:
+    """
+    Answers a list of calls concurrently, from the cache where possible.
+    
+    Args:
+        calls: (key, prompt, strategy, sample index) per call. Calls that
+            repeat a prompt to sample it again need distinct sample indices,
+            so each sample gets its own cache entry
+        backend: Backend that answers the prompts
+        cache: Response cache consulted before, and filled after, each call
+        metrics: Records every model call under its strategy
+    
+    Returns:
+        Dictionary mapping each key to a response dictionary (see fetch_all_responses)
+    """
+    responses = {}
+    prompts = {}
+    pending = []
+    for key, prompt, strategy, sample in calls:
+        prompts[key] = prompt
+        cached = cache.get(prompt, sample) if cache is not None else None
+        if cached is not None:
+            responses[key] = {
+                "text": cached["text"], "prompt_tokens": cached["prompt_tokens"],
+                "completion_tokens": cached["completion_tokens"], "tokens": cached["tokens"], "correct": None,
+                "error": None
+            }
         else:
-            cot_correct = check_correctness(cot_response["text"], expected)
-        
-        print(f"  Explicit CoT: {cot_tokens} tokens | {'✓ Correct' if cot_correct else '✗ Wrong'}")
-        
-        # Store results
-        results["question_ids"].append(q_id)
-        results["questions"].append(question)
-        results["expected_answers"].append(expected)
-        
-        results["zero_shot"]["tokens"].append(zero_shot_tokens)
-        results["zero_shot"]["correct"].append(zero_shot_correct)
-        results["zero_shot"]["responses"].append(zero_shot_response["text"])
+            pending.append((key, prompt, strategy, sample))
+    if not pending:
+        if calls:
+            print(f"All {len(calls)} responses served from the cache")
+        if TOKEN_COUNTING == "tokenizer":
+            count_response_tokens(responses, prompts)
+        return responses
+    
+    def store(index: int, completion: Completion):
+        if cache is not None and completion.error is None:
+            _, prompt, _, sample = pending[index]
+            cache.put(prompt, completion, sample)  # Failed calls are never cached
+    
+    start = time.perf_counter()
+    completions = await generate_all(backend, [prompt for _, prompt, _, _ in pending], on_complete=store)
+    elapsed = time.perf_counter() - start
+    
+    retries = getattr(backend, "retries", 0)
+    if backend.name != "mock":
+        print(f"Completed {len(pending)} model calls in {elapsed:.1f}s "
+              f"({len(pending) / max(elapsed, 1e-9):.1f} calls/s, {retries} retries, "
+              f"{len(calls) - len(pending)} cached)")
+    if isinstance(backend, HuggingFaceBackend):
+        print(f"Local generation: {backend.generated_tokens} tokens at {backend.tokens_per_second:.1f} tokens/s")
+    responses.update({key: _to_response(completion) for (key, _, _, _), completion in zip(pending, completions)})
+    if TOKEN_COUNTING == "tokenizer":
+        count_response_tokens(responses, prompts)
+    if metrics is not None:
+        for (key, _, strategy, _), completion in zip(pending, completions):
+            response = responses[key]
+            metrics.record(strategy, completion, response["prompt_tokens"], response["completion_tokens"])
+    return responses
+
+
+# ============================================================================
+# SELF-CONSISTENCY
+# ============================================================================
+
+SELF_CONSISTENCY = "self_consistency"  # Strategy key used in records
+
+
+def mock_sampler() -> Callable[[str], Completion]:
+    """
+    Builds a mock respond function that samples like a model at temperature > 0.
+    
+    Each repeat of a prompt for one of the MATH_PROBLEMS answers with the
+    MOCK_RESPONSES CoT text, except that with MOCK_SAMPLE_ERROR_RATE it slips
+    to the Zero-Shot text instead. Draws are seeded by the prompt and repeat
+    number, so runs are reproducible.
+    """
+    seen: Dict[str, int] = {}
+    
+    def respond(prompt: str) -> Completion:
+        repeat = seen.get(prompt, 0)
+        seen[prompt] = repeat + 1
+        for problem in MATH_PROBLEMS:
+            if prompt == build_prompt(problem["question"], is_cot=True):
+                slip = random.Random(f"{prompt}:{repeat}").random() < MOCK_SAMPLE_ERROR_RATE
+                response = mock_api_call(problem["id"], is_cot=not slip)
+                return Completion(response["text"], prompt_tokens=len(prompt.split()),
+                                  completion_tokens=response["tokens"])
+        return mock_completion(prompt)
+    
+    return respond
+
+
+async def fetch_self_consistency(problems: List[Dict], backend: Backend,
+                                 cache: Optional[ResponseCache] = None,
+                                 first_samples: Optional[Dict[str, Dict]] = None,
+                                 skip: Optional[Set[Tuple[str, str]]] = None,
+                                 metrics: Optional[CallMetrics] = None) -> Dict[str, Dict]:
+    """
+    Majority-votes up to SELF_CONSISTENCY_SAMPLES CoT samples per problem.
+    
+    Samples are drawn in waves: SELF_CONSISTENCY_MIN_SAMPLES first, then
+    SELF_CONSISTENCY_WAVE more per problem whose vote is not yet settled
+    (`grading.vote_settled`). Every wave goes to the backend as one
+    concurrent batch across all unsettled problems, so easy questions stop
+    after a few samples while hard ones keep sampling.
+    
+    Args:
+        problems: Problems in MATH_PROBLEMS format
+        backend: Backend to sample from (should sample, i.e. temperature > 0)
+        cache: Response cache; sample i of a prompt is cached under index i
+        first_samples: Already-drawn CoT response per question ID, used as
+            sample 0 instead of a new call
+        skip: (question_id, strategy) pairs that are already recorded
+        metrics: Records every sampling call
+    
+    Returns:
+        Dictionary mapping question ID to a response dictionary with the
+        winning sample's 'text', the token counts summed over all samples,
+        'correct' (None, to be graded), 'samples', 'votes', 'answer' and
+        'error'. Failed samples do not vote or count as samples; 'error' is
+        set only when every sample failed
+    """
+    skip = skip or set()
+    first_samples = first_samples or {}
+    problems = [problem for problem in problems if (problem["id"], SELF_CONSISTENCY) not in skip]
+    samples: Dict[str, List[Dict]] = {}
+    for problem in problems:
+        first = first_samples.get(problem["id"])
+        samples[problem["id"]] = [first] if first is not None and first["text"] else []
+    
+    active = list(problems)
+    while active:
+        calls = []
+        for problem in active:
+            drawn = len(samples[problem["id"]])
+            wanted = SELF_CONSISTENCY_MIN_SAMPLES - drawn if drawn < SELF_CONSISTENCY_MIN_SAMPLES else SELF_CONSISTENCY_WAVE
+            prompt = build_prompt(problem["question"], is_cot=True)
+            calls += [((problem["id"], sample), prompt, SELF_CONSISTENCY, sample)
+                      for sample in range(drawn, min(drawn + wanted, SELF_CONSISTENCY_SAMPLES))]
+        responses = await fetch_calls(calls, backend, cache, metrics)
+        for (q_id, sample), response in sorted(responses.items(), key=lambda item: item[0][1]):
+            samples[q_id].append(response)
         
-        results["cot"]["tokens"].append(cot_tokens)
-        results["cot"]["correct"].append(cot_correct)
-        results["cot"]["responses"].append(cot_response["text"])
+        still_active = []
+        for problem in active:
+            drawn = samples[problem["id"]]
+            _, votes = majority_vote([response["text"] for response in drawn])
+            if len(drawn) < SELF_CONSISTENCY_SAMPLES and not vote_settled(
+                    votes, SELF_CONSISTENCY_SAMPLES - len(drawn), SELF_CONSISTENCY_CONFIDENCE):
+                still_active.append(problem)
+        active = still_active
     
+    results = {}
+    for problem in problems:
+        drawn = samples[problem["id"]]
+        answered = [response for response in drawn if response.get("error") is None]
+        winner, votes = majority_vote([response["text"] for response in answered])
+        prompt_tokens = sum(response["prompt_tokens"] for response in answered)
+        completion_tokens = sum(response["completion_tokens"] for response in answered)
+        results[problem["id"]] = {
+            "text": answered[winner]["text"] if winner is not None else "",
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens": prompt_tokens + completion_tokens,
+            "correct": None if winner is not None else False,
+            "samples": len(answered),
+            "votes": dict(votes),
+            "answer": votes.most_common(1)[0][0] if votes else None,
+            "error": None if answered else next((r["error"] for r in drawn if r.get("error")), "No samples drawn")
+        }
     return results
 
 
-def print_summary(results: Dict):
+# ============================================================================
+# STREAMING RESULTS
+# ============================================================================
+
+STRATEGIES = {False: "zero_shot", True: "cot"}  # is_cot -> strategy key used in records
+
+
+def results_path(backend: Backend) -> str:
+    """
+    Returns the JSONL results file for a backend, model and strategy version.
+    
+    Runs with different settings write to different files, so resuming never
+    mixes them.
+    """
+    name = f"{backend.name}-{backend.model_name}-{STRATEGY_VERSION}"
+    return os.path.join(RESULTS_DIR, re.sub(r"[^\w.-]+", "_", name) + ".jsonl")
+
+
+def load_records(path: str) -> Iterator[Dict]:
+    """
+    Streams the records of a results file, one call per record.
+    
+    A truncated last line (from a crash mid-write) is skipped.
+    
+    Yields:
+        Dictionaries with 'question_id', 'question', 'expected', 'strategy',
+        'text', 'prompt_tokens', 'completion_tokens', 'tokens', 'correct' and
+        'error' keys (records from older runs have only 'tokens', and no
+        'error'). Failed calls are recorded too; see `succeeded`
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def succeeded(record: Dict) -> bool:
+    """
+    Whether a record holds a real answer rather than a failed call.
+    
+    Failed calls are kept in the results file for inspection, but they are
+    left out of totals and plots and retried on the next run.
+    """
+    return record.get("error") is None
+
+
+class ResultsWriter:
+    """
+    Appends records to a JSONL file, flushing after each one.
+    
+    A partial last line left by a crash is cut off before appending, so the
+    file always holds whole records.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._repair()
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def _repair(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+    
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+
+def load_results(path: str, max_questions: Optional[int] = None) -> Dict:
+    """
+    Loads a results file into per-question lists for plotting.
+    
+    Only questions with both a Zero-Shot and a CoT answer are included, in
+    the order they were first recorded; failed calls are skipped. Reading stops at the first new
+    question after `max_questions` complete ones.
+    
+    Returns:
+        Dictionary with 'question_ids', 'questions', 'expected_answers' and,
+        for 'zero_shot', 'cot' and 'self_consistency', parallel 'tokens'
+        (completion tokens), 'correct' and 'responses' lists. Questions
+        without a self-consistency record have None in its lists
+    """
+    by_question: Dict[str, Dict] = {}
+    complete = 0
+    for record in load_records(path):
+        if not succeeded(record):
+            continue
+        if record["question_id"] not in by_question and max_questions is not None and complete >= max_questions:
+            break
+        records = by_question.setdefault(record["question_id"], {})
+        records[record["strategy"]] = record
+        if record["strategy"] in STRATEGIES.values() and all(strategy in records for strategy in STRATEGIES.values()):
+            complete += 1
+    
+    results = {
+        "question_ids": [],
+        "questions": [],
+        "expected_answers": [],
+        "zero_shot": {"tokens": [], "correct": [], "responses": []},
+        "cot": {"tokens": [], "correct": [], "responses": []},
+        SELF_CONSISTENCY: {"tokens": [], "correct": [], "responses": []}
+    }
+    for q_id, records in by_question.items():
+        if not all(strategy in records for strategy in STRATEGIES.values()):
+            continue
+        results["question_ids"].append(q_id)
+        results["questions"].append(records["cot"]["question"])
+        results["expected_answers"].append(records["cot"]["expected"])
+        for strategy in list(STRATEGIES.values()) + [SELF_CONSISTENCY]:
+            record = records.get(strategy)
+            results[strategy]["tokens"].append(None if record is None else extract_token_count(record))
+            results[strategy]["correct"].append(None if record is None else record["correct"])
+            results[strategy]["responses"].append(None if record is None else record["text"])
+    return results
+
+
+class RunningSummary:
+    """
+    Token and accuracy totals per strategy, updated one record at a time.
+    
+    Holds only counters, so memory does not grow with the number of
+    questions, and it can be printed at any point of a (partial) run.
+    Failed calls are only counted in `failed`; they are retried on resume.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.totals = {
+            strategy: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "correct": 0, "samples": 0}
+            for strategy in list(STRATEGIES.values()) + [SELF_CONSISTENCY]
+        }
+        self.cache = None  # Response cache counters, when a cache was used
+        self.grading = None  # Grader throughput, when responses were graded
+        self.token_counting = None  # How this run counted tokens
+        self.metrics = None  # CallMetrics of the calls made in this run (not resumed ones)
+        self.failed = 0  # Failed calls recorded (left out of the totals, retried on resume)
+    
+    @classmethod
+    def from_file(cls, path: str) -> "RunningSummary":
+        """Rebuilds the totals of an existing results file."""
+        summary = cls(path)
+        for record in load_records(path):
+            summary.update(record)
+        return summary
+    
+    def update(self, record: Dict):
+        if not succeeded(record):
+            self.failed += 1
+            return
+        totals = self.totals[record["strategy"]]
+        totals["calls"] += 1
+        completion_tokens = extract_token_count(record)
+        totals["completion_tokens"] += completion_tokens
+        totals["prompt_tokens"] += record.get("prompt_tokens", record["tokens"] - completion_tokens)
+        totals["correct"] += bool(record["correct"])
+        totals["samples"] += record.get("samples", 1)
+    
+    def multiplier(self, strategy: str) -> float:
+        """A strategy's completion tokens per Zero-Shot completion token."""
+        zero_shot_tokens = self.totals["zero_shot"]["completion_tokens"]
+        return self.totals[strategy]["completion_tokens"] / zero_shot_tokens if zero_shot_tokens > 0 else 0
+    
+    @property
+    def token_multiplier(self) -> float:
+        """
+        CoT completion tokens per Zero-Shot completion token (0 before any
+        Zero-Shot tokens). Prompt tokens are left out: they are nearly the
+        same for both strategies and would dilute the cost of reasoning.
+        """
+        return self.multiplier("cot")
+    
+    def accuracy(self, strategy: str) -> float:
+        """Percentage of recorded calls answered correctly."""
+        totals = self.totals[strategy]
+        return totals["correct"] / totals["calls"] * 100 if totals["calls"] > 0 else 0
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run_benchmark(problems: Optional[Iterable[Dict]] = None) -> RunningSummary:
+    """
+    Runs the full benchmark comparing Zero-Shot vs Explicit CoT.
+    
+    Problems are pulled from the (possibly lazy) problem stream
+    RESULTS_CHUNK_SIZE at a time, so memory does not depend on the size of
+    the problem set. Every finished call
+    is appended to the results file and folded into the running totals
+    straight away, so a crash loses nothing already answered. With RESUME,
+    calls already answered in the file are skipped; failed calls are
+    recorded with their error and retried.
+    
+    Args:
+        problems: Problems in MATH_PROBLEMS format, as a list or generator
+            (default: load_problems())
+    
+    Returns:
+        Running totals; the per-call records are in `summary.path`
+    """
+    problems = load_problems() if problems is None else problems
+    
+    print("=" * 70)
+    print("THINKING COST BENCHMARK - Explicit CoT vs Zero-Shot")
+    print("=" * 70)
+    backend = create_backend()
+    print(f"\nBackend: {backend.name} ({backend.model_name})")
+    if backend.name == "mock":
+        for q_id, strategy, flag in audit_mock_labels():
+            print(f"  Warning: mock {q_id} {strategy} is labelled {'correct' if flag else 'wrong'}, the grader disagrees")
+    if isinstance(problems, list):
+        print(f"\nRunning benchmark on {len(problems)} math problems...\n")
+    else:
+        print(f"\nRunning benchmark on problems streamed from {DATASET_PATH}...\n")
+    
+    path = results_path(backend)
+    if not RESUME and os.path.exists(path):
+        os.remove(path)
+    summary = RunningSummary.from_file(path)
+    done = {(record["question_id"], record["strategy"]) for record in load_records(path) if succeeded(record)}
+    if done:
+        print(f"Resuming: {len(done)} calls already answered in {path}")
+    summary.failed = 0  # Failures of earlier runs are retried in this one
+    
+    # Each chunk's calls are sent concurrently; cached answers are reused
+    cache = None
+    if backend.name != "mock" and CACHE_MODE != "bypass":
+        cache = ResponseCache.for_backend(backend)
+    writer = ResultsWriter(path)
+    metrics = CallMetrics(PRICE_PER_MILLION_PROMPT_TOKENS, PRICE_PER_MILLION_COMPLETION_TOKENS)
+    # Self-consistency samples from the same backend; the mock needs one that varies its answers
+    sampler = backend
+    if SELF_CONSISTENCY_SAMPLES > 0 and backend.name == "mock":
+        sampler = MockBackend(mock_sampler(), time_to_first_token=MOCK_TIME_TO_FIRST_TOKEN,
+                              seconds_per_token=MOCK_SECONDS_PER_TOKEN)
+    kinds = [(False, "Zero-Shot"), (True, "Explicit CoT")]
+    if SELF_CONSISTENCY_SAMPLES > 0:
+        kinds.append((SELF_CONSISTENCY, "Self-Consistency"))
+    try:
+        stream = iter(problems)
+        while True:
+            chunk = list(itertools.islice(stream, RESULTS_CHUNK_SIZE))
+            if not chunk:
+                break
+            responses = asyncio.run(fetch_all_responses(chunk, backend, cache, skip=done, metrics=metrics))
+            if SELF_CONSISTENCY_SAMPLES > 0:
+                # Each question's CoT answer doubles as its first self-consistency sample
+                first_samples = {q_id: response for (q_id, is_cot), response in responses.items() if is_cot}
+                voted = asyncio.run(fetch_self_consistency(chunk, sampler, cache, first_samples, skip=done,
+                                                           metrics=metrics))
+                responses.update({(q_id, SELF_CONSISTENCY): response for q_id, response in voted.items()})
+            
+            # The mock backend's answers come pre-judged; the rest are graded together
+            ungraded = [(problem, (problem["id"], kind)) for problem in chunk for kind, _ in kinds
+                        if (problem["id"], kind) in responses and responses[(problem["id"], kind)]["correct"] is None]
+            graded = grade_batch([responses[key]["text"] for _, key in ungraded],
+                                 [problem["answer"] for problem, _ in ungraded])
+            for (_, key), correct in zip(ungraded, graded):
+                responses[key]["correct"] = bool(correct)
+            
+            for problem in chunk:
+                q_id = problem["id"]
+                if not any((q_id, kind) in responses for kind, _ in kinds):
+                    continue
+                print(f"\n{q_id}: {problem['question'][:60]}...")
+                
+                for kind, label in kinds:
+                    response = responses.get((q_id, kind))
+                    if response is None:
+                        continue
+                    tokens = extract_token_count(response)
+                    correct = response["correct"]
+                    
+                    votes = ""
+                    if kind == SELF_CONSISTENCY:
+                        top = max(response["votes"].values(), default=0)
+                        votes = f" ({response['samples']} samples, {top} votes for the winner)"
+                    if response["error"] is not None:
+                        print(f"  {label}: failed ({response['error'][:60]}), retried on the next run")
+                    else:
+                        print(f"  {label}: {tokens} tokens{votes} | {'✓ Correct' if correct else '✗ Wrong'}")
+                    
+                    record = {
+                        "question_id": q_id,
+                        "question": problem["question"],
+                        "expected": problem["answer"],
+                        "strategy": STRATEGIES.get(kind, kind),
+                        "text": response["text"],
+                        "prompt_tokens": response["prompt_tokens"],
+                        "completion_tokens": tokens,
+                        "tokens": response["prompt_tokens"] + tokens,
+                        "correct": correct,
+                        "error": response["error"]
+                    }
+                    if kind == SELF_CONSISTENCY:
+                        record.update(samples=response["samples"], votes=response["votes"])
+                    writer.write(record)
+                    summary.update(record)
+    finally:
+        writer.close()
+        backend.close()
+        if sampler is not backend:
+            sampler.close()
+        if cache is not None:
+            cache.close()
+            summary.cache = cache.stats()
+        if TOKEN_COUNTING == "tokenizer":
+            # A fully resumed run counted nothing, so it never loads the tokenizer
+            counter = get_counter(TOKENIZER_NAME)
+            summary.token_counting = counter.description if counter.used else None
+        else:
+            summary.token_counting = f"{backend.name} usage"
+        if metrics.strategies:
+            summary.metrics = metrics
+            metrics.to_json(os.path.splitext(path)[0] + ".metrics.json")
+            metrics.write_prometheus(os.path.splitext(path)[0] + ".prom")
+        if backend.name != "mock":
+            summary.grading = {"graded": GRADING_STATS["graded"], "per_second": grading_throughput()}
+    
+    return summary
+
+
+def print_summary(summary: RunningSummary):
     """
     Prints a summary of the benchmark results.
     
+    Works on partial runs too: accuracy is over the calls recorded so far.
+    
     Args:
-        results: Results dictionary from run_benchmark()
+        summary: Running totals from run_benchmark() or RunningSummary.from_file()
     """
     print("\n" + "=" * 70)
     print("SUMMARY")
     print("=" * 70)
     
-    # Calculate totals
-    total_zero_shot_tokens = sum(results["zero_shot"]["tokens"])
-    total_cot_tokens = sum(results["cot"]["tokens"])
+    zero_shot = summary.totals["zero_shot"]
+    cot = summary.totals["cot"]
+    voted = summary.totals[SELF_CONSISTENCY]
     
-    zero_shot_correct_count = sum(results["zero_shot"]["correct"])
-    cot_correct_count = sum(results["cot"]["correct"])
+    zero_shot_accuracy = summary.accuracy("zero_shot")
+    cot_accuracy = summary.accuracy("cot")
+    token_multiplier = summary.token_multiplier
     
-    total_questions = len(results["question_ids"])
+    counted_with = f" ({summary.token_counting})" if summary.token_counting else ""
+    print(f"\n📊 Token Usage{counted_with}:")
+    print(f"  Zero-Shot:    {zero_shot['completion_tokens']} completion tokens (+{zero_shot['prompt_tokens']} prompt)")
+    print(f"  Explicit CoT: {cot['completion_tokens']} completion tokens (+{cot['prompt_tokens']} prompt)")
+    print(f"  Multiplier:   {token_multiplier:.2f}x (CoT uses {token_multiplier:.2f}x more tokens)")
+    if voted["calls"]:
+        print(f"  Self-Consistency: {voted['completion_tokens']} completion tokens (+{voted['prompt_tokens']} prompt), "
+              f"{summary.multiplier(SELF_CONSISTENCY):.2f}x Zero-Shot")
     
-    zero_shot_accuracy = (zero_shot_correct_count / total_questions) * 100
-    cot_accuracy = (cot_correct_count / total_questions) * 100
+    print(f"\n✓ Accuracy:")
+    print(f"  Zero-Shot:    {zero_shot['correct']}/{zero_shot['calls']} = {zero_shot_accuracy:.0f}%")
+    print(f"  Explicit CoT: {cot['correct']}/{cot['calls']} = {cot_accuracy:.0f}%")
+    if summary.failed:
+        print(f"  ({summary.failed} failed calls are left out; re-run with RESUME to retry them)")
+    if voted["calls"]:
+        print(f"  Self-Consistency: {voted['correct']}/{voted['calls']} = {summary.accuracy(SELF_CONSISTENCY):.0f}%")
+        fixed = voted["calls"] * SELF_CONSISTENCY_SAMPLES
+        if fixed:
+            print(f"  Early stopping drew {voted['samples']} of {fixed} samples "
+                  f"({1 - voted['samples'] / fixed:.0%} fewer than a fixed {SELF_CONSISTENCY_SAMPLES} per question)")
     
-    token_multiplier = total_cot_tokens / total_zero_shot_tokens if total_zero_shot_tokens > 0 else 0
+    cache_stats = summary.cache
+    if cache_stats is not None:
+        print(f"\n🗄  Response Cache ({cache_stats['mode']}):")
+        print(f"  Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | Writes: {cache_stats['writes']}")
     
-    print(f"\n📊 Token Usage:")
-    print(f"  Zero-Shot:    {total_zero_shot_tokens} tokens")
-    print(f"  Explicit CoT: {total_cot_tokens} tokens")
-    print(f"  Multiplier:   {token_multiplier:.2f}x (CoT uses {token_multiplier:.2f}x more tokens)")
+    if summary.metrics is not None:
+        print(f"\n⏱  Latency and Cost (model calls made in this run):")
+        for line in summary.metrics.report_lines(baseline="zero_shot"):
+            print(f"  {line}")
     
-    print(f"\n✓ Accuracy:")
-    print(f"  Zero-Shot:    {zero_shot_correct_count}/{total_questions} = {zero_shot_accuracy:.0f}%")
-    print(f"  Explicit CoT: {cot_correct_count}/{total_questions} = {cot_accuracy:.0f}%")
+    grading_stats = summary.grading
+    if grading_stats is not None and grading_stats["graded"]:
+        print(f"\n🧮 Grading: {grading_stats['graded']} responses at {grading_stats['per_second']:,.0f} responses/s")
     
     print(f"\n💡 Key Insight:")
     print(f"  Explicit CoT improves accuracy by {cot_accuracy - zero_shot_accuracy:.0f}% but costs {token_multiplier:.2f}x more tokens.")
@@ -353,7 +1234,7 @@ def create_visualization(results: Dict):
     Creates a dual-axis chart showing token usage vs accuracy.
     
     Args:
-        results: Results dictionary from run_benchmark()
+        results: Per-question results from load_results()
     """
     print("\n" + "=" * 70)
     print("Creating visualization...")
@@ -362,26 +1243,30 @@ def create_visualization(results: Dict):
     # Prepare data
     question_ids = results["question_ids"]
     x_pos = np.arange(len(question_ids))
-    width = 0.35  # Width of bars
-    
-    zero_shot_tokens = results["zero_shot"]["tokens"]
-    cot_tokens = results["cot"]["tokens"]
-    
-    zero_shot_correct = results["zero_shot"]["correct"]
-    cot_correct = results["cot"]["correct"]
+    series = [("zero_shot", 'Zero-Shot', '#3498db'), ("cot", 'Explicit CoT', '#e74c3c')]
+    voted_tokens = results[SELF_CONSISTENCY]["tokens"]
+    if voted_tokens and all(tokens is not None for tokens in voted_tokens):
+        series.append((SELF_CONSISTENCY, 'Self-Consistency (all samples)', '#8e44ad'))
+    width = 0.7 / len(series)  # Width of bars
     
     # Create figure with dual axes
     fig, ax1 = plt.subplots(figsize=(12, 6))
     
     # Primary axis: Token count (bars)
     ax1.set_xlabel('Question ID', fontsize=12, fontweight='bold')
-    ax1.set_ylabel('Token Count', fontsize=12, fontweight='bold', color='black')
+    ax1.set_ylabel('Completion Tokens', fontsize=12, fontweight='bold', color='black')
     
-    # Plot bars
-    bars1 = ax1.bar(x_pos - width/2, zero_shot_tokens, width, 
-                    label='Zero-Shot', color='#3498db', alpha=0.8)
-    bars2 = ax1.bar(x_pos + width/2, cot_tokens, width,
-                    label='Explicit CoT', color='#e74c3c', alpha=0.8)
+    # Plot bars, each with a correctness marker on top
+    bars = []
+    for n, (strategy, label, bar_color) in enumerate(series):
+        offset = (n - (len(series) - 1) / 2) * width
+        tokens = results[strategy]["tokens"]
+        bars.append(ax1.bar(x_pos + offset, tokens, width, label=label, color=bar_color, alpha=0.8))
+        for i, correct in enumerate(results[strategy]["correct"]):
+            marker = '✓' if correct else '✗'
+            color = '#27ae60' if correct else '#c0392b'
+            ax1.text(x_pos[i] + offset, tokens[i] + 1, marker,
+                    ha='center', va='bottom', fontsize=16, color=color, fontweight='bold')
     
     ax1.set_xticks(x_pos)
     ax1.set_xticklabels(question_ids)
@@ -394,27 +1279,9 @@ def create_visualization(results: Dict):
     ax2.set_ylim(0, 1.5)
     ax2.set_yticks([])
     
-    # Add correctness markers on top of each bar
-    for i, (zs_correct, cot_correct) in enumerate(zip(zero_shot_correct, cot_correct)):
-        # Zero-shot marker - position on top of zero-shot bar
-        marker = '✓' if zs_correct else '✗'
-        color = '#27ae60' if zs_correct else '#c0392b'
-        bar_height = zero_shot_tokens[i]
-        ax1.text(x_pos[i] - width/2, bar_height + 1, marker, 
-                ha='center', va='bottom', fontsize=16, color=color, fontweight='bold')
-        
-        # CoT marker - position on top of CoT bar
-        marker = '✓' if cot_correct else '✗'
-        color = '#27ae60' if cot_correct else '#c0392b'
-        bar_height = cot_tokens[i]
-        ax1.text(x_pos[i] + width/2, bar_height + 1, marker,
-                ha='center', va='bottom', fontsize=16, color=color, fontweight='bold')
-    
     # Add legend elements for markers
     from matplotlib.patches import Patch
-    legend_elements = [
-        bars1,
-        bars2,
+    legend_elements = bars + [
         Patch(facecolor='white', edgecolor='#27ae60', label='✓ Correct'),
         Patch(facecolor='white', edgecolor='#c0392b', label='✗ Incorrect')
     ]
@@ -438,20 +1305,20 @@ def create_visualization(results: Dict):
 # ============================================================================
 
 if __name__ == "__main__":
-    # Run the benchmark
-    results = run_benchmark()
+    # Run the benchmark (records stream to the results file)
+    summary = run_benchmark()
     
     # Print summary
-    print_summary(results)
+    print_summary(summary)
     
     # Create visualization
-    create_visualization(results)
+    create_visualization(load_results(summary.path, CHART_MAX_QUESTIONS))
     
     print("\n" + "=" * 70)
     print("BENCHMARK COMPLETE!")
     print("=" * 70)
     print("\nNext steps:")
     print("1. Check 'project1_cost.png' for the visualization")
-    print("2. To use real API: Set MOCK_MODE = False and add your API key")
+    print("2. To use a real model: Set BACKEND = \"openai\" (and your API key) or \"local\"")
     print("3. This data quantifies why Latent CoT is needed!")
     print()
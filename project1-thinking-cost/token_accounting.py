@@ -0,0 +1,132 @@
+"""
+Token Accounting - Local token counts for thinking_cost_benchmark.py
+Counts prompt and completion tokens with a local BPE tokenizer, so the
+"CoT costs 2-4x more tokens" result does not depend on hand-written counts
+or on providers' `usage` fields (whose totals mix prompt and completion).
+
+The tokenizer is loaded once per process and every counted string is
+memoised, so the same prompt template or cached response is only encoded
+once. `TokenCounter.count` takes whole lists and encodes all strings it has
+not seen in a single batched tokenizer call.
+
+The tokenizer is only ever loaded from a local copy (the Hugging Face cache
+or a local directory); nothing is downloaded, so offline runs never wait on
+network retries. Fetch it once with
+`AutoTokenizer.from_pretrained("gpt2")` to get exact counts. If it cannot be
+loaded (transformers missing, or no local copy), counts fall back to GPT-2's pre-tokenizer split: every
+piece is at least one BPE token, so this is a close lower bound. `TokenCounter.description` says
+which one was used.
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TOKENIZER_NAME = "gpt2"  # Hugging Face tokenizer ID or local directory
+MEMO_MAX_ENTRIES = 1000000  # Memoised strings before the memo is cleared
+
+# GPT-2's pre-tokenizer: contractions, letter runs, digit runs, punctuation runs, whitespace
+PRETOKEN_RE = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+")
+
+# ============================================================================
+# TOKEN COUNTER
+# ============================================================================
+
+class TokenCounter:
+    """
+    Counts tokens with one tokenizer, memoising every string it has counted.
+    
+    The tokenizer is loaded on first use; `hits` and `misses` count memo
+    lookups.
+    """
+    
+    def __init__(self, tokenizer_name: str = TOKENIZER_NAME, max_entries: int = MEMO_MAX_ENTRIES):
+        self.tokenizer_name = tokenizer_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memo: Dict[str, int] = {}
+        self._tokenizer = None
+        self._loaded = False
+    
+    @property
+    def tokenizer(self):
+        """The Hugging Face tokenizer from a local copy, or None if there is none."""
+        if not self._loaded:
+            self._loaded = True
+            try:
+                from transformers import AutoTokenizer
+            except ImportError:
+                print("Token counts are approximate: transformers is not installed")
+                return None
+            try:
+                self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name, local_files_only=True)
+            except Exception as e:
+                print(f"Token counts are approximate: no local copy of the {self.tokenizer_name} tokenizer ({type(e).__name__})")
+        return self._tokenizer
+    
+    @property
+    def used(self) -> bool:
+        """Whether anything has been counted (and the tokenizer possibly loaded)."""
+        return self.hits + self.misses > 0
+    
+    @property
+    def description(self) -> str:
+        """How tokens are counted, for reports."""
+        if self.tokenizer is None:
+            return f"approximate {self.tokenizer_name} pre-tokenizer split"
+        return f"{self.tokenizer_name} tokenizer"
+    
+    def count(self, texts: Sequence[str]) -> List[int]:
+        """
+        Counts the tokens of many strings.
+        
+        Strings not counted before are deduplicated and encoded in one
+        batched call; special tokens are not counted.
+        
+        Args:
+            texts: Strings to count
+        
+        Returns:
+            Token count of each string
+        """
+        new = list(dict.fromkeys(text for text in texts if text not in self._memo))
+        self.misses += len(new)
+        self.hits += len(texts) - len(new)
+        if new:
+            if len(self._memo) + len(new) > self.max_entries:
+                self._memo.clear()
+            tokenizer = self.tokenizer
+            if tokenizer is None:
+                counts = [len(PRETOKEN_RE.findall(text)) for text in new]
+            else:
+                counts = [len(ids) for ids in tokenizer(new, add_special_tokens=False)["input_ids"]]
+            self._memo.update(zip(new, counts))
+        return [self._memo[text] for text in texts]
+    
+    def count_one(self, text: str) -> int:
+        return self.count([text])[0]
+
+
+_COUNTERS: Dict[str, TokenCounter] = {}
+
+
+def get_counter(tokenizer_name: Optional[str] = None) -> TokenCounter:
+    """
+    Returns the process-wide counter for a tokenizer, creating it on first use.
+    
+    Args:
+        tokenizer_name: Hugging Face tokenizer ID or local directory (default: TOKENIZER_NAME)
+    """
+    tokenizer_name = tokenizer_name or TOKENIZER_NAME
+    if tokenizer_name not in _COUNTERS:
+        _COUNTERS[tokenizer_name] = TokenCounter(tokenizer_name)
+    return _COUNTERS[tokenizer_name]
+
+
+def count_tokens(texts: Sequence[str], tokenizer_name: Optional[str] = None) -> List[int]:
+    """Counts the tokens of many strings with the process-wide counter."""
+    return get_counter(tokenizer_name).count(texts)
@@ -13,22 +13,651 @@ The technique reveals that:
 - Final layers are very confident (high probability)
 """
 
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend for file saving
-import matplotlib.pyplot as plt
-import seaborn as sns
+import copy
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
 import numpy as np
 import torch
-from typing import List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# matplotlib, seaborn and transformers are imported lazily inside the
+# functions that need them, so probing code starts quickly
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 MODEL_NAME = "gpt2"  # GPT-2 small (117M parameters, 12 layers)
+MODEL_REVISION = "main"  # Hub revision (branch, tag or commit hash) - part of the cache key
+MODEL_DTYPE = "float32"  # "float32", "bfloat16" or "int8" (dynamic int8 Linear layers)
+LM_HEAD_PRECISION = None  # lm_head projection precision; None follows MODEL_DTYPE
+LOCAL_MODEL_DIR = None  # Optional directory with pre-downloaded weights (loaded memory-mapped, no network)
+WARMUP_MODEL = False  # Run one tiny forward pass right after loading
 DEVICE = "cpu"  # Force CPU execution (no GPU required)
 PROMPT = "The Eiffel Tower is located in the city of"
 TARGET_WORD = "Paris"  # The word we expect the model to predict
+VOCAB_CHUNK_SIZE = 8192  # Vocabulary rows per chunk in the streaming softmax normaliser
+
+# How intermediate layers are read out:
+# "logit" - lm_head straight on the residual stream (the classic logit lens)
+# "norm"  - apply the final LayerNorm (ln_f) first
+# "tuned" - learned per-layer affine translator, then ln_f (see train_tuned_lens)
+LENS_MODE = "logit"
+TUNED_LENS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuned_lens.npz")
+
+# Hidden-state cache: re-probing targets or re-plotting skips the model
+USE_HIDDEN_STATE_CACHE = True
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".hidden_state_cache")
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # LRU size cap for cached hidden states (2 GB)
+
+# ============================================================================
+# MODEL REGISTRY
+# ============================================================================
+
+# One loaded (model, tokenizer) per (model name, source, revision, dtype) per
+# process; the source is the local directory, or the model name on the Hub
+_MODEL_REGISTRY: Dict[Tuple[str, str, Optional[str], str], Tuple[object, object]] = {}
+
+# Load timings and memory per registry key, for tracking startup regressions
+MODEL_LOAD_STATS: Dict[Tuple[str, str, Optional[str], str], Dict[str, float]] = {}
+
+
+def model_key(model_name: Optional[str] = None, dtype: Optional[str] = None,
+              local_dir: Optional[str] = None) -> Tuple[str, str, Optional[str], str]:
+    """
+    Registry key of a model, with the same defaults as get_model.
+    
+    Returns:
+        tuple: (model name, source, revision, dtype); a local directory is
+        its own source and has no revision
+    """
+    model_name = model_name or MODEL_NAME
+    local_dir = local_dir or LOCAL_MODEL_DIR
+    if local_dir is not None:
+        return model_name, os.path.abspath(local_dir), None, dtype or MODEL_DTYPE
+    return model_name, model_name, MODEL_REVISION, dtype or MODEL_DTYPE
+
+
+# Hub commit of each (model name, revision), resolved from its config alone
+_HUB_COMMITS: Dict[Tuple[str, str], str] = {}
+
+
+def _hub_commit(model_name: str, revision: str) -> str:
+    """
+    The commit a Hub revision resolves to, without loading any weights.
+    
+    Falls back to the revision itself when the config cannot be read.
+    """
+    if (model_name, revision) not in _HUB_COMMITS:
+        from transformers import AutoConfig
+        try:
+            config = AutoConfig.from_pretrained(model_name, revision=revision)
+            _HUB_COMMITS[model_name, revision] = getattr(config, "_commit_hash", None) or revision
+        except OSError:
+            return revision
+    return _HUB_COMMITS[model_name, revision]
+
+
+def model_identity(model=None) -> Tuple[str, Optional[str], str]:
+    """
+    Source, revision and dtype of a model, as used in cache fingerprints.
+    
+    Read from the model itself, so a model passed in explicitly is never
+    mistaken for the MODEL_NAME / MODEL_DTYPE default: the source is
+    `config.name_or_path` (made absolute for local directories, as in
+    `model_key`), the revision the Hub commit it was loaded at
+    (`config._commit_hash`, else MODEL_REVISION), and the dtype its
+    parameters' (or `lens_precision` for int8 models).
+    
+    Args:
+        model: Loaded model, or None for the one get_model() would load
+            (described without loading it, if it is not loaded yet)
+    
+    Returns:
+        tuple: (source, revision, dtype); local directories have no revision
+    """
+    if model is None:
+        key = model_key()
+        if key not in _MODEL_REGISTRY:
+            _, source, revision, dtype = key
+            return source, None if revision is None else _hub_commit(source, revision), dtype
+        model = _MODEL_REGISTRY[key][0]
+    source = model.config.name_or_path
+    if os.path.isdir(source):
+        source, revision = os.path.abspath(source), None
+    else:
+        revision = getattr(model.config, "_commit_hash", None) or MODEL_REVISION
+    dtype = getattr(model, "lens_precision", None) or str(next(model.parameters()).dtype).replace("torch.", "")
+    return source, revision, dtype
+
+
+def _resident_memory_mb() -> float:
+    """
+    Returns the current resident set size of this process in MB.
+    
+    Reads /proc on Linux; elsewhere falls back to the peak RSS reported by
+    `resource`, which is the closest portable figure.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    
+    import resource
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def get_model(model_name: Optional[str] = None, dtype: Optional[str] = None,
+              local_dir: Optional[str] = None, warmup: Optional[bool] = None):
+    """
+    Returns the process-wide (model, tokenizer) for a model and dtype.
+    
+    The first call loads the model (cold start); later calls return the same
+    instance immediately (warm start). Weights are loaded with
+    `low_cpu_mem_usage`, which memory-maps safetensors checkpoints instead of
+    materialising a second copy. With `local_dir`, everything is read from
+    that directory and the network is never touched.
+    
+    Args:
+        model_name: Hugging Face model ID (default: MODEL_NAME)
+        dtype: "float32", "bfloat16" or "int8" (default: MODEL_DTYPE). "int8"
+            loads float32 weights and applies dynamic int8 quantization to
+            the transformer's Linear layers
+        local_dir: Local directory holding the model files (default: LOCAL_MODEL_DIR)
+        warmup: Run one tiny forward pass after a cold load so the first real
+            call does not pay for lazy initialisation (default: WARMUP_MODEL)
+    
+    Returns:
+        tuple: (model, tokenizer)
+    """
+    warmup = WARMUP_MODEL if warmup is None else warmup
+    key = model_key(model_name, dtype, local_dir)
+    model_name, source, revision, dtype = key
+    local_dir = source if revision is None else None
+    start = time.perf_counter()
+    
+    if key in _MODEL_REGISTRY:
+        stats = MODEL_LOAD_STATS[key]
+        stats["warm_start_s"] = time.perf_counter() - start
+        stats["warm_hits"] += 1
+        return _MODEL_REGISTRY[key]
+    
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+    
+    rss_before = _resident_memory_mb()
+    
+    tokenizer = AutoTokenizer.from_pretrained(source, revision=revision, local_files_only=local_dir is not None)
+    model = AutoModelForCausalLM.from_pretrained(
+        source,
+        revision=revision,
+        torch_dtype=torch.float32 if dtype == "int8" else getattr(torch, dtype),
+        low_cpu_mem_usage=True,
+        local_files_only=local_dir is not None
+    )
+    model = model.to(DEVICE)
+    model.eval()  # Set to evaluation mode (no dropout, etc.)
+    if dtype == "int8":
+        model = _quantize_linear_layers(model)
+    cold_start = time.perf_counter() - start
+    
+    warmup_time = 0.0
+    if warmup:
+        warmup_start = time.perf_counter()
+        with torch.no_grad():
+            model(torch.tensor([tokenizer.encode("Hello")], device=DEVICE))
+        warmup_time = time.perf_counter() - warmup_start
+    
+    MODEL_LOAD_STATS[key] = {
+        "cold_start_s": cold_start,
+        "warmup_s": warmup_time,
+        "warm_start_s": 0.0,
+        "warm_hits": 0,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": _resident_memory_mb()
+    }
+    _MODEL_REGISTRY[key] = (model, tokenizer)
+    return model, tokenizer
+
+
+def print_load_report():
+    """
+    Prints cold start, warm start and resident memory for every loaded model.
+    """
+    print(f"\n{'Model':<24} {'Dtype':<10} {'Cold (s)':>9} {'Warm-up (s)':>12} {'Warm (ms)':>10} {'RSS (MB)':>9}")
+    print("-" * 80)
+    for (model_name, _, _, dtype), stats in MODEL_LOAD_STATS.items():
+        print(
+            f"{model_name:<24} {dtype:<10} {stats['cold_start_s']:>9.2f} {stats['warmup_s']:>12.2f} "
+            f"{stats['warm_start_s'] * 1000:>10.3f} {stats['rss_after_mb']:>9.0f}"
+        )
+
+
+# ============================================================================
+# REDUCED-PRECISION INFERENCE
+# ============================================================================
+
+def _quantize_linear_layers(model):
+    """
+    Applies dynamic int8 quantization to the transformer's Linear layers.
+    
+    GPT-2 implements its projections with transformers' `Conv1D` (a Linear
+    layer with a transposed weight), which `quantize_dynamic` does not
+    recognise, so those are converted to `nn.Linear` first. `lm_head` stays
+    in float32: it is tied to the input embedding, and the logit lens
+    projects through `Unembedding` instead.
+    
+    Args:
+        model: GPT-2 model in float32
+    
+    Returns:
+        The quantized model, marked with `lens_precision = "int8"`
+    """
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child).__name__ == "Conv1D":
+                linear = torch.nn.Linear(child.weight.shape[0], child.weight.shape[1])
+                linear.weight.data = child.weight.data.T.contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    
+    qconfig_spec = {
+        name: torch.ao.quantization.default_dynamic_qconfig
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and name != "lm_head"
+    }
+    model = torch.ao.quantization.quantize_dynamic(model, qconfig_spec, dtype=torch.qint8)
+    model.lens_precision = "int8"
+    return model
+
+
+class Unembedding:
+    """
+    The `lm_head` projection in a chosen precision.
+    
+    - "float32": plain matmul
+    - "bfloat16": weight and hidden states in bf16, logits returned in fp32
+    - "int8": per-row symmetric int8 weight. Vocabulary chunks run through
+      fbgemm's dynamic int8 GEMM; target rows are dequantized for the gather
+    
+    All methods return float32 logits, so softmax/logsumexp stay in full
+    precision.
+    """
+    
+    def __init__(self, weight: torch.Tensor, bias: Optional[torch.Tensor] = None, precision: str = "float32"):
+        if precision not in ("float32", "bfloat16", "int8"):
+            raise ValueError(f"Unknown lm_head precision '{precision}'")
+        weight = weight.detach()
+        self.precision = precision
+        self.vocab_size = weight.shape[0]
+        self.bias = None if bias is None else bias.detach().float()
+        
+        if precision == "int8":
+            weight = weight.float()
+            self.scale = weight.abs().amax(dim=1).clamp(min=1e-8) / 127
+            self.weight = torch.round(weight / self.scale[:, None]).clamp(-127, 127).to(torch.int8)
+            self._int8_chunks = {}
+        else:
+            self.weight = weight.to(getattr(torch, precision))
+    
+    def _quantized_chunks(self, chunk_size: int):
+        """Builds (once per chunk size) dynamic int8 Linear modules over vocabulary chunks."""
+        if chunk_size not in self._int8_chunks:
+            chunks = []
+            for start in range(0, self.vocab_size, chunk_size):
+                rows = self.weight[start:start + chunk_size]
+                scale = self.scale[start:start + chunk_size]
+                qweight = torch.quantize_per_channel(
+                    rows.float() * scale[:, None], scale.double(),
+                    torch.zeros(len(rows), dtype=torch.long), 0, torch.qint8
+                )
+                module = torch.ao.nn.quantized.dynamic.Linear(rows.shape[1], rows.shape[0])
+                module.set_weight_bias(qweight, None)
+                chunks.append((start, module))
+            self._int8_chunks[chunk_size] = chunks
+        return self._int8_chunks[chunk_size]
+    
+    def target_logits(self, hidden: torch.Tensor, target_ids: torch.Tensor) -> torch.Tensor:
+        """
+        Gather-and-dot against the target rows only.
+        
+        Args:
+            hidden: Hidden states of shape (batch, layers, hidden_dim)
+            target_ids: Token IDs of shape (batch, targets)
+        
+        Returns:
+            Float32 logits of shape (batch, layers, targets)
+        """
+        if self.precision == "int8":
+            rows = self.weight[target_ids].float() * self.scale[target_ids].unsqueeze(-1)
+            logits = torch.einsum("blh,bkh->blk", hidden.float(), rows)
+        else:
+            logits = torch.einsum("blh,bkh->blk", hidden.to(self.weight.dtype), self.weight[target_ids]).float()
+        if self.bias is not None:
+            logits = logits + self.bias[target_ids].unsqueeze(1)
+        return logits
+    
+    def chunk_logits(self, hidden: torch.Tensor, chunk_size: int):
+        """
+        Yields float32 logits for consecutive vocabulary chunks.
+        
+        Args:
+            hidden: Hidden states of shape (..., hidden_dim)
+            chunk_size: Vocabulary rows per chunk
+        
+        Yields:
+            tuple: (start_row, logits of shape (..., rows_in_chunk))
+        """
+        if self.precision == "int8":
+            flat_hidden = hidden.float().reshape(-1, hidden.shape[-1])
+            for start, module in self._quantized_chunks(chunk_size):
+                logits = module(flat_hidden).reshape(*hidden.shape[:-1], -1)
+                if self.bias is not None:
+                    logits = logits + self.bias[start:start + logits.shape[-1]]
+                yield start, logits
+        else:
+            hidden = hidden.to(self.weight.dtype)
+            for start in range(0, self.vocab_size, chunk_size):
+                logits = (hidden @ self.weight[start:start + chunk_size].T).float()
+                if self.bias is not None:
+                    logits = logits + self.bias[start:start + chunk_size]
+                yield start, logits
+    
+    def logits(self, hidden: torch.Tensor) -> torch.Tensor:
+        """Full-vocabulary float32 logits of shape (..., vocab)."""
+        return torch.cat([logits for _, logits in self.chunk_logits(hidden, VOCAB_CHUNK_SIZE)], dim=-1)
+
+
+_UNEMBEDDINGS: Dict[Tuple[int, str], Tuple[object, Unembedding]] = {}
+
+
+def _default_lm_head_precision(model=None) -> str:
+    """Resolves LM_HEAD_PRECISION, falling back to the model's own precision."""
+    if LM_HEAD_PRECISION is not None:
+        return LM_HEAD_PRECISION
+    if model is None:
+        return MODEL_DTYPE
+    if getattr(model, "lens_precision", None) == "int8":
+        return "int8"
+    return "bfloat16" if model.dtype == torch.bfloat16 else "float32"
+
+
+def get_unembedding(model, precision: Optional[str] = None) -> Unembedding:
+    """
+    Returns the (memoised) `Unembedding` of a model.
+    
+    Args:
+        model: GPT-2 model
+        precision: "float32", "bfloat16" or "int8"; default follows
+            LM_HEAD_PRECISION, then the model's own precision
+    
+    Returns:
+        Unembedding wrapping `model.lm_head`
+    """
+    precision = precision or _default_lm_head_precision(model)
+    key = (id(model), precision)
+    entry = _UNEMBEDDINGS.get(key)
+    if entry is None or entry[0] is not model:
+        entry = (model, Unembedding(model.lm_head.weight, getattr(model.lm_head, "bias", None), precision))
+        _UNEMBEDDINGS[key] = entry
+    return entry[1]
+
+
+# ============================================================================
+# LENS READOUTS
+# ============================================================================
+
+LENS_MODES = ("logit", "norm", "tuned")
+
+
+class FinalNorm:
+    """
+    The model's final LayerNorm (`ln_f`) as plain float32 tensors, so it can
+    be applied to cached hidden states without the model.
+    """
+    
+    def __init__(self, weight: torch.Tensor, bias: torch.Tensor, eps: float):
+        self.weight = weight.detach().float()
+        self.bias = bias.detach().float()
+        self.eps = float(eps)
+    
+    @classmethod
+    def from_model(cls, model) -> "FinalNorm":
+        ln_f = model.base_model.ln_f
+        return cls(ln_f.weight, ln_f.bias, ln_f.eps)
+    
+    def __call__(self, hidden: torch.Tensor) -> torch.Tensor:
+        return torch.nn.functional.layer_norm(
+            hidden.float(), self.weight.shape, self.weight, self.bias, self.eps
+        )
+
+
+class TunedLens:
+    """
+    One learned affine translator per layer (the "tuned lens").
+    
+    Layer l is read out as ln_f(h + h @ A_l + b_l) before `lm_head`. The
+    translators start at identity (A = 0, b = 0), where the tuned lens equals
+    the "norm" lens. All probed layers are translated together with one
+    batched einsum.
+    
+    Translators only fit the model they were trained on, so the file also
+    records that model's source, revision and dtype (`model_identity`);
+    `check` rejects them for any other model.
+    
+    Attributes:
+        weight: Tensor of shape (layers, hidden_dim, hidden_dim)
+        bias: Tensor of shape (layers, hidden_dim)
+        trained_on: (source, revision, dtype) of the training model, or
+            None for untrained translators and files from older versions
+    """
+    
+    def __init__(self, weight: torch.Tensor, bias: torch.Tensor,
+                 trained_on: Optional[Tuple[str, Optional[str], str]] = None):
+        self.weight = weight
+        self.bias = bias
+        self.trained_on = trained_on
+    
+    @classmethod
+    def identity(cls, n_layers: int, hidden_dim: int) -> "TunedLens":
+        return cls(torch.zeros(n_layers, hidden_dim, hidden_dim), torch.zeros(n_layers, hidden_dim))
+    
+    @classmethod
+    def load(cls, path: str) -> "TunedLens":
+        with np.load(path) as data:
+            trained_on = None
+            if "source" in data:
+                revision = str(data["revision"])
+                trained_on = (str(data["source"]), revision or None, str(data["dtype"]))
+            return cls(torch.from_numpy(data["weight"]).to(DEVICE), torch.from_numpy(data["bias"]).to(DEVICE),
+                       trained_on)
+    
+    def save(self, path: str):
+        source, revision, dtype = self.trained_on or ("", None, "")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                weight=self.weight.detach().float().cpu().numpy(),
+                bias=self.bias.detach().float().cpu().numpy(),
+                source=np.array(source),
+                revision=np.array(revision or ""),
+                dtype=np.array(dtype)
+            )
+        os.replace(tmp_path, path)
+    
+    def check(self, source: str, revision: Optional[str], n_layers: int, hidden_dim: int):
+        """
+        Raises ValueError unless these translators fit a model.
+        
+        Args:
+            source, revision: The model in use, as from `model_identity`
+            n_layers: Its number of layers
+            hidden_dim: Its hidden size
+        """
+        shape = (n_layers, hidden_dim, hidden_dim)
+        if tuple(self.weight.shape) != shape:
+            raise ValueError(
+                f"Tuned lens translators have shape {tuple(self.weight.shape)}, but the model needs {shape}; "
+                f"retrain them with train_tuned_lens()"
+            )
+        if self.trained_on is not None and self.trained_on[:2] != (source, revision):
+            trained_source, trained_revision, _ = self.trained_on
+            raise ValueError(
+                f"Tuned lens was trained on {trained_source} (revision {trained_revision}), but the model in "
+                f"use is {source} (revision {revision}); retrain it with train_tuned_lens() or set TUNED_LENS_PATH"
+            )
+    
+    def translate(self, hidden: torch.Tensor, layers: Sequence[int]) -> torch.Tensor:
+        """
+        Args:
+            hidden: Hidden states of shape (batch, len(layers), hidden_dim)
+            layers: Layer index of each slot along dim 1
+        
+        Returns:
+            Translated float32 hidden states, same shape
+        """
+        layers = list(layers)
+        hidden = hidden.float()
+        return hidden + torch.einsum("blh,lhk->blk", hidden, self.weight[layers]) + self.bias[layers]
+
+
+_TUNED_LENSES: Dict[str, TunedLens] = {}
+
+
+def get_tuned_lens(path: Optional[str] = None) -> TunedLens:
+    """Loads (once per path) trained translators written by `train_tuned_lens`."""
+    path = path or TUNED_LENS_PATH
+    if path not in _TUNED_LENSES:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No tuned lens at {path}; train one with train_tuned_lens()")
+        _TUNED_LENSES[path] = TunedLens.load(path)
+    return _TUNED_LENSES[path]
+
+
+def _resolve_lens(lens: Optional[str], tuned_lens: Optional[TunedLens], model=None,
+                  n_layers: Optional[int] = None, hidden_dim: Optional[int] = None) -> Tuple[str, Optional[TunedLens]]:
+    """
+    Resolves a lens mode (default LENS_MODE) and, for "tuned", its
+    translators, checked against the model they will be applied to.
+    
+    Args:
+        lens: Lens mode
+        tuned_lens: Translators (default: get_tuned_lens())
+        model: The model in use, or None for the one get_model() would load
+        n_layers, hidden_dim: Its shape, needed when model is None
+    """
+    lens = lens or LENS_MODE
+    if lens not in LENS_MODES:
+        raise ValueError(f"Unknown lens mode '{lens}'; expected one of {LENS_MODES}")
+    if lens != "tuned":
+        return lens, None
+    tuned_lens = tuned_lens if tuned_lens is not None else get_tuned_lens()
+    if model is not None:
+        n_layers, hidden_dim = model.config.n_layer, model.config.hidden_size
+    source, revision, _ = model_identity(model)
+    tuned_lens.check(source, revision, n_layers, hidden_dim)
+    return lens, tuned_lens
+
+
+def _lens_readout(hidden: torch.Tensor, layers: Sequence[int], n_layers: int,
+                  final_norm: Optional[FinalNorm] = None,
+                  tuned_lens: Optional[TunedLens] = None) -> torch.Tensor:
+    """
+    Prepares stacked hidden states for `lm_head`.
+    
+    The last layer is captured after `ln_f` already, so it is left alone;
+    every other probed layer is translated (tuned lens) and normalised.
+    
+    Args:
+        hidden: Hidden states of shape (rows, len(layers), hidden_dim)
+        layers: Layer index of each slot along dim 1
+        n_layers: Number of layers in the model
+        final_norm: `ln_f` to apply, or None for the raw logit lens
+        tuned_lens: Optional translators, applied before `ln_f`
+    
+    Returns:
+        Hidden states ready for the unembedding
+    """
+    if final_norm is None:
+        return hidden
+    inner = [slot for slot, layer in enumerate(layers) if layer != n_layers - 1]
+    if not inner:
+        return hidden
+    
+    inner_hidden = hidden[:, inner]
+    if tuned_lens is not None:
+        inner_hidden = tuned_lens.translate(inner_hidden, [layers[slot] for slot in inner])
+    
+    hidden = hidden.float().clone()
+    hidden[:, inner] = final_norm(inner_hidden)
+    return hidden
+
+
+def compare_precision_modes(probes: List[Tuple[str, List[str]]],
+                            modes: Sequence[str] = ("float32", "bfloat16", "int8"),
+                            batch_size: int = 32, repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Measures speed and accuracy of each precision mode against float32.
+    
+    Every mode runs the same probes through `extract_batch_probabilities`
+    (best of `repeats` timed runs). Per-layer target probabilities are
+    compared with the float32 baseline.
+    
+    Args:
+        probes: List of (prompt, [target words]) pairs
+        modes: Model dtypes to compare; "float32" is always run as the baseline
+        batch_size: Number of prompts per forward pass
+        repeats: Timed runs per mode (the fastest is reported)
+    
+    Returns:
+        Dictionary per mode with seconds, prompts/sec/thread, speedup, and
+        max / mean absolute difference in percentage points
+    """
+    modes = ["float32"] + [mode for mode in modes if mode != "float32"]
+    threads = torch.get_num_threads()
+    report = {}
+    baseline = None
+    
+    for mode in modes:
+        model, tokenizer = get_model(dtype=mode)
+        unembedding = get_unembedding(model, LM_HEAD_PRECISION or mode)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            probs = _batched_layer_probabilities_for(model, tokenizer, probes, batch_size, unembedding)
+            timings.append(time.perf_counter() - start)
+        
+        if baseline is None:
+            baseline = probs
+        diff = np.abs(probs - baseline)
+        report[mode] = {
+            "seconds": min(timings),
+            "prompts_per_sec_per_thread": len(probes) / min(timings) / threads,
+            "speedup": report["float32"]["seconds"] / min(timings) if "float32" in report else 1.0,
+            "max_abs_diff": float(np.nanmax(diff)),
+            "mean_abs_diff": float(np.nanmean(diff))
+        }
+    
+    print(f"\n{'Mode':<10} {'Time (s)':>9} {'Prompts/s/thread':>17} {'Speedup':>8} {'Max Δ (pp)':>11} {'Mean Δ (pp)':>12}")
+    print("-" * 72)
+    for mode, stats in report.items():
+        print(
+            f"{mode:<10} {stats['seconds']:>9.3f} {stats['prompts_per_sec_per_thread']:>17.1f} "
+            f"{stats['speedup']:>7.2f}x {stats['max_abs_diff']:>11.3f} {stats['mean_abs_diff']:>12.4f}"
+        )
+    
+    return report
+
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -38,26 +667,20 @@ def load_model_and_tokenizer():
     """
     Loads GPT-2 model and tokenizer, configured for CPU execution.
     
+    Goes through the model registry, so repeated calls in one process reuse
+    the already loaded model.
+    
     Returns:
         tuple: (model, tokenizer)
     """
-    print("=" * 70)
-    print("LOGIT LENS: PEERING INSIDE GPT-2")
-    print("=" * 70)
     print(f"\nLoading model '{MODEL_NAME}'...")
     
     try:
-        from transformers import AutoTokenizer, AutoModelForCausalLM
-        
-        # Load tokenizer with resume capability
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, resume_download=True)
-        
-        # Load model and move to CPU with resume capability
-        model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, resume_download=True)
-        model = model.to(DEVICE)
-        model.eval()  # Set to evaluation mode (no dropout, etc.)
+        model, tokenizer = get_model()
+        stats = MODEL_LOAD_STATS[model_key()]
         
         print(f"✓ Model loaded successfully")
+        print(f"  - Load time: {stats['cold_start_s']:.2f}s (resident memory: {stats['rss_after_mb']:.0f} MB)")
         print(f"  - Parameters: ~117M")
         print(f"  - Layers: 12")
         print(f"  - Hidden dim: 768")
@@ -74,13 +697,34 @@ def load_model_and_tokenizer():
         raise
 
 
-def get_target_token_id(tokenizer, target_word: str) -> int:
+def load_tokenizer():
+    """
+    Loads only the tokenizer, without any model weights.
+    
+    Reuses the registry's tokenizer when the model is already loaded.
+    
+    Returns:
+        GPT-2 tokenizer
+    """
+    key = model_key()
+    if key in _MODEL_REGISTRY:
+        return _MODEL_REGISTRY[key][1]
+    
+    from transformers import AutoTokenizer
+    
+    if LOCAL_MODEL_DIR is not None:
+        return AutoTokenizer.from_pretrained(LOCAL_MODEL_DIR, local_files_only=True)
+    return AutoTokenizer.from_pretrained(MODEL_NAME, revision=MODEL_REVISION)
+
+
+def get_target_token_id(tokenizer, target_word: str, verbose: bool = True) -> int:
     """
     Gets the token ID for the target word.
     
     Args:
         tokenizer: GPT-2 tokenizer
         target_word: The word to find (e.g., "Paris")
+        verbose: Print which token was selected
     
     Returns:
         int: Token ID for the target word
@@ -90,7 +734,8 @@ def get_target_token_id(tokenizer, target_word: str) -> int:
     
     if len(token_ids_with_space) == 1:
         token_id = token_ids_with_space[0]
-        print(f"\n✓ Target token: ' {target_word}' (ID: {token_id})")
+        if verbose:
+            print(f"\n✓ Target token: ' {target_word}' (ID: {token_id})")
         return token_id
     
     # Try without space
@@ -98,17 +743,707 @@ def get_target_token_id(tokenizer, target_word: str) -> int:
     
     if len(token_ids_without_space) == 1:
         token_id = token_ids_without_space[0]
-        print(f"\n✓ Target token: '{target_word}' (ID: {token_id})")
+        if verbose:
+            print(f"\n✓ Target token: '{target_word}' (ID: {token_id})")
         return token_id
     
     # If target word is multiple tokens, use the first one
     token_id = token_ids_with_space[0] if token_ids_with_space else token_ids_without_space[0]
-    print(f"\n⚠ Warning: '{target_word}' tokenizes to multiple tokens. Using first token (ID: {token_id})")
+    if verbose:
+        print(f"\n⚠ Warning: '{target_word}' tokenizes to multiple tokens. Using first token (ID: {token_id})")
+        print("  Use score_continuations() to score the full word.")
     
     return token_id
 
 
-def extract_layer_probabilities(model, tokenizer, prompt: str, target_token_id: int) -> List[float]:
+def get_target_token_ids(tokenizer, target_word: str) -> List[int]:
+    """
+    Gets every token ID of a (possibly multi-token) target.
+    
+    Uses the leading-space form, which is how a word following the prompt is
+    tokenized by GPT-2.
+    
+    Args:
+        tokenizer: GPT-2 tokenizer
+        target_word: The continuation to score (e.g., "Paris" or "New York City")
+    
+    Returns:
+        List of token IDs
+    """
+    token_ids = tokenizer.encode(f" {target_word}", add_special_tokens=False)
+    if not token_ids:
+        raise ValueError(f"Target '{target_word}' produced no tokens")
+    return token_ids
+
+
+# ============================================================================
+# BATCHED LOGIT LENS ENGINE
+# ============================================================================
+
+def _pad_batch(token_id_lists: List[List[int]], pad_token_id: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Right-pads a list of token ID sequences into one batch.
+    
+    Right padding keeps GPT-2's absolute position embeddings identical to an
+    unpadded run, so each prompt's last real token sees exactly the same
+    context as it would on its own.
+    
+    Args:
+        token_id_lists: One list of token IDs per prompt
+        pad_token_id: ID written into padded positions (masked out)
+    
+    Returns:
+        tuple: (input_ids, attention_mask), both of shape (batch, max_len)
+    """
+    max_len = max(len(ids) for ids in token_id_lists)
+    input_ids = torch.full((len(token_id_lists), max_len), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(token_id_lists), max_len), dtype=torch.long)
+    
+    for row, ids in enumerate(token_id_lists):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+    
+    return input_ids.to(DEVICE), attention_mask.to(DEVICE)
+
+
+class _StopForward(Exception):
+    """Raised from a forward hook to end the pass after the deepest probed layer."""
+
+
+def capture_hidden_states(model, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+                          layers: Sequence[int], positions: Optional[torch.Tensor] = None,
+                          early_exit: bool = True, past_key_values=None,
+                          return_past: bool = False):
+    """
+    Captures selected hidden states with forward hooks instead of
+    `output_hidden_states=True`.
+    
+    Hooks are registered only on the probed layers and each one keeps just the
+    requested positions, so memory is O(layers x positions x hidden) rather
+    than O(layers x seq_len x hidden). With `early_exit`, the hook on the
+    deepest probed layer stops the forward pass, so sweeps over early layers
+    never run the rest of the stack.
+    
+    Args:
+        model: GPT-2 model
+        input_ids: Token IDs of shape (batch, seq_len)
+        attention_mask: Mask of shape (batch, seq_len), 1 for real tokens
+        layers: Transformer layer indices to capture (0 = first block)
+        positions: Positions to keep, shape (batch, n_positions). Defaults to
+            the last real token of each row
+        early_exit: Stop the forward pass after the deepest requested layer
+        past_key_values: KV cache of a prefix that `input_ids` continues;
+            `attention_mask` must then cover prefix + input positions
+        return_past: Also return the KV cache of this pass (implies a full
+            forward pass, without early exit)
+    
+    Returns:
+        Tensor of shape (batch, len(layers), n_positions, hidden_dim), or
+        (tensor, past_key_values) when `return_past` is set
+    """
+    blocks = model.base_model.h
+    n_layers = len(blocks)
+    if not layers or any(layer < 0 or layer >= n_layers for layer in layers):
+        raise ValueError(f"Layers must be between 0 and {n_layers - 1}, got {list(layers)}")
+    
+    if positions is None:
+        positions = (attention_mask[:, -input_ids.shape[1]:].sum(dim=1) - 1).unsqueeze(1)
+    early_exit = early_exit and not return_past
+    rows = torch.arange(input_ids.shape[0], device=input_ids.device).unsqueeze(1)
+    deepest = max(layers)
+    captured = {}
+    
+    def make_hook(layer):
+        def hook(module, inputs, output):
+            hidden = output[0] if isinstance(output, tuple) else output
+            captured[layer] = hidden[rows, positions]
+            if early_exit and layer == deepest:
+                raise _StopForward
+        return hook
+    
+    handles = []
+    for layer in set(layers):
+        # `output_hidden_states` reports the last block after the final
+        # LayerNorm, so hook `ln_f` to return exactly the same tensor
+        module = model.base_model.ln_f if layer == n_layers - 1 else blocks[layer]
+        handles.append(module.register_forward_hook(make_hook(layer)))
+    
+    outputs = None
+    try:
+        with torch.no_grad():
+            outputs = model.base_model(
+                input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                use_cache=return_past
+            )
+    except _StopForward:
+        pass
+    finally:
+        for handle in handles:
+            handle.remove()
+    
+    hidden = torch.stack([captured[layer] for layer in layers], dim=1)
+    if return_past:
+        return hidden, outputs.past_key_values
+    return hidden
+
+
+def _target_log_probs(hidden: torch.Tensor, unembedding: Unembedding, target_ids: torch.Tensor,
+                      chunk_size: int = VOCAB_CHUNK_SIZE) -> torch.Tensor:
+    """
+    Computes log-probabilities of a few target tokens without a full softmax.
+    
+    The target logits come from a gather-and-dot against the matching rows of
+    the unembedding matrix. The softmax normaliser is a streaming logsumexp over the
+    vocabulary, one chunk of rows at a time, so the largest temporary is
+    (batch, layers, chunk_size) instead of (batch, layers, vocab).
+    
+    Args:
+        hidden: Hidden states of shape (batch, layers, hidden_dim)
+        unembedding: The model's `lm_head` projection
+        target_ids: Target token IDs of shape (batch, targets)
+        chunk_size: Vocabulary rows projected per step
+    
+    Returns:
+        Tensor of shape (batch, layers, targets) with log-probabilities
+    """
+    # Gather-and-dot: only the target rows of the unembedding matrix
+    target_logits = unembedding.target_logits(hidden, target_ids)
+    
+    # Streaming logsumexp over vocabulary chunks
+    log_normaliser = None
+    for _, chunk_logits in unembedding.chunk_logits(hidden, chunk_size):
+        chunk_lse = torch.logsumexp(chunk_logits, dim=-1)
+        log_normaliser = chunk_lse if log_normaliser is None else torch.logaddexp(log_normaliser, chunk_lse)
+    
+    return target_logits - log_normaliser.unsqueeze(-1)
+
+
+def _project_targets(hidden: torch.Tensor, unembedding: Unembedding,
+                     target_id_lists: List[List[int]],
+                     vocab_chunk_size: Optional[int] = VOCAB_CHUNK_SIZE,
+                     log_space: bool = False) -> np.ndarray:
+    """
+    Projects stacked hidden states onto each row's target tokens.
+    
+    Args:
+        hidden: Hidden states of shape (batch, layers, hidden_dim)
+        unembedding: The model's `lm_head` projection
+        target_id_lists: Target token IDs for each row of `hidden`
+        vocab_chunk_size: Use the target-only projection with this many
+            vocabulary rows per chunk; None computes the full softmax instead
+        log_space: Return natural-log probabilities instead of percentages
+    
+    Returns:
+        Array of shape (batch, layers, max_targets) with probabilities as
+        percentages (or log-probabilities), NaN beyond each row's own number
+        of targets
+    """
+    n_rows, n_layers = hidden.shape[0], hidden.shape[1]
+    max_targets = max(len(targets) for targets in target_id_lists)
+    
+    # Pad each row's targets to a (batch, max_targets) tensor
+    target_ids = torch.zeros((n_rows, max_targets), dtype=torch.long, device=hidden.device)
+    for row, targets in enumerate(target_id_lists):
+        target_ids[row, :len(targets)] = torch.tensor(targets, dtype=torch.long)
+    
+    with torch.no_grad():
+        if vocab_chunk_size is None:
+            # One projection for all layers: (batch, layers, vocab)
+            log_probs = torch.log_softmax(unembedding.logits(hidden), dim=-1)
+            target_log_probs = log_probs.gather(-1, target_ids.unsqueeze(1).expand(-1, n_layers, -1))
+        else:
+            target_log_probs = _target_log_probs(hidden, unembedding, target_ids, vocab_chunk_size)
+    
+    if log_space:
+        target_probs = target_log_probs.cpu().numpy()
+    else:
+        target_probs = target_log_probs.exp().cpu().numpy() * 100
+    result = np.full((n_rows, n_layers, max_targets), np.nan, dtype=np.float32)
+    for row, targets in enumerate(target_id_lists):
+        result[row, :, :len(targets)] = target_probs[row, :, :len(targets)]
+    
+    return result
+
+
+def _batched_layer_probabilities(model, token_id_lists: List[List[int]], target_id_lists: List[List[int]],
+                                 batch_size: int = 32,
+                                 vocab_chunk_size: Optional[int] = VOCAB_CHUNK_SIZE,
+                                 layers: Optional[Sequence[int]] = None,
+                                 early_exit: bool = True,
+                                 unembedding: Optional[Unembedding] = None,
+                                 lens: Optional[str] = None,
+                                 tuned_lens: Optional[TunedLens] = None) -> np.ndarray:
+    """
+    Runs the logit lens over many tokenized prompts at once.
+    
+    Prompts are sorted by length so each batch carries as little padding as
+    possible. For every batch, the final-position hidden state of every probed
+    layer is captured with forward hooks, stacked into a (batch, layers,
+    hidden) tensor and projected through `lm_head` together.
+    
+    Args:
+        model: GPT-2 model
+        token_id_lists: Token IDs for each prompt
+        target_id_lists: Target token IDs to track for each prompt
+        batch_size: Number of prompts per forward pass
+        vocab_chunk_size: Use the target-only projection with this many
+            vocabulary rows per chunk; None computes the full softmax instead
+        layers: Layer indices to probe (default: all layers)
+        early_exit: Stop each forward pass after the deepest probed layer
+        unembedding: `lm_head` projection to use (default: `get_unembedding(model)`)
+        lens: "logit", "norm" or "tuned" (default: LENS_MODE)
+        tuned_lens: Translators for the "tuned" lens (default: TUNED_LENS_PATH)
+    
+    Returns:
+        Array of shape (prompts, len(layers), max_targets) with probabilities
+        as percentages. Slots beyond a prompt's own number of targets are NaN.
+    """
+    if any(len(ids) == 0 for ids in token_id_lists):
+        raise ValueError("Every prompt must contain at least one token")
+    
+    if layers is None:
+        layers = list(range(model.config.n_layer))
+    if unembedding is None:
+        unembedding = get_unembedding(model)
+    lens, tuned_lens = _resolve_lens(lens, tuned_lens, model)
+    final_norm = None if lens == "logit" else FinalNorm.from_model(model)
+    max_targets = max(len(targets) for targets in target_id_lists)
+    pad_token_id = model.config.eos_token_id if model.config.eos_token_id is not None else 0
+    
+    result = np.full((len(token_id_lists), len(layers), max_targets), np.nan, dtype=np.float32)
+    order = sorted(range(len(token_id_lists)), key=lambda i: len(token_id_lists[i]))
+    
+    for start in range(0, len(order), batch_size):
+        batch_rows = order[start:start + batch_size]
+        input_ids, attention_mask = _pad_batch([token_id_lists[i] for i in batch_rows], pad_token_id)
+        
+        # Last real position of every probed layer: (batch, layers, hidden)
+        hidden = capture_hidden_states(
+            model, input_ids, attention_mask, layers, early_exit=early_exit
+        ).squeeze(2)
+        hidden = _lens_readout(hidden, layers, model.config.n_layer, final_norm, tuned_lens)
+        
+        batch_probs = _project_targets(
+            hidden, unembedding, [target_id_lists[i] for i in batch_rows], vocab_chunk_size
+        )
+        result[batch_rows, :, :batch_probs.shape[2]] = batch_probs
+    
+    return result
+
+
+def _batched_layer_probabilities_for(model, tokenizer, probes: List[Tuple[str, List[str]]],
+                                     batch_size: int, unembedding: Unembedding) -> np.ndarray:
+    """Tokenizes probes and runs them through the batched engine with a given `Unembedding`."""
+    token_id_lists = tokenizer([prompt for prompt, _ in probes])["input_ids"]
+    target_id_lists = [
+        [get_target_token_id(tokenizer, word, verbose=False) for word in words] for _, words in probes
+    ]
+    return _batched_layer_probabilities(
+        model, token_id_lists, target_id_lists, batch_size=batch_size, unembedding=unembedding
+    )
+
+
+# ============================================================================
+# HIDDEN-STATE CACHE
+# ============================================================================
+
+_TOKENIZER_HASHES: Dict[int, Tuple[object, str]] = {}
+
+
+def tokenizer_hash(tokenizer) -> str:
+    """
+    Hashes the tokenizer's full definition (vocabulary, merges, normaliser).
+    
+    The hash is computed once per tokenizer object and memoised.
+    
+    Args:
+        tokenizer: Hugging Face tokenizer
+    
+    Returns:
+        Hex digest identifying the tokenizer
+    """
+    entry = _TOKENIZER_HASHES.get(id(tokenizer))
+    if entry is not None and entry[0] is tokenizer:
+        return entry[1]
+    
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        payload = backend.to_str()
+    else:
+        payload = json.dumps(sorted(tokenizer.get_vocab().items()))
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    # Keep a reference so the id cannot be reused by another tokenizer
+    _TOKENIZER_HASHES[id(tokenizer)] = (tokenizer, digest)
+    return digest
+
+
+class HiddenStateCache:
+    """
+    Content-addressed on-disk cache of last-position hidden states.
+    
+    Entries live under one directory per model fingerprint (model name,
+    revision, tokenizer hash, dtype). Each prompt is one .npy shard of shape
+    (layers, hidden_dim), named by the hash of its token IDs and loaded
+    memory-mapped. The model's unembedding matrix and final LayerNorm are
+    stored next to the shards, so new targets can be probed without loading
+    the model at all.
+    
+    Reading a shard refreshes its modification time; when shards grow past
+    `max_bytes`, the least recently used ones are deleted. The unembedding
+    matrix does not count toward the cap.
+    """
+    
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._iter_shards())
+    
+    def model_fingerprint(self, model_name: str, revision: Optional[str], tokenizer, dtype: str = "float32") -> str:
+        """
+        Identifies one (model name, revision, tokenizer, dtype) combination.
+        
+        Returns:
+            Short hex digest used as the model's cache directory name
+        """
+        payload = json.dumps([model_name, revision, tokenizer_hash(tokenizer), dtype])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+    
+    def _shard_path(self, fingerprint: str, token_ids: Sequence[int]) -> str:
+        digest = hashlib.sha256(np.asarray(token_ids, dtype=np.int64).tobytes()).hexdigest()
+        return os.path.join(self.cache_dir, fingerprint, "states", digest[:2], f"{digest}.npy")
+    
+    def _iter_shards(self):
+        """Yields (mtime, path, size) for every cached hidden-state shard."""
+        for root, _, files in os.walk(self.cache_dir):
+            if os.path.basename(os.path.dirname(root)) != "states":
+                continue
+            for name in files:
+                if name.endswith(".npy"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    yield stat.st_mtime, path, stat.st_size
+    
+    def _write(self, path: str, array: np.ndarray) -> int:
+        """Writes an array atomically and returns the number of bytes written."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+    
+    def get(self, fingerprint: str, token_ids: Sequence[int]) -> Optional[np.ndarray]:
+        """
+        Looks up the hidden states of one prompt.
+        
+        Returns:
+            Memory-mapped array of shape (layers, hidden_dim), or None on a miss
+        """
+        path = self._shard_path(fingerprint, token_ids)
+        try:
+            hidden = np.load(path, mmap_mode="r")
+            os.utime(path)  # Mark as recently used
+        except (FileNotFoundError, ValueError):
+            return None
+        return hidden
+    
+    def put(self, fingerprint: str, token_ids: Sequence[int], hidden: np.ndarray):
+        """
+        Stores the hidden states of one prompt, evicting old shards if needed.
+        
+        Args:
+            fingerprint: Model fingerprint from `model_fingerprint`
+            token_ids: The prompt's token IDs
+            hidden: Array of shape (layers, hidden_dim)
+        """
+        path = self._shard_path(fingerprint, token_ids)
+        if os.path.exists(path):
+            self._total_bytes -= os.path.getsize(path)
+        self._total_bytes += self._write(path, np.ascontiguousarray(hidden, dtype=np.float32))
+        
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def get_unembedding(self, fingerprint: str) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """
+        Returns:
+            (weight, bias) of the cached `lm_head`, or None if not stored yet
+        """
+        model_dir = os.path.join(self.cache_dir, fingerprint)
+        try:
+            weight = np.load(os.path.join(model_dir, "unembedding.npy"), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        bias_path = os.path.join(model_dir, "unembedding_bias.npy")
+        bias = np.load(bias_path, mmap_mode="r") if os.path.exists(bias_path) else None
+        return weight, bias
+    
+    def put_unembedding(self, fingerprint: str, weight: np.ndarray, bias: Optional[np.ndarray] = None):
+        """Stores the model's `lm_head` weight (and bias, if any)."""
+        model_dir = os.path.join(self.cache_dir, fingerprint)
+        if bias is not None:
+            self._write(os.path.join(model_dir, "unembedding_bias.npy"), bias)
+        self._write(os.path.join(model_dir, "unembedding.npy"), weight)
+    
+    def get_final_norm(self, fingerprint: str) -> Optional[FinalNorm]:
+        """
+        Returns:
+            The cached `ln_f`, or None if not stored yet
+        """
+        try:
+            params = np.load(os.path.join(self.cache_dir, fingerprint, "final_norm.npy"))
+        except (FileNotFoundError, ValueError):
+            return None
+        # Rows: weight, bias, then eps broadcast over the hidden dimension
+        return FinalNorm(torch.from_numpy(params[0]), torch.from_numpy(params[1]), params[2, 0])
+    
+    def put_final_norm(self, fingerprint: str, final_norm: FinalNorm):
+        """Stores the model's `ln_f` parameters."""
+        params = torch.stack([
+            final_norm.weight, final_norm.bias, torch.full_like(final_norm.weight, final_norm.eps)
+        ]).cpu().numpy()
+        self._write(os.path.join(self.cache_dir, fingerprint, "final_norm.npy"), params)
+    
+    def iter_batches(self, fingerprint: str, batch_size: int = 32,
+                     rng: Optional[np.random.Generator] = None):
+        """
+        Streams one model's cached hidden states in minibatches.
+        
+        Only shard paths are listed up front; each batch is read from disk
+        when it is needed, so memory is bounded by one batch.
+        
+        Args:
+            fingerprint: Model fingerprint from `model_fingerprint`
+            batch_size: Prompts per batch
+            rng: Shuffles the shard order when given
+        
+        Yields:
+            Float32 arrays of shape (batch, layers, hidden_dim)
+        """
+        states_dir = os.path.join(self.cache_dir, fingerprint, "states")
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(states_dir) for name in files if name.endswith(".npy")
+        )
+        if rng is not None:
+            rng.shuffle(paths)
+        
+        for start in range(0, len(paths), batch_size):
+            batch = []
+            for path in paths[start:start + batch_size]:
+                try:
+                    batch.append(np.load(path))
+                except (FileNotFoundError, ValueError):
+                    continue  # Evicted by another process
+            if batch:
+                yield np.stack(batch)
+    
+    def _evict(self):
+        """Deletes least recently used shards until usage is below 90% of the cap."""
+        target_bytes = int(self.max_bytes * 0.9)
+        for _, path, size in sorted(self._iter_shards()):
+            if self._total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+    
+    def invalidate(self, fingerprint: Optional[str] = None):
+        """
+        Deletes cached entries.
+        
+        Args:
+            fingerprint: Only drop this model's entries; None clears everything
+        """
+        target = self.cache_dir if fingerprint is None else os.path.join(self.cache_dir, fingerprint)
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._iter_shards())
+
+
+def _fill_cache(model, token_id_lists: List[List[int]], cache: HiddenStateCache,
+                fingerprint: str, batch_size: int = 32):
+    """
+    Looks up every prompt in the cache and runs the model on the misses.
+    
+    Misses capture every layer (no early exit) so the stored shard can serve
+    any later layer selection. The model is loaded only when something is
+    missing, or when the cache does not hold the unembedding / `ln_f` yet.
+    
+    Returns:
+        tuple: (shards of shape (layers, hidden_dim) per prompt, model or None)
+    """
+    shards = [cache.get(fingerprint, ids) for ids in token_id_lists]
+    missing = [i for i, shard in enumerate(shards) if shard is None]
+    has_head = cache.get_unembedding(fingerprint) is not None and cache.get_final_norm(fingerprint) is not None
+    
+    if (missing or not has_head) and model is None:
+        model, _ = load_model_and_tokenizer()
+    
+    if missing:
+        if any(len(token_id_lists[i]) == 0 for i in missing):
+            raise ValueError("Every prompt must contain at least one token")
+        all_layers = list(range(model.config.n_layer))
+        pad_token_id = model.config.eos_token_id if model.config.eos_token_id is not None else 0
+        missing.sort(key=lambda i: len(token_id_lists[i]))
+        
+        for start in range(0, len(missing), batch_size):
+            batch_rows = missing[start:start + batch_size]
+            input_ids, attention_mask = _pad_batch([token_id_lists[i] for i in batch_rows], pad_token_id)
+            hidden = capture_hidden_states(
+                model, input_ids, attention_mask, all_layers, early_exit=False
+            ).squeeze(2).float().cpu().numpy()
+            for row, prompt_idx in enumerate(batch_rows):
+                cache.put(fingerprint, token_id_lists[prompt_idx], hidden[row])
+                shards[prompt_idx] = hidden[row]
+    
+    if not has_head:
+        bias = getattr(model.lm_head, "bias", None)
+        cache.put_unembedding(
+            fingerprint,
+            model.lm_head.weight.detach().float().cpu().numpy(),
+            None if bias is None else bias.detach().float().cpu().numpy()
+        )
+        cache.put_final_norm(fingerprint, FinalNorm.from_model(model))
+    
+    return shards, model
+
+
+def _cached_layer_probabilities(model, tokenizer, token_id_lists: List[List[int]],
+                                target_id_lists: List[List[int]], cache: HiddenStateCache,
+                                batch_size: int = 32,
+                                vocab_chunk_size: Optional[int] = VOCAB_CHUNK_SIZE,
+                                layers: Optional[Sequence[int]] = None,
+                                lens: Optional[str] = None,
+                                tuned_lens: Optional[TunedLens] = None) -> np.ndarray:
+    """
+    Same as `_batched_layer_probabilities`, but reads hidden states from the
+    cache and runs the model only for prompts that are not cached yet.
+    
+    Pass `model=None` to rely on the cache alone; the model is then loaded
+    only on a miss (see `_fill_cache`).
+    
+    Args:
+        model: GPT-2 model, or None to load it only on a cache miss
+        tokenizer: GPT-2 tokenizer
+        token_id_lists: Token IDs for each prompt
+        target_id_lists: Target token IDs to track for each prompt
+        cache: Hidden-state cache
+        batch_size: Number of prompts per forward pass / projection
+        vocab_chunk_size: See `_project_targets`
+        layers: Layer indices to probe (default: all layers)
+        lens: "logit", "norm" or "tuned" (default: LENS_MODE)
+        tuned_lens: Translators for the "tuned" lens (default: TUNED_LENS_PATH)
+    
+    Returns:
+        Array of shape (prompts, len(layers), max_targets) as percentages
+    """
+    source, revision, dtype = model_identity(model)
+    fingerprint = cache.model_fingerprint(source, revision, tokenizer, dtype)
+    shards, model = _fill_cache(model, token_id_lists, cache, fingerprint, batch_size)
+    
+    if model is not None:
+        projection = get_unembedding(model)
+    else:
+        unembedding = cache.get_unembedding(fingerprint)
+        weight = torch.from_numpy(np.array(unembedding[0])).to(DEVICE)
+        bias = None if unembedding[1] is None else torch.from_numpy(np.array(unembedding[1])).to(DEVICE)
+        projection = Unembedding(weight, bias, _default_lm_head_precision())
+    
+    lens, tuned_lens = _resolve_lens(lens, tuned_lens, model, *shards[0].shape)
+    final_norm = None if lens == "logit" else cache.get_final_norm(fingerprint)
+    
+    n_layers = shards[0].shape[0]
+    if layers is None:
+        layers = list(range(n_layers))
+    max_targets = max(len(targets) for targets in target_id_lists)
+    result = np.full((len(token_id_lists), len(layers), max_targets), np.nan, dtype=np.float32)
+    
+    for start in range(0, len(shards), batch_size):
+        batch_rows = list(range(start, min(start + batch_size, len(shards))))
+        hidden = torch.from_numpy(np.stack([shards[i][layers] for i in batch_rows])).to(DEVICE)
+        hidden = _lens_readout(hidden, layers, n_layers, final_norm, tuned_lens)
+        batch_probs = _project_targets(
+            hidden, projection, [target_id_lists[i] for i in batch_rows], vocab_chunk_size
+        )
+        result[batch_rows, :, :batch_probs.shape[2]] = batch_probs
+    
+    return result
+
+
+def extract_batch_probabilities(model, tokenizer, probes: List[Tuple[str, List[str]]],
+                                batch_size: int = 32,
+                                vocab_chunk_size: Optional[int] = VOCAB_CHUNK_SIZE,
+                                layers: Optional[Sequence[int]] = None,
+                                cache: Optional[HiddenStateCache] = None,
+                                lens: Optional[str] = None,
+                                tuned_lens: Optional[TunedLens] = None) -> np.ndarray:
+    """
+    Runs the logit lens over many (prompt, target words) pairs.
+    
+    This is the throughput path for large probe sets: prompts are tokenized
+    in one call, grouped into padded batches and every layer is projected
+    through the language model head together.
+    
+    Args:
+        model: GPT-2 model
+        tokenizer: GPT-2 tokenizer
+        probes: List of (prompt, [target words]) pairs
+        batch_size: Number of prompts per forward pass
+        vocab_chunk_size: Vocabulary chunk for the target-only projection;
+            None falls back to a full softmax per layer
+        layers: Layer indices to probe (default: all layers). The forward
+            pass stops after the deepest one
+        cache: Optional hidden-state cache; cached prompts skip the model
+            (which may then be None)
+        lens: "logit", "norm" or "tuned" (default: LENS_MODE)
+        tuned_lens: Translators for the "tuned" lens (default: TUNED_LENS_PATH)
+    
+    Returns:
+        Array of shape (prompts, len(layers), targets) with probabilities as
+        percentages. Prompts with fewer targets than the longest list are
+        padded with NaN.
+    """
+    prompts = [prompt for prompt, _ in probes]
+    token_id_lists = tokenizer(prompts)["input_ids"]
+    
+    # Many probes share the same target words, so resolve each word once
+    target_ids_by_word = {}
+    target_id_lists = []
+    for _, target_words in probes:
+        for word in target_words:
+            if word not in target_ids_by_word:
+                target_ids_by_word[word] = get_target_token_id(tokenizer, word, verbose=False)
+        target_id_lists.append([target_ids_by_word[word] for word in target_words])
+    
+    if cache is not None:
+        return _cached_layer_probabilities(
+            model, tokenizer, token_id_lists, target_id_lists, cache,
+            batch_size=batch_size,
+            vocab_chunk_size=vocab_chunk_size,
+            layers=layers,
+            lens=lens,
+            tuned_lens=tuned_lens
+        )
+    
+    return _batched_layer_probabilities(
+        model, token_id_lists, target_id_lists,
+        batch_size=batch_size,
+        vocab_chunk_size=vocab_chunk_size,
+        layers=layers,
+        lens=lens,
+        tuned_lens=tuned_lens
+    )
+
+
+def extract_layer_probabilities(model, tokenizer, prompt: str, target_token_id: int,
+                                cache: Optional[HiddenStateCache] = None) -> List[float]:
     """
     Extracts the probability of the target token at each layer.
     
@@ -124,6 +1459,8 @@ def extract_layer_probabilities(model, tokenizer, prompt: str, target_token_id:
         tokenizer: GPT-2 tokenizer
         prompt: Input text
         target_token_id: Token ID to track
+        cache: Optional hidden-state cache. On a hit the model is not run
+            (and may be None)
     
     Returns:
         List of probabilities (one per layer, 0-11)
@@ -133,43 +1470,24 @@ def extract_layer_probabilities(model, tokenizer, prompt: str, target_token_id:
     print("=" * 70)
     print(f"\nPrompt: \"{prompt}\"")
     print(f"Target: \"{TARGET_WORD}\"")
+    print(f"Lens: {LENS_MODE}")
     
     # Tokenize input
-    input_ids = tokenizer.encode(prompt, return_tensors="pt").to(DEVICE)
-    print(f"\nTokenized input: {input_ids.shape[1]} tokens")
-    
-    # Run forward pass with hidden states output
-    with torch.no_grad():
-        outputs = model(input_ids, output_hidden_states=True)
-    
-    # Get all hidden states (tuple of 13 tensors: embedding + 12 layers)
-    hidden_states = outputs.hidden_states
-    print(f"Hidden states extracted: {len(hidden_states)} layers (including embedding)")
+    input_ids = tokenizer.encode(prompt)
+    print(f"\nTokenized input: {len(input_ids)} tokens")
     
-    # Extract probabilities for each layer
-    layer_probabilities = []
+    # Single-prompt run of the batched engine: (1, layers, 1)
+    if cache is not None:
+        probabilities = _cached_layer_probabilities(model, tokenizer, [input_ids], [[target_token_id]], cache)
+    else:
+        probabilities = _batched_layer_probabilities(model, [input_ids], [[target_token_id]])
+    layer_probabilities = [float(p) for p in probabilities[0, :, 0]]
+    print(f"Layers probed: {len(layer_probabilities)}")
     
     print(f"\n{'Layer':<8} {'Probability':<15} {'Confidence'}")
     print("-" * 70)
     
-    # Note: hidden_states[0] is the embedding layer
-    # hidden_states[1] through hidden_states[12] are transformer layers 0-11
-    for layer_idx in range(1, 13):  # Skip embedding (index 0), process layers 1-12
-        # Get hidden state at the last token position
-        # Shape: (batch_size=1, seq_len, hidden_dim=768)
-        hidden = hidden_states[layer_idx][:, -1, :]  # Shape: (1, 768)
-        
-        # Project through language model head to get logits
-        # Shape: (1, vocab_size=50257)
-        logits = model.lm_head(hidden)
-        
-        # Apply softmax to get probabilities
-        probs = torch.softmax(logits, dim=-1)
-        
-        # Get probability for target token and convert to percentage
-        target_prob = probs[0, target_token_id].item() * 100
-        layer_probabilities.append(target_prob)
-        
+    for layer_idx, target_prob in enumerate(layer_probabilities):
         # Visual indicator of confidence
         if target_prob < 1:
             confidence = "Very Low 🔴"
@@ -182,11 +1500,435 @@ def extract_layer_probabilities(model, tokenizer, prompt: str, target_token_id:
         else:
             confidence = "Very High 🟢🟢"
         
-        print(f"Layer {layer_idx-1:<2}  {target_prob:>6.2f}%          {confidence}")
+        print(f"Layer {layer_idx:<2}  {target_prob:>6.2f}%          {confidence}")
     
     return layer_probabilities
 
 
+# ============================================================================
+# TUNED LENS TRAINING
+# ============================================================================
+
+def train_tuned_lens(tokenizer, prompts: Optional[List[str]] = None, model=None,
+                     cache: Optional[HiddenStateCache] = None, epochs: int = 3,
+                     batch_size: int = 32, learning_rate: float = 1e-3, seed: int = 0,
+                     output_path: Optional[str] = None) -> TunedLens:
+    """
+    Trains one affine translator per layer on cached hidden states.
+    
+    Each translator is fit so that ln_f(h + h @ A_l + b_l), projected through
+    `lm_head`, matches the model's own final-layer distribution: the loss is
+    KL(final || lens), averaged over layers. Training streams the cache's
+    last-position shards in shuffled minibatches, so memory is bounded by
+    `batch_size` rather than by the size of the dataset.
+    
+    Args:
+        tokenizer: GPT-2 tokenizer
+        prompts: Training prompts; any that are not cached yet are run
+            through the model first. None trains on everything already
+            cached for this model
+        model: GPT-2 model, or None to load it only when needed
+        cache: Hidden-state cache (default: HiddenStateCache())
+        epochs: Passes over the cached hidden states
+        batch_size: Prompts per optimisation step
+        learning_rate: Adam learning rate
+        seed: Seed for the shard shuffling
+        output_path: Where to save the translators (default: TUNED_LENS_PATH)
+    
+    Returns:
+        The trained TunedLens, also saved to `output_path`
+    """
+    cache = cache or HiddenStateCache()
+    output_path = output_path or TUNED_LENS_PATH
+    source, revision, dtype = model_identity(model)
+    fingerprint = cache.model_fingerprint(source, revision, tokenizer, dtype)
+    _fill_cache(model, tokenizer(prompts)["input_ids"] if prompts else [], cache, fingerprint)
+    
+    first = next(cache.iter_batches(fingerprint, batch_size=1), None)
+    if first is None:
+        raise ValueError("No cached hidden states to train on; pass some prompts")
+    n_layers, hidden_dim = first.shape[1], first.shape[2]
+    
+    # Trained in float32 whatever the model's precision
+    weight, bias = cache.get_unembedding(fingerprint)
+    unembedding = Unembedding(
+        torch.from_numpy(np.array(weight)).to(DEVICE),
+        None if bias is None else torch.from_numpy(np.array(bias)).to(DEVICE),
+        "float32"
+    )
+    final_norm = cache.get_final_norm(fingerprint)
+    
+    tuned_lens = TunedLens.identity(n_layers, hidden_dim)
+    tuned_lens.weight = tuned_lens.weight.to(DEVICE).requires_grad_()
+    tuned_lens.bias = tuned_lens.bias.to(DEVICE).requires_grad_()
+    optimizer = torch.optim.Adam([tuned_lens.weight, tuned_lens.bias], lr=learning_rate)
+    inner_layers = list(range(n_layers - 1))  # The last layer already is the final distribution
+    rng = np.random.default_rng(seed)
+    
+    print(f"\n{'=' * 70}")
+    print("TRAINING TUNED LENS")
+    print("=" * 70)
+    print(f"\n{n_layers - 1} translators of {hidden_dim}x{hidden_dim}, batch size {batch_size}")
+    
+    for epoch in range(epochs):
+        layer_kl = torch.zeros(len(inner_layers))
+        n_rows = 0
+        for batch in cache.iter_batches(fingerprint, batch_size, rng):
+            hidden = torch.from_numpy(batch).to(DEVICE)
+            with torch.no_grad():
+                final_log_probs = torch.log_softmax(unembedding.logits(hidden[:, -1]), dim=-1).unsqueeze(1)
+            
+            lens_hidden = final_norm(tuned_lens.translate(hidden[:, :-1], inner_layers))
+            lens_log_probs = torch.log_softmax(unembedding.logits(lens_hidden), dim=-1)
+            kl = (final_log_probs.exp() * (final_log_probs - lens_log_probs)).sum(dim=-1)  # (batch, layers)
+            
+            optimizer.zero_grad()
+            kl.mean().backward()
+            optimizer.step()
+            
+            layer_kl += kl.detach().sum(dim=0).cpu()
+            n_rows += len(batch)
+        
+        layer_kl /= n_rows
+        print(f"  Epoch {epoch + 1}/{epochs}: mean KL {layer_kl.mean():.4f} nats over {n_rows} prompts")
+    
+    print(f"\n{'Layer':<8} {'KL (nats)':<10}")
+    print("-" * 70)
+    for layer, value in zip(inner_layers, layer_kl.tolist()):
+        print(f"Layer {layer:<2}  {value:>8.4f}")
+    
+    tuned_lens.weight = tuned_lens.weight.detach()
+    tuned_lens.bias = tuned_lens.bias.detach()
+    tuned_lens.trained_on = (source, revision, dtype)
+    tuned_lens.save(output_path)
+    _TUNED_LENSES[output_path] = tuned_lens
+    print(f"\n✓ Tuned lens saved to: {output_path}")
+    
+    return tuned_lens
+
+
+# ============================================================================
+# MULTI-TOKEN TARGETS
+# ============================================================================
+
+def _expand_past(past_key_values, n: int):
+    """
+    Repeats a batch-1 KV cache n times along the batch dimension.
+    
+    The forward pass appends to cache objects in place, so the prefix cache
+    is copied rather than shared.
+    """
+    if hasattr(past_key_values, "batch_repeat_interleave"):
+        expanded = copy.deepcopy(past_key_values)
+        expanded.batch_repeat_interleave(n)
+        return expanded
+    # Legacy tuple-of-tuples format
+    return tuple(tuple(t.repeat_interleave(n, dim=0) for t in layer) for layer in past_key_values)
+
+
+def score_continuations(model, tokenizer, prompt: str, candidates: List[str],
+                        layers: Optional[Sequence[int]] = None,
+                        vocab_chunk_size: Optional[int] = VOCAB_CHUNK_SIZE) -> np.ndarray:
+    """
+    Computes the per-layer log-probability of complete multi-token answers.
+    
+    The prompt is encoded once with `use_cache=True`. All candidates are then
+    teacher-forced together in one batched pass on top of the prompt's
+    `past_key_values`, so N candidates cost one prefix pass plus one pass over
+    the (short) candidate tokens. Token j of a candidate is read from the
+    hidden state just before it: the prompt's last position for j = 0,
+    candidate position j - 1 otherwise. Every (candidate token, layer) pair is
+    then scored in a single target-only projection.
+    
+    Args:
+        model: GPT-2 model
+        tokenizer: GPT-2 tokenizer
+        prompt: Input text
+        candidates: Candidate continuations (a leading space is added)
+        layers: Layer indices to read out (default: all layers)
+        vocab_chunk_size: See `_project_targets`
+    
+    Returns:
+        Array of shape (candidates, len(layers)) with natural-log
+        probabilities of each full candidate. The last layer gives the
+        model's own log-likelihood.
+    """
+    n_layers = model.config.n_layer
+    if layers is None:
+        layers = list(range(n_layers))
+    
+    prompt_ids = tokenizer.encode(prompt)
+    if not prompt_ids:
+        raise ValueError("The prompt must contain at least one token")
+    candidate_ids = [get_target_token_ids(tokenizer, candidate) for candidate in candidates]
+    
+    # Prefix pass: last-position hidden states and the KV cache
+    input_ids = torch.tensor([prompt_ids], dtype=torch.long, device=DEVICE)
+    prefix_mask = torch.ones_like(input_ids)
+    prefix_hidden, past = capture_hidden_states(
+        model, input_ids, prefix_mask, layers, return_past=True
+    )
+    prefix_hidden = prefix_hidden[0, :, 0]  # (layers, hidden)
+    
+    # Continuation pass: feed every candidate token except the last
+    rows_hidden = [prefix_hidden] * len(candidates)
+    rows_target = [ids[0] for ids in candidate_ids]
+    rows_candidate = list(range(len(candidates)))
+    
+    max_fed = max(len(ids) for ids in candidate_ids) - 1
+    if max_fed > 0:
+        pad_token_id = model.config.eos_token_id if model.config.eos_token_id is not None else 0
+        fed_ids, fed_mask = _pad_batch([ids[:-1] or [pad_token_id] for ids in candidate_ids], pad_token_id)
+        for row, ids in enumerate(candidate_ids):
+            if len(ids) == 1:
+                fed_mask[row] = 0  # Nothing to feed; the dummy token is never read
+        
+        attention_mask = torch.cat([prefix_mask.expand(len(candidates), -1), fed_mask], dim=1)
+        positions = torch.arange(max_fed, device=fed_ids.device).expand(len(candidates), -1)
+        continuation_hidden = capture_hidden_states(
+            model, fed_ids, attention_mask, layers,
+            positions=positions,
+            early_exit=False,
+            past_key_values=_expand_past(past, len(candidates))
+        )  # (candidates, layers, max_fed, hidden)
+        
+        for row, ids in enumerate(candidate_ids):
+            for j in range(1, len(ids)):
+                rows_hidden.append(continuation_hidden[row, :, j - 1])
+                rows_target.append(ids[j])
+                rows_candidate.append(row)
+    
+    # One projection for every (candidate token, layer) pair
+    token_log_probs = _project_targets(
+        torch.stack(rows_hidden), get_unembedding(model),
+        [[target] for target in rows_target], vocab_chunk_size, log_space=True
+    )[:, :, 0]
+    
+    scores = np.zeros((len(candidates), len(layers)))
+    np.add.at(scores, np.array(rows_candidate), token_log_probs)
+    return scores
+
+
+# ============================================================================
+# POSITION LOGIT LENS
+# ============================================================================
+
+def extract_position_probabilities(model, tokenizer, prompts: List[str], positions: List[List[int]],
+                                   target_words: List[str], layers: Optional[Sequence[int]] = None,
+                                   vocab_chunk_size: Optional[int] = VOCAB_CHUNK_SIZE,
+                                   lens: Optional[str] = None,
+                                   tuned_lens: Optional[TunedLens] = None) -> np.ndarray:
+    """
+    Runs the logit lens at several positions of each prompt in one pass.
+    
+    `extract_layer_probabilities` reads only the last position, so reading
+    n positions would take n forward passes. Here hooks keep the requested
+    positions of every probed layer in a single batched forward pass, and
+    all (layer, position) hidden states go through `lm_head` together as
+    (prompts x positions) rows.
+    
+    Args:
+        model: GPT-2 model
+        tokenizer: GPT-2 tokenizer
+        prompts: Input texts
+        positions: Token positions to read for each prompt; every prompt
+            needs the same number. Negative positions count from the end
+        target_words: The word to track for each prompt
+        layers: Layer indices to probe (default: all layers)
+        vocab_chunk_size: Vocabulary chunk for the target-only projection;
+            None falls back to a full softmax
+        lens: "logit", "norm" or "tuned" (default: LENS_MODE)
+        tuned_lens: Translators for the "tuned" lens (default: TUNED_LENS_PATH)
+    
+    Returns:
+        Array of shape (prompts, len(layers), positions) with the target's
+        probability as a percentage
+    """
+    if layers is None:
+        layers = list(range(model.config.n_layer))
+    token_id_lists = tokenizer(prompts)["input_ids"]
+    if any(len(ids) == 0 for ids in token_id_lists):
+        raise ValueError("Every prompt must contain at least one token")
+    if len({len(row) for row in positions}) != 1:
+        raise ValueError("Every prompt needs the same number of positions")
+    
+    resolved = []
+    for ids, row in zip(token_id_lists, positions):
+        row = [position + len(ids) if position < 0 else position for position in row]
+        if any(position < 0 or position >= len(ids) for position in row):
+            raise ValueError(f"Positions {row} are outside a {len(ids)}-token prompt")
+        resolved.append(row)
+    n_positions = len(resolved[0])
+    
+    pad_token_id = model.config.eos_token_id if model.config.eos_token_id is not None else 0
+    unembedding = get_unembedding(model)
+    lens, tuned_lens = _resolve_lens(lens, tuned_lens, model)
+    final_norm = None if lens == "logit" else FinalNorm.from_model(model)
+    input_ids, attention_mask = _pad_batch(token_id_lists, pad_token_id)
+    
+    # (prompts, layers, positions, hidden) -> (prompts x positions, layers, hidden)
+    hidden = capture_hidden_states(
+        model, input_ids, attention_mask, layers, positions=torch.tensor(resolved, device=input_ids.device)
+    )
+    hidden = hidden.transpose(1, 2).reshape(-1, len(layers), hidden.shape[-1])
+    hidden = _lens_readout(hidden, layers, model.config.n_layer, final_norm, tuned_lens)
+    
+    target_ids = [get_target_token_id(tokenizer, word, verbose=False) for word in target_words]
+    probs = _project_targets(
+        hidden, unembedding, [[target_id] for target_id in target_ids for _ in range(n_positions)], vocab_chunk_size
+    )
+    return probs[:, :, 0].reshape(len(prompts), n_positions, len(layers)).transpose(0, 2, 1)
+
+
+# ============================================================================
+# TOP-K LOGIT LENS
+# ============================================================================
+
+@dataclass
+class TopKLens:
+    """
+    Top-k logit lens readout for every layer and every token position.
+    
+    Positions of all prompts are stored back to back (no padding): rows
+    `offsets[i]:offsets[i + 1]` of `token_ids` / `probs` belong to prompt i.
+    
+    Attributes:
+        token_ids: int32 array of shape (total_positions, layers, k)
+        probs: float16 array of shape (total_positions, layers, k), in [0, 1]
+        offsets: int64 array of shape (prompts + 1,)
+        layers: Layer index of each entry along the layer axis
+    """
+    token_ids: np.ndarray
+    probs: np.ndarray
+    offsets: np.ndarray
+    layers: List[int]
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def prompt(self, prompt_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            tuple: (token_ids, probs) of one prompt, each (positions, layers, k)
+        """
+        start, end = self.offsets[prompt_idx], self.offsets[prompt_idx + 1]
+        return self.token_ids[start:end], self.probs[start:end]
+    
+    def decode(self, tokenizer, prompt_idx: int, position: int = -1) -> List[List[Tuple[str, float]]]:
+        """
+        Decodes the top-k predictions of one position.
+        
+        Args:
+            tokenizer: GPT-2 tokenizer
+            prompt_idx: Index of the prompt
+            position: Token position within the prompt (default: last)
+        
+        Returns:
+            One list of (token, probability) pairs per layer
+        """
+        token_ids, probs = self.prompt(prompt_idx)
+        return [
+            [(tokenizer.decode([int(t)]), float(p)) for t, p in zip(token_ids[position, layer], probs[position, layer])]
+            for layer in range(len(self.layers))
+        ]
+
+
+def extract_topk_lens(model, tokenizer, prompts: List[str], k: int = 5,
+                      batch_size: int = 8, layers: Optional[Sequence[int]] = None,
+                      row_chunk_size: int = 256, lens: Optional[str] = None,
+                      tuned_lens: Optional[TunedLens] = None) -> TopKLens:
+    """
+    Runs a full-vocabulary logit lens and keeps the top-k tokens at every
+    layer and position.
+    
+    Hidden states for all positions of the probed layers are captured with
+    hooks and flattened into (layers x positions) rows. Rows are projected
+    through `lm_head` and reduced with one batched `torch.topk` per chunk of
+    `row_chunk_size` rows, so the largest temporary is
+    (row_chunk_size, vocab) no matter how many prompts are scanned.
+    
+    Args:
+        model: GPT-2 model
+        tokenizer: GPT-2 tokenizer
+        prompts: Input texts
+        k: Number of top tokens kept per (layer, position)
+        batch_size: Number of prompts per forward pass
+        layers: Layer indices to probe (default: all layers)
+        row_chunk_size: (layer, position) rows projected per step
+        lens: "logit", "norm" or "tuned" (default: LENS_MODE)
+        tuned_lens: Translators for the "tuned" lens (default: TUNED_LENS_PATH)
+    
+    Returns:
+        TopKLens with int32 token IDs and float16 probabilities
+    """
+    if layers is None:
+        layers = list(range(model.config.n_layer))
+    token_id_lists = tokenizer(prompts)["input_ids"]
+    if any(len(ids) == 0 for ids in token_id_lists):
+        raise ValueError("Every prompt must contain at least one token")
+    
+    lengths = np.array([len(ids) for ids in token_id_lists], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    token_ids = np.empty((offsets[-1], len(layers), k), dtype=np.int32)
+    probs = np.empty((offsets[-1], len(layers), k), dtype=np.float16)
+    pad_token_id = model.config.eos_token_id if model.config.eos_token_id is not None else 0
+    unembedding = get_unembedding(model)
+    lens, tuned_lens = _resolve_lens(lens, tuned_lens, model)
+    final_norm = None if lens == "logit" else FinalNorm.from_model(model)
+    
+    for start in range(0, len(prompts), batch_size):
+        batch_rows = list(range(start, min(start + batch_size, len(prompts))))
+        input_ids, attention_mask = _pad_batch([token_id_lists[i] for i in batch_rows], pad_token_id)
+        positions = torch.arange(input_ids.shape[1], device=input_ids.device).expand(len(batch_rows), -1)
+        
+        # (batch, layers, seq_len, hidden) -> (batch, seq_len, layers, hidden)
+        hidden = capture_hidden_states(model, input_ids, attention_mask, layers, positions=positions)
+        hidden = hidden.transpose(1, 2)
+        
+        # Keep only real positions, then flatten to (rows, hidden)
+        real = attention_mask.bool()
+        real_hidden = _lens_readout(hidden[real], layers, model.config.n_layer, final_norm, tuned_lens)
+        flat_hidden = real_hidden.reshape(-1, hidden.shape[-1])
+        
+        flat_ids = torch.empty((flat_hidden.shape[0], k), dtype=torch.int32)
+        flat_probs = torch.empty((flat_hidden.shape[0], k), dtype=torch.float16)
+        with torch.no_grad():
+            for row in range(0, flat_hidden.shape[0], row_chunk_size):
+                logits = unembedding.logits(flat_hidden[row:row + row_chunk_size])
+                top_logits, top_ids = torch.topk(logits, k, dim=-1)
+                top_probs = (top_logits - torch.logsumexp(logits, dim=-1, keepdim=True)).exp()
+                flat_ids[row:row + row_chunk_size] = top_ids.to(torch.int32).cpu()
+                flat_probs[row:row + row_chunk_size] = top_probs.to(torch.float16).cpu()
+        
+        # Real positions come out prompt by prompt, in order
+        batch_start, batch_end = offsets[batch_rows[0]], offsets[batch_rows[-1] + 1]
+        token_ids[batch_start:batch_end] = flat_ids.numpy().reshape(-1, len(layers), k)
+        probs[batch_start:batch_end] = flat_probs.numpy().reshape(-1, len(layers), k)
+    
+    return TopKLens(token_ids=token_ids, probs=probs, offsets=offsets, layers=list(layers))
+
+
+def print_topk_table(lens: TopKLens, tokenizer, prompt_idx: int = 0, position: int = -1):
+    """
+    Prints the top-k predictions of one position, one row per layer.
+    
+    Args:
+        lens: Result of `extract_topk_lens`
+        tokenizer: GPT-2 tokenizer
+        prompt_idx: Index of the prompt
+        position: Token position within the prompt (default: last)
+    """
+    print(f"\n{'Layer':<8} Top predictions")
+    print("-" * 70)
+    for layer, predictions in zip(lens.layers, lens.decode(tokenizer, prompt_idx, position)):
+        formatted = "  ".join(f"{token!r} {prob * 100:.1f}%" for token, prob in predictions)
+        print(f"Layer {layer:<2}  {formatted}")
+
+
+# ============================================================================
+# VISUALIZATION AND SUMMARY
+# ============================================================================
+
 def create_heatmap_visualization(probabilities: List[float], output_file: str = "project2_logit_lens.png"):
     """
     Creates a heatmap visualization showing the probability progression.
@@ -195,6 +1937,11 @@ def create_heatmap_visualization(probabilities: List[float], output_file: str =
         probabilities: List of probabilities (one per layer)
         output_file: Output filename for the visualization
     """
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend for file saving
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
     print(f"\n{'=' * 70}")
     print("CREATING VISUALIZATION")
     print("=" * 70)
@@ -303,15 +2050,25 @@ def main():
     """
     Main execution function that runs the full Logit Lens analysis.
     """
+    print("=" * 70)
+    print("LOGIT LENS: PEERING INSIDE GPT-2")
+    print("=" * 70)
+    
     try:
-        # Step 1: Load model and tokenizer
-        model, tokenizer = load_model_and_tokenizer()
+        # Step 1: Load model and tokenizer (with the cache, the model is
+        # loaded only if this prompt has not been run before)
+        if USE_HIDDEN_STATE_CACHE:
+            cache = HiddenStateCache()
+            model, tokenizer = None, load_tokenizer()
+        else:
+            cache = None
+            model, tokenizer = load_model_and_tokenizer()
         
         # Step 2: Get target token ID
         target_token_id = get_target_token_id(tokenizer, TARGET_WORD)
         
         # Step 3: Extract probabilities at each layer
-        probabilities = extract_layer_probabilities(model, tokenizer, PROMPT, target_token_id)
+        probabilities = extract_layer_probabilities(model, tokenizer, PROMPT, target_token_id, cache=cache)
         
         # Step 4: Create visualization
         create_heatmap_visualization(probabilities)
@@ -319,6 +2076,9 @@ def main():
         # Step 5: Print summary analysis
         print_summary(probabilities)
         
+        if MODEL_LOAD_STATS:
+            print_load_report()
+        
         print(f"\n{'=' * 70}")
         print("✅ LOGIT LENS ANALYSIS COMPLETE!")
         print("=" * 70)
@@ -329,7 +2089,7 @@ def main():
         print(f"  2. Try different prompts and target words")
         print(f"  3. Compare with other models (gpt2-medium, gpt2-large)")
         print()
-        
+    
     except Exception as e:
         print(f"\n❌ ERROR: {e}")
         print("\nTroubleshooting:")
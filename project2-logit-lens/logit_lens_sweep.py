@@ -0,0 +1,345 @@
+"""
+Logit Lens Sweep - Multi-process runner for large prompt files
+Runs the batched logit lens over a JSONL or CSV file of prompts and targets.
+
+The input is split into fixed-size shards that are spread over a process
+pool. Each worker loads the model once (through the model registry in
+logit_lens.py) with a controlled number of torch intra-op threads. Every
+finished shard is written straight to its own .npz chunk, so:
+
+- results stream to disk as the sweep progresses
+- memory stays bounded by one shard per worker
+- an interrupted sweep resumes by skipping shards that already exist, once
+  the manifest confirms the same settings and the same input content
+
+Input formats:
+- JSONL: one {"prompt": "...", "targets": ["Paris", "London"]} per line
+  ("target": "Paris" is accepted for a single word)
+- CSV:   columns `prompt` and `targets`, with targets separated by "|"
+
+Usage:
+    python3 logit_lens_sweep.py prompts.jsonl --output sweep_results --workers 4
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import logit_lens
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SHARD_SIZE = 1000  # Prompts per shard (one output chunk each)
+BATCH_SIZE = 32  # Prompts per forward pass inside a worker
+MANIFEST_NAME = "manifest.json"
+
+# ============================================================================
+# INPUT / OUTPUT
+# ============================================================================
+
+def read_probes(input_path: str) -> List[Tuple[str, List[str]]]:
+    """
+    Reads (prompt, [target words]) pairs from a JSONL or CSV file.
+
+    Args:
+        input_path: Path ending in .jsonl / .json or .csv
+
+    Returns:
+        List of (prompt, targets) pairs in file order
+    """
+    probes = []
+
+    if input_path.endswith(".csv"):
+        with open(input_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                targets = [t.strip() for t in row["targets"].split("|") if t.strip()]
+                probes.append((row["prompt"], targets))
+    else:
+        with open(input_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                targets = record.get("targets") or [record["target"]]
+                probes.append((record["prompt"], list(targets)))
+
+    if any(not targets for _, targets in probes):
+        raise ValueError("Every prompt needs at least one target")
+    return probes
+
+
+def probes_hash(probes: List[Tuple[str, List[str]]]) -> str:
+    """
+    SHA-256 of the prompts and targets, in order.
+
+    Stored in the manifest, so a resumed sweep notices when the input file
+    was edited in place and its finished shards no longer match.
+    """
+    digest = hashlib.sha256()
+    for prompt, targets in probes:
+        digest.update(json.dumps([prompt, targets], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """
+    SHA-256 of a file's bytes.
+
+    Stored in the manifest for the tuned lens, so a resumed sweep notices
+    when the translators were retrained at the same path.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _shard_path(output_dir: str, shard_idx: int) -> str:
+    return os.path.join(output_dir, f"shard_{shard_idx:06d}.npz")
+
+
+def _write_manifest(output_dir: str, manifest: Dict):
+    """
+    Writes the sweep manifest, or checks it against an existing one so a
+    resumed sweep cannot silently mix settings.
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise ValueError(
+                f"{path} was written with different settings; use a new output directory "
+                f"or delete it to restart.\n  existing: {existing}\n  requested: {manifest}"
+            )
+        return
+
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_sweep_results(output_dir: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Loads and merges every finished shard of a sweep.
+
+    Args:
+        output_dir: Directory written by `run_sweep`
+
+    Returns:
+        tuple: (row_index, probs) where probs has shape
+        (rows, layers, max_targets) as percentages, NaN-padded, sorted by
+        the row's position in the input file
+    """
+    shard_files = sorted(
+        name for name in os.listdir(output_dir) if name.startswith("shard_") and name.endswith(".npz")
+    )
+    if not shard_files:
+        raise FileNotFoundError(f"No finished shards in {output_dir}")
+
+    chunks = []
+    for name in shard_files:
+        with np.load(os.path.join(output_dir, name)) as data:
+            chunks.append((data["row_index"], data["probs"]))
+
+    n_layers = chunks[0][1].shape[1]
+    max_targets = max(probs.shape[2] for _, probs in chunks)
+    row_index = np.concatenate([rows for rows, _ in chunks])
+    probs = np.full((len(row_index), n_layers, max_targets), np.nan, dtype=np.float32)
+
+    offset = 0
+    for _, chunk_probs in chunks:
+        probs[offset:offset + len(chunk_probs), :, :chunk_probs.shape[2]] = chunk_probs
+        offset += len(chunk_probs)
+
+    order = np.argsort(row_index)
+    return row_index[order], probs[order]
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+# Per-process state, filled by the pool initializer
+_WORKER: Dict = {}
+
+
+def _init_worker(threads: int, model_name: str, dtype: str, local_dir: Optional[str],
+                 lens: str, tuned_lens_path: str):
+    """
+    Pool initializer: pins torch intra-op threads, applies the parent's
+    settings (spawned workers re-import logit_lens with its defaults) and
+    loads the model once.
+    """
+    import torch
+    torch.set_num_threads(threads)
+
+    logit_lens.MODEL_NAME = model_name
+    logit_lens.MODEL_DTYPE = dtype
+    logit_lens.LOCAL_MODEL_DIR = local_dir
+    logit_lens.LENS_MODE = lens
+    logit_lens.TUNED_LENS_PATH = tuned_lens_path
+    model, tokenizer = logit_lens.get_model()
+    _WORKER["model"] = model
+    _WORKER["tokenizer"] = tokenizer
+
+
+def _run_shard(shard_idx: int, first_row: int, probes: List[Tuple[str, List[str]]],
+               output_dir: str, batch_size: int, layers: Optional[List[int]]) -> Tuple[int, int, float]:
+    """
+    Runs one shard and writes it to disk atomically.
+
+    Returns:
+        tuple: (shard_idx, number of prompts, seconds)
+    """
+    start = time.perf_counter()
+    probs = logit_lens.extract_batch_probabilities(
+        _WORKER["model"], _WORKER["tokenizer"], probes,
+        batch_size=batch_size,
+        layers=layers
+    )
+    row_index = np.arange(first_row, first_row + len(probes), dtype=np.int64)
+
+    path = _shard_path(output_dir, shard_idx)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, row_index=row_index, probs=probs)
+    os.replace(tmp_path, path)  # A shard file exists only once it is complete
+
+    return shard_idx, len(probes), time.perf_counter() - start
+
+
+# ============================================================================
+# SWEEP
+# ============================================================================
+
+def run_sweep(input_path: str, output_dir: str, workers: int = 1,
+              threads_per_worker: Optional[int] = None, shard_size: int = SHARD_SIZE,
+              batch_size: int = BATCH_SIZE, layers: Optional[List[int]] = None,
+              lens: Optional[str] = None) -> str:
+    """
+    Runs the logit lens over a prompt file with a pool of worker processes.
+
+    Args:
+        input_path: JSONL or CSV file of prompts and targets
+        output_dir: Directory for shard chunks and the manifest
+        workers: Number of worker processes
+        threads_per_worker: torch intra-op threads per worker
+            (default: CPU cores divided evenly between workers)
+        shard_size: Prompts per shard
+        batch_size: Prompts per forward pass
+        layers: Layer indices to probe (default: all layers)
+        lens: "logit", "norm" or "tuned" (default: logit_lens.LENS_MODE)
+
+    Returns:
+        The output directory
+    """
+    lens = lens or logit_lens.LENS_MODE
+    if lens not in logit_lens.LENS_MODES:
+        raise ValueError(f"Unknown lens mode '{lens}'; expected one of {logit_lens.LENS_MODES}")
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    print("=" * 70)
+    print("LOGIT LENS SWEEP")
+    print("=" * 70)
+
+    probes = read_probes(input_path)
+    n_shards = (len(probes) + shard_size - 1) // shard_size
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {
+        "input": os.path.abspath(input_path),
+        "input_sha256": probes_hash(probes),
+        "rows": len(probes),
+        "shard_size": shard_size,
+        "model": list(logit_lens.model_key()),  # Name, source (local directory or Hub), revision, dtype
+        "lens": lens,
+        "layers": layers
+    }
+    if lens == "tuned":
+        manifest["tuned_lens"] = os.path.abspath(logit_lens.TUNED_LENS_PATH)
+        manifest["tuned_lens_sha256"] = file_hash(logit_lens.TUNED_LENS_PATH)
+    _write_manifest(output_dir, manifest)
+
+    # Resume: shards already on disk are complete (they are written atomically)
+    pending = [i for i in range(n_shards) if not os.path.exists(_shard_path(output_dir, i))]
+    print(f"\nInput: {input_path} ({len(probes)} prompts, {n_shards} shards)")
+    print(f"Workers: {workers} x {threads_per_worker} threads, {lens} lens")
+    if len(pending) < n_shards:
+        print(f"Resuming: {n_shards - len(pending)} shards already done")
+
+    if pending:
+        start = time.perf_counter()
+        done_rows = 0
+        context = multiprocessing.get_context("spawn")  # fork is unsafe once torch has started threads
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(
+                threads_per_worker, logit_lens.MODEL_NAME, logit_lens.MODEL_DTYPE, logit_lens.LOCAL_MODEL_DIR,
+                lens, logit_lens.TUNED_LENS_PATH
+            )
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _run_shard, i, i * shard_size, probes[i * shard_size:(i + 1) * shard_size],
+                    output_dir, batch_size, layers
+                )
+                for i in pending
+            ]
+            for future in as_completed(futures):
+                shard_idx, n_rows, seconds = future.result()
+                done_rows += n_rows
+                elapsed = time.perf_counter() - start
+                print(
+                    f"  ✓ Shard {shard_idx:>5}: {n_rows} prompts in {seconds:.1f}s "
+                    f"({done_rows / elapsed:.1f} prompts/s overall)"
+                )
+
+    print(f"\n✓ Sweep complete: results in '{output_dir}'")
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process logit lens sweep over a prompt file")
+    parser.add_argument("input", help="JSONL or CSV file with prompts and targets")
+    parser.add_argument("--output", default="sweep_results", help="Output directory for shard chunks")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--layers", type=int, nargs="+", default=None, help="Layer indices to probe")
+    parser.add_argument("--dtype", default=logit_lens.MODEL_DTYPE, choices=["float32", "bfloat16", "int8"])
+    parser.add_argument("--local-model-dir", default=logit_lens.LOCAL_MODEL_DIR)
+    parser.add_argument("--lens", default=logit_lens.LENS_MODE, choices=logit_lens.LENS_MODES)
+    args = parser.parse_args()
+
+    logit_lens.MODEL_DTYPE = args.dtype
+    logit_lens.LOCAL_MODEL_DIR = args.local_model_dir
+
+    run_sweep(
+        args.input, args.output,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        shard_size=args.shard_size,
+        batch_size=args.batch_size,
+        layers=args.layers,
+        lens=args.lens
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Monte-Carlo Evaluation - Vectorised statistics for pause_token.py
+Five riddles scored once each cannot tell 40% from 45%: a single run moves
+in steps of 20 points. This module measures how much a result can be
+trusted, and how many riddles a real experiment needs, before any API call.
+
+- `simulate_outcomes` draws every trial at once as a
+  (strategies x riddles x trials) Bernoulli array from a seeded NumPy
+  `Generator`; each trial is one simulated run of the whole benchmark
+- `bootstrap_ci` gives percentile confidence intervals for each strategy's
+  accuracy and for every paired difference. Items are resampled jointly
+  across strategies, as one multinomial draw over the 2^strategies
+  right/wrong patterns, so the cost does not grow with the number of items
+- `paired_test` is McNemar's test (exact below EXACT_TEST_MAX_DISCORDANT
+  discordant riddles, normal approximation above), vectorised over trials
+- `detection_power` and `riddles_needed` size an experiment for a target power
+
+A million simulated runs of the three strategies take a fraction of a second.
+"""
+
+import math
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CONFIDENCE = 0.95  # Confidence level of bootstrap intervals
+BOOTSTRAP_RESAMPLES = 10000
+SIGNIFICANCE = 0.05  # Two-sided significance level of paired tests
+EXACT_TEST_MAX_DISCORDANT = 64  # Exact binomial McNemar test up to this many discordant pairs
+
+Seed = Union[int, np.random.Generator, None]
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+def simulate_outcomes(accuracies: Sequence, n_riddles: int, n_trials: int, seed: Seed = None) -> np.ndarray:
+    """
+    Draws simulated correct/incorrect outcomes for every strategy, riddle and trial.
+
+    Args:
+        accuracies: Probability of a correct answer per strategy, or per
+            strategy and riddle (shape strategies x riddles)
+        n_riddles: Riddles per run
+        n_trials: Simulated runs
+        seed: Seed or Generator, for reproducible draws
+
+    Returns:
+        Boolean array of shape (strategies, riddles, trials)
+    """
+    rng = np.random.default_rng(seed)
+    p = np.asarray(accuracies, dtype=np.float32)
+    if p.ndim == 1:
+        p = p[:, None]
+    draws = rng.random((p.shape[0], n_riddles, n_trials), dtype=np.float32)
+    return draws < p[:, :, None]
+
+
+def trial_accuracies(outcomes: np.ndarray) -> np.ndarray:
+    """Accuracy of each strategy in each simulated run, shape (strategies, trials)."""
+    return outcomes.mean(axis=1)
+
+
+def accuracy_range(outcomes: np.ndarray, confidence: float = CONFIDENCE) -> np.ndarray:
+    """
+    Central range of the accuracy a single run reports.
+
+    Returns:
+        Array of shape (strategies, 2): the lower and upper quantiles of
+        per-run accuracy, covering `confidence` of the runs
+    """
+    tail = (1 - confidence) / 2
+    return np.quantile(trial_accuracies(outcomes), [tail, 1 - tail], axis=1).T
+
+
+# ============================================================================
+# BOOTSTRAP
+# ============================================================================
+
+def _pattern_bits(n_strategies: int) -> np.ndarray:
+    """Right/wrong bit of each strategy in each joint pattern, shape (2^strategies, strategies)."""
+    return (np.arange(2 ** n_strategies)[:, None] >> np.arange(n_strategies)) & 1
+
+
+def bootstrap_ci(outcomes: np.ndarray, confidence: float = CONFIDENCE,
+                 n_resamples: int = BOOTSTRAP_RESAMPLES, seed: Seed = None) -> Dict[str, np.ndarray]:
+    """
+    Paired percentile bootstrap of accuracies and their differences.
+
+    All axes after the first are pooled into one set of items. An item's
+    outcomes across strategies are resampled together, which is the same as
+    drawing the counts of each right/wrong pattern from a multinomial.
+
+    Args:
+        outcomes: Boolean array of shape (strategies, items...), e.g. one
+            run's (strategies, riddles) results
+        confidence: Confidence level of the intervals
+        n_resamples: Bootstrap resamples
+        seed: Seed or Generator, for reproducible resamples
+
+    Returns:
+        Dictionary with 'accuracy', 'low' and 'high' of shape (strategies,),
+        and 'difference', 'difference_low' and 'difference_high' of shape
+        (strategies, strategies) for row minus column
+    """
+    rng = np.random.default_rng(seed)
+    outcomes = np.asarray(outcomes, dtype=bool).reshape(len(outcomes), -1)
+    n_strategies, n_items = outcomes.shape
+    bits = _pattern_bits(n_strategies)
+    patterns = (outcomes.T.astype(np.int64) << np.arange(n_strategies)).sum(axis=1)
+    counts = np.bincount(patterns, minlength=len(bits))
+
+    resampled = rng.multinomial(n_items, counts / n_items, size=n_resamples) @ bits / n_items
+    differences = resampled[:, :, None] - resampled[:, None, :]
+    tail = (1 - confidence) / 2
+    accuracy = counts @ bits / n_items
+    low, high = np.quantile(resampled, [tail, 1 - tail], axis=0)
+    difference_low, difference_high = np.quantile(differences, [tail, 1 - tail], axis=0)
+    return {
+        "accuracy": accuracy,
+        "low": low,
+        "high": high,
+        "difference": accuracy[:, None] - accuracy[None, :],
+        "difference_low": difference_low,
+        "difference_high": difference_high
+    }
+
+
+# ============================================================================
+# PAIRED TESTS AND POWER
+# ============================================================================
+
+def _exact_cdf_table(max_n: int) -> np.ndarray:
+    """P(X <= k) for X ~ Binomial(n, 1/2), indexed [n, k], for n up to max_n."""
+    table = np.ones((max_n + 1, max_n + 1))
+    for n in range(max_n + 1):
+        # Each term is divided first: the integer sums overflow int64 for n >= 63
+        table[n, :n + 1] = np.cumsum([math.comb(n, k) / 2 ** n for k in range(n + 1)])
+    return table
+
+
+_EXACT_CDF = _exact_cdf_table(EXACT_TEST_MAX_DISCORDANT)
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def mcnemar_p_values(first_only: np.ndarray, second_only: np.ndarray) -> np.ndarray:
+    """
+    Two-sided McNemar p-values from discordant counts.
+
+    Args:
+        first_only: Items only the first strategy got right (any shape)
+        second_only: Items only the second strategy got right (same shape)
+
+    Returns:
+        p-values, same shape; 1 where there are no discordant items
+    """
+    first_only = np.asarray(first_only, dtype=np.int64)
+    second_only = np.asarray(second_only, dtype=np.int64)
+    n = first_only + second_only
+    exact = n <= EXACT_TEST_MAX_DISCORDANT
+    p = np.ones(n.shape)
+    p[exact] = np.minimum(1.0, 2 * _EXACT_CDF[n[exact], np.minimum(first_only, second_only)[exact]])
+    if not exact.all():
+        # Normal approximation with continuity correction
+        # (the corrected difference is clamped at 0, so equal counts give p = 1)
+        z = np.maximum(np.abs(first_only - second_only)[~exact] - 1, 0) / np.sqrt(n[~exact])
+        p[~exact] = _erfc(z / math.sqrt(2))
+    return p
+
+
+def paired_test(first: np.ndarray, second: np.ndarray, axis: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    McNemar's test of two strategies answering the same items.
+
+    Args:
+        first: Boolean outcomes of the first strategy
+        second: Boolean outcomes of the second strategy, same shape
+        axis: Axis of the items; the test is vectorised over all others
+            (e.g. over trials for simulated (riddles, trials) outcomes)
+
+    Returns:
+        tuple: (first's accuracy minus second's, two-sided p-value)
+    """
+    first_only = np.count_nonzero(first & ~second, axis=axis)
+    second_only = np.count_nonzero(~first & second, axis=axis)
+    difference = (first_only - second_only) / first.shape[axis]
+    return difference, mcnemar_p_values(first_only, second_only)
+
+
+def detection_power(first_accuracy: float, second_accuracy: float, n_riddles: int,
+                    n_trials: int = 20000, alpha: float = SIGNIFICANCE, seed: Seed = None) -> float:
+    """
+    Probability that an experiment shows the first strategy significantly ahead.
+
+    Strategies answer each riddle independently, so only the discordant
+    counts matter; they are drawn directly from a multinomial per trial,
+    which costs the same for 5 riddles or 5 million.
+
+    Args:
+        first_accuracy: True accuracy of the strategy expected to win
+        second_accuracy: True accuracy of the strategy it is compared with
+        n_riddles: Riddles in the experiment
+        n_trials: Simulated experiments
+        alpha: Two-sided significance level
+        seed: Seed or Generator, for reproducible draws
+
+    Returns:
+        Fraction of simulated experiments with p < alpha in the first's favour
+    """
+    rng = np.random.default_rng(seed)
+    first_only = first_accuracy * (1 - second_accuracy)
+    second_only = second_accuracy * (1 - first_accuracy)
+    counts = rng.multinomial(n_riddles, [first_only, second_only, 1 - first_only - second_only], size=n_trials)
+    p = mcnemar_p_values(counts[:, 0], counts[:, 1])
+    return float(np.mean((p < alpha) & (counts[:, 0] > counts[:, 1])))
+
+
+def riddles_needed(first_accuracy: float, second_accuracy: float, power: float = 0.8,
+                   alpha: float = SIGNIFICANCE, max_riddles: int = 10 ** 7,
+                   seed: Seed = 0) -> Optional[int]:
+    """
+    Smallest number of riddles that reaches a target power.
+
+    Doubles the experiment size until `detection_power` reaches `power`,
+    then bisects; every size is simulated with the same seed.
+
+    Returns:
+        Riddles needed, or None if more than max_riddles (e.g. equal accuracies)
+    """
+    if first_accuracy <= second_accuracy:
+        return None
+
+    def enough(n: int) -> bool:
+        return detection_power(first_accuracy, second_accuracy, n, alpha=alpha, seed=seed) >= power
+
+    high = 1
+    while not enough(high):
+        if high >= max_riddles:
+            return None
+        high = min(high * 2, max_riddles)
+    low = high // 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        if enough(middle):
+            high = middle
+        else:
+            low = middle
+    return high
@@ -12,26 +12,90 @@ The experiment tests whether structure (words) is needed for reasoning,
 or if just adding computation time (dots) is sufficient.
 """
 
+import os
+import sys
+import threading
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend for file saving
 import matplotlib.pyplot as plt
 import numpy as np
 import random
-from typing import List, Dict, Tuple
+import time
+from typing import List, Dict, Optional, Tuple
+
+# Shared model backends live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backends import (LOGIT_LENS_DIR, Backend, Completion, HuggingFaceBackend, MockBackend,
+                      OpenAICompatibleBackend, run_all)
+from grading import PARENTHETICAL_RE, grade
+from instrumentation import CallMetrics
+from monte_carlo import (CONFIDENCE, SIGNIFICANCE, accuracy_range, bootstrap_ci, paired_test,
+                         riddles_needed, simulate_outcomes, trial_accuracies)
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-MOCK_MODE = True  # Set to True to simulate results without API calls
+# Which model answers the riddles:
+# "mock"   - simulated answers at MOCK_ACCURACIES (no API calls)
+# "openai" - any OpenAI-compatible API at API_BASE
+# "local"  - a Hugging Face causal LM on CPU, loaded through project2's logit_lens
+BACKEND = "mock"
+API_KEY = "your-api-key-here"  # Only needed for the "openai" backend
+API_BASE = "https://api.openai.com/v1"
+MODEL_NAME = "gpt-3.5-turbo"
+LOCAL_MODEL_NAME = "gpt2"
+TEMPERATURE = 0.0
+MAX_NEW_TOKENS = 128
 
-# Mock mode accuracy settings (simulating the paper's skepticism)
+# Mock backend accuracy settings (simulating the paper's skepticism)
 MOCK_ACCURACIES = {
     "baseline": 0.40,      # 40% - Random guessing baseline
     "pause_dots": 0.45,    # 45% - Slight improvement from extra computation
     "explicit_cot": 0.90   # 90% - Dramatic improvement with structured reasoning
 }
 
+# Latency and cost instrumentation: every call is timed and priced per strategy
+PRICE_PER_MILLION_PROMPT_TOKENS = 0.50  # Dollars
+PRICE_PER_MILLION_COMPLETION_TOKENS = 1.50
+STREAM_RESPONSES = True  # "openai" backend: stream answers so time to first token is measured
+MOCK_TIME_TO_FIRST_TOKEN = 0.25  # Simulated seconds for the mock backend (nothing is slept)
+MOCK_SECONDS_PER_TOKEN = 0.02
+METRICS_PATH = None  # e.g. "project3_metrics.json"; Prometheus text goes next to it as .prom
+
+# Monte-Carlo check of how far the accuracies of one run can be trusted
+MONTE_CARLO_TRIALS = 1000000  # Simulated runs of all riddles at MOCK_ACCURACIES (0 to skip)
+MONTE_CARLO_SEED = 42
+TARGET_POWER = 0.8  # Power an experiment should have to detect a difference at SIGNIFICANCE
+
+# Pause-length sweep: how does accuracy scale with the number of pause tokens?
+RUN_PAUSE_SWEEP = False  # Run the sweep after the three strategies
+PAUSE_LENGTHS = list(range(0, 51))  # Pause tokens between the question and the answer
+PAUSE_TOKEN = " ."  # One GPT-2 token per pause; a bare "." would merge into multi-dot tokens
+
+# Pause-position logit lens: the correct answer's probability at every layer
+# and pause position of the local model (needs torch and transformers)
+RUN_PAUSE_LENS = False
+PAUSE_LENS_LENGTH = 10  # Pause tokens in the analysed prompts
+
+# Log-likelihood scoring: compare each riddle's correct and wrong answer under
+# every strategy's prompt with the local model, without generating any text
+RUN_LIKELIHOOD_SCORING = False
+SCORING_ANSWER_CUE = "\nAnswer:"  # Appended to each prompt before the candidate answers
+
+# Grid runner: every (strategy, riddle, seed) cell, spread over a worker pool.
+# Each cell is one model call on real backends, so the grid only runs by
+# default in mock mode, and real backends get at most GRID_MAX_REAL_SEEDS seeds
+RUN_GRID = BACKEND == "mock"
+GRID_SEEDS = 100  # Repeats of every (strategy, riddle) cell
+GRID_MAX_REAL_SEEDS = 5  # Cap on GRID_SEEDS for the "openai" and "local" backends
+GRID_SEED = 42  # Root of every cell's independent random stream
+GRID_EXECUTOR = None  # "process", "thread", or None to pick from the backend (grid_executor())
+GRID_WORKERS = os.cpu_count() or 1
+
 # ============================================================================
 # TEST DATA: 5 LOGIC RIDDLES
 # ============================================================================
@@ -110,11 +174,69 @@ def create_prompt_explicit_cot(question: str) -> str:
     return f"Think step by step: {question}"
 
 
+# Strategy registry: name -> prompt creator and chart style. main() and the grid
+# runner evaluate every registered strategy, in registration order.
+STRATEGIES: Dict[str, Dict] = {}
+
+
+def register_strategy(name: str, prompt_creator, label: Optional[str] = None, color: str = "#BDC3C7",
+                      mock_accuracy: Optional[float] = None):
+    """
+    Adds a prompting strategy to every evaluation.
+    
+    Args:
+        name: Strategy name used in results
+        prompt_creator: Function that turns a riddle question into a prompt
+        label: Chart label (default: the name)
+        color: Chart bar color
+        mock_accuracy: Accuracy of the strategy in mock mode (added to
+            MOCK_ACCURACIES; default: its current entry, else the baseline's)
+    """
+    STRATEGIES[name] = {"prompt": prompt_creator, "label": label or name, "color": color}
+    if mock_accuracy is not None:
+        MOCK_ACCURACIES[name] = mock_accuracy
+    elif name not in MOCK_ACCURACIES and "baseline" in MOCK_ACCURACIES:
+        MOCK_ACCURACIES[name] = MOCK_ACCURACIES["baseline"]
+
+
+register_strategy("baseline", create_prompt_baseline, "Strategy A:\nBaseline", "#FF6B6B")  # Red
+register_strategy("pause_dots", create_prompt_pause_dots, "Strategy B:\nPause/Dots", "#4ECDC4")  # Teal
+register_strategy("explicit_cot", create_prompt_explicit_cot, "Strategy C:\nExplicit CoT", "#95E1D3")  # Light green
+
+
+def create_pause_prefix(question: str) -> str:
+    """
+    Pause sweep: the part of the prompt shared by every pause length.
+    
+    Args:
+        question: The riddle question
+        
+    Returns:
+        The prompt prefix, ending on a newline so it usually tokenizes on
+        its own
+    """
+    return f"Answer this: {question}\n"
+
+
+def create_pause_suffix(pause_length: int) -> str:
+    """
+    Pause sweep: the pause tokens and answer cue that follow the question.
+    
+    Args:
+        pause_length: Number of PAUSE_TOKENs
+        
+    Returns:
+        The prompt suffix
+    """
+    return PAUSE_TOKEN * pause_length + "\nAnswer:"
+
+
 # ============================================================================
 # MOCK INFERENCE FUNCTIONS
 # ============================================================================
 
-def mock_inference(prompt: str, strategy: str, correct_answer: str, wrong_answer: str) -> Tuple[str, bool]:
+def mock_inference(prompt: str, strategy: str, correct_answer: str, wrong_answer: str,
+                   rng=None, accuracy: Optional[float] = None) -> Tuple[str, bool]:
     """
     Simulates API call with predetermined accuracy rates.
     
@@ -128,15 +250,18 @@ def mock_inference(prompt: str, strategy: str, correct_answer: str, wrong_answer
         strategy: The strategy name ("baseline", "pause_dots", "explicit_cot")
         correct_answer: The correct answer to the riddle
         wrong_answer: A common incorrect answer
+        rng: Random stream with a `random()` method (default: the `random` module)
+        accuracy: Accuracy to simulate (default: MOCK_ACCURACIES[strategy])
         
     Returns:
         tuple: (response_text, is_correct)
     """
     # Get accuracy threshold for this strategy
-    accuracy = MOCK_ACCURACIES[strategy]
+    if accuracy is None:
+        accuracy = MOCK_ACCURACIES[strategy]
     
     # Randomly decide if this attempt is correct based on accuracy rate
-    is_correct = random.random() < accuracy
+    is_correct = (rng or random).random() < accuracy
     
     # Generate mock response based on strategy
     if strategy == "baseline":
@@ -156,20 +281,109 @@ def mock_inference(prompt: str, strategy: str, correct_answer: str, wrong_answer
         else:
             response = f"Let me think:\n1. Looking at the question...\n2. It seems like...\n3. So the answer is: {wrong_answer}"
     
+    else:
+        # Registered strategies without a mock format: just the answer
+        response = correct_answer if is_correct else wrong_answer
+    
     return response, is_correct
 
 
+def mock_pause_accuracy(pause_length: int) -> float:
+    """
+    Simulated accuracy after a pause: rises linearly from the baseline's to
+    pause_dots' over the first 10 pause tokens (the dots prompt's length),
+    then stays flat.
+    """
+    gain = MOCK_ACCURACIES["pause_dots"] - MOCK_ACCURACIES["baseline"]
+    return MOCK_ACCURACIES["baseline"] + gain * min(pause_length, 10) / 10
+
+
+def mock_completion(prompt: str) -> Completion:
+    """
+    Answers a riddle prompt with `mock_inference`.
+    
+    Args:
+        prompt: A prompt built by one of the strategy prompt creators, or a
+            pause sweep prompt
+        
+    Returns:
+        The simulated completion, with its correctness in metadata
+    """
+    for strategy, spec in STRATEGIES.items():
+        for riddle in RIDDLES:
+            if prompt == spec["prompt"](riddle["question"]):
+                response, is_correct = mock_inference(prompt, strategy, riddle["correct"], riddle["wrong"])
+                return Completion(response, completion_tokens=len(response.split()),
+                                  metadata={"correct": is_correct})
+    for riddle in RIDDLES:
+        prefix = create_pause_prefix(riddle["question"])
+        if prompt.startswith(prefix):
+            pause_length = prompt[len(prefix):].count(PAUSE_TOKEN)
+            is_correct = random.random() < mock_pause_accuracy(pause_length)
+            response = riddle["correct"] if is_correct else riddle["wrong"]
+            return Completion(response, prompt_tokens=len(prompt.split()), completion_tokens=len(response.split()),
+                              metadata={"correct": is_correct})
+    raise KeyError(f"No mock answer for prompt: {prompt[:60]}")
+
+
+def create_backend(name: Optional[str] = None) -> Backend:
+    """
+    Builds the backend selected by BACKEND.
+    
+    Args:
+        name: "mock", "openai" or "local" (default: BACKEND)
+        
+    Returns:
+        The backend instance
+    """
+    name = name or BACKEND
+    if name == "mock":
+        return MockBackend(mock_completion, time_to_first_token=MOCK_TIME_TO_FIRST_TOKEN,
+                           seconds_per_token=MOCK_SECONDS_PER_TOKEN)
+    if name == "openai":
+        return OpenAICompatibleBackend(api_base=API_BASE, api_key=API_KEY, model_name=MODEL_NAME,
+                                       temperature=TEMPERATURE, max_tokens=MAX_NEW_TOKENS,
+                                       stream=STREAM_RESPONSES)
+    if name == "local":
+        return HuggingFaceBackend(model_name=LOCAL_MODEL_NAME, max_new_tokens=MAX_NEW_TOKENS,
+                                  temperature=TEMPERATURE)
+    raise ValueError(f"Unknown backend {name!r}; expected 'mock', 'openai' or 'local'")
+
+
 # ============================================================================
 # EVALUATION FUNCTION
 # ============================================================================
 
-def evaluate_strategy(strategy_name: str, prompt_creator) -> Dict:
+def check_answer(response: str, correct_answer: str) -> bool:
+    """
+    Checks if a response's final answer is the correct answer.
+    
+    Any parenthesised explanation is ignored, and numbers are compared after
+    normalisation (see grading.py), so "12" matches "twelve" for
+    "12 (all months have at least 28 days)" but "1.5 hours" does not match "1 hour".
+    
+    Args:
+        response: The model's response
+        correct_answer: The correct answer to the riddle
+        
+    Returns:
+        True if correct, False otherwise
+    """
+    return grade(response, correct_answer)
+
+
+def evaluate_strategy(strategy_name: str, prompt_creator=None, backend: Optional[Backend] = None,
+                      metrics: Optional[CallMetrics] = None) -> Dict:
     """
     Evaluates a single strategy on all riddles.
     
+    All riddles are sent to the backend in one batch.
+    
     Args:
         strategy_name: Name of the strategy ("baseline", "pause_dots", "explicit_cot")
-        prompt_creator: Function that creates prompts for this strategy
+        prompt_creator: Function that creates prompts for this strategy (default: the registered one)
+        backend: Backend that answers the prompts (default: a new one from BACKEND)
+        metrics: Records each call's latency, tokens and cost under the strategy name
         
     Returns:
         Dictionary containing results and accuracy
@@ -178,27 +392,32 @@ def evaluate_strategy(strategy_name: str, prompt_creator) -> Dict:
     print(f"Testing Strategy: {strategy_name.upper()}")
     print(f"{'='*70}")
     
+    backend = backend or create_backend()
+    prompt_creator = prompt_creator or STRATEGIES[strategy_name]["prompt"]
+    prompts = [prompt_creator(riddle["question"]) for riddle in RIDDLES]
+    completions = run_all(backend, prompts)
+    if metrics is not None:
+        for completion in completions:
+            metrics.record(strategy_name, completion)
+    
     results = []
     correct_count = 0
     
-    for i, riddle in enumerate(RIDDLES, 1):
+    for i, (riddle, prompt, completion) in enumerate(zip(RIDDLES, prompts, completions), 1):
         question = riddle["question"]
-        correct_answer = riddle["correct"]
-        wrong_answer = riddle["wrong"]
-        
-        # Create prompt for this strategy
-        prompt = prompt_creator(question)
         
         print(f"\nRiddle {i}: {question}")
         print(f"Prompt: {prompt[:100]}...")
         
-        # Get mock response
-        response, is_correct = mock_inference(
-            prompt, 
-            strategy_name, 
-            correct_answer, 
-            wrong_answer
-        )
+        response = completion.text
+        if completion.error is not None:
+            print(f"Error calling the model: {completion.error}")
+            is_correct = False
+        else:
+            # The mock backend's answers come pre-judged
+            is_correct = completion.metadata.get("correct")
+            if is_correct is None:
+                is_correct = check_answer(response, riddle["correct"])
         
         if is_correct:
             correct_count += 1
@@ -225,13 +444,490 @@ def evaluate_strategy(strategy_name: str, prompt_creator) -> Dict:
     }
 
 
+# ============================================================================
+# PAUSE-LENGTH SWEEP
+# ============================================================================
+
+def sweep_pause_lengths(backend: Backend, pause_lengths: List[int] = PAUSE_LENGTHS) -> Dict:
+    """
+    Evaluates every riddle at every pause length.
+    
+    Backends with `generate_shared_prefix` (the local model) encode each
+    riddle's question once and reuse its KV cache for all pause lengths,
+    prefilling only the pause suffixes; other backends get full prompts.
+    A suffix that tokenizes differently inside the full prompt (e.g. "\n"
+    merging with "\nAnswer:" at pause length 0) is run as the full prompt,
+    so every pause length sees the tokens the full prompt would.
+    
+    Args:
+        backend: Backend that answers the prompts
+        pause_lengths: Pause token counts to evaluate
+        
+    Returns:
+        Dictionary with 'rows' (per pause length: 'pause_length',
+        'accuracy', 'correct', 'prompt_tokens' and 'completion_tokens' as
+        means per riddle), 'prompt_tokens' (tokens of all full prompts) and
+        'prefilled_tokens' (tokens actually encoded, None if not tracked)
+    """
+    suffixes = [create_pause_suffix(n) for n in pause_lengths]
+    shared_prefix = hasattr(backend, "generate_shared_prefix")
+    prefilled_before = getattr(backend, "prefilled_tokens", None)
+    
+    if shared_prefix:
+        per_riddle = [backend.generate_shared_prefix(create_pause_prefix(riddle["question"]), suffixes)
+                      for riddle in RIDDLES]
+    else:
+        prompts = [create_pause_prefix(riddle["question"]) + suffix for riddle in RIDDLES for suffix in suffixes]
+        completions = run_all(backend, prompts)
+        per_riddle = [completions[i:i + len(suffixes)] for i in range(0, len(completions), len(suffixes))]
+    
+    rows = []
+    for column, pause_length in enumerate(pause_lengths):
+        completions = [riddle_completions[column] for riddle_completions in per_riddle]
+        correct = 0
+        for riddle, completion in zip(RIDDLES, completions):
+            if completion.error is not None:
+                continue
+            is_correct = completion.metadata.get("correct")
+            if is_correct is None:
+                is_correct = check_answer(completion.text, riddle["correct"])
+            correct += bool(is_correct)
+        rows.append({
+            "pause_length": pause_length,
+            "accuracy": correct / len(RIDDLES),
+            "correct": correct,
+            "prompt_tokens": np.mean([c.prompt_tokens for c in completions]),
+            "completion_tokens": np.mean([c.completion_tokens for c in completions])
+        })
+    
+    return {
+        "rows": rows,
+        "prompt_tokens": sum(c.prompt_tokens for completions in per_riddle for c in completions),
+        "prefilled_tokens": backend.prefilled_tokens - prefilled_before if shared_prefix else None
+    }
+
+
+def print_sweep_table(sweep: Dict):
+    """
+    Prints the pause length x accuracy x token cost table of a sweep.
+    
+    Args:
+        sweep: Result of sweep_pause_lengths()
+    """
+    print(f"\n{'='*70}")
+    print("PAUSE-LENGTH SWEEP")
+    print(f"{'='*70}")
+    print(f"\n  {'Pauses':>6s}  {'Accuracy':>8s}  {'Prompt tok':>10s}  {'Answer tok':>10s}  {'Total tok':>9s}")
+    for row in sweep["rows"]:
+        print(f"  {row['pause_length']:6d}  {row['accuracy']:8.0%}  {row['prompt_tokens']:10.1f}  "
+              f"{row['completion_tokens']:10.1f}  {row['prompt_tokens'] + row['completion_tokens']:9.1f}")
+    if sweep["prefilled_tokens"] is not None:
+        saved = 1 - sweep["prefilled_tokens"] / sweep["prompt_tokens"]
+        print(f"\n  Prefix reuse encoded {sweep['prefilled_tokens']:,} of {sweep['prompt_tokens']:,} prompt tokens ({saved:.0%} saved)")
+
+
+# ============================================================================
+# PAUSE-POSITION LOGIT LENS
+# ============================================================================
+
+def _import_logit_lens():
+    """Imports project2's logit_lens, whose model registry loads local models."""
+    if LOGIT_LENS_DIR not in sys.path:
+        sys.path.insert(0, LOGIT_LENS_DIR)
+    import logit_lens
+    return logit_lens
+
+
+def pause_position_lens(pause_length: int = PAUSE_LENS_LENGTH) -> Dict:
+    """
+    Reads the correct answer's probability at every layer and pause position.
+    
+    Each riddle's pause prompt (`create_pause_prefix` + `create_pause_suffix`)
+    goes through LOCAL_MODEL_NAME once, all riddles in one batch. Hidden
+    states are kept at every pause token and at the answer position (the
+    last prompt token), and all (layer, position) pairs are projected with
+    the logit lens together (`logit_lens.extract_position_probabilities`).
+    The target is the first word of each riddle's correct answer.
+    
+    Args:
+        pause_length: Pause tokens in each prompt
+        
+    Returns:
+        Dictionary with 'probabilities' (riddles x layers x positions, as
+        percentages), 'positions' (labels) and 'targets'
+    """
+    logit_lens = _import_logit_lens()
+    model, tokenizer = logit_lens.get_model(LOCAL_MODEL_NAME)
+    
+    prompts, positions, targets = [], [], []
+    for riddle in RIDDLES:
+        prefix = create_pause_prefix(riddle["question"])
+        prompt = prefix + create_pause_suffix(pause_length)
+        prefix_ids = tokenizer.encode(prefix)
+        ids = tokenizer.encode(prompt)
+        pauses = list(range(len(prefix_ids), len(prefix_ids) + pause_length))
+        if ids[:len(prefix_ids)] != prefix_ids or tokenizer.decode([ids[i] for i in pauses]) != PAUSE_TOKEN * pause_length:
+            raise ValueError(f"PAUSE_TOKEN {PAUSE_TOKEN!r} does not tokenize as one token per pause")
+        prompts.append(prompt)
+        positions.append(pauses + [len(ids) - 1])
+        targets.append(riddle["correct"].split()[0])
+    
+    probabilities = logit_lens.extract_position_probabilities(model, tokenizer, prompts, positions, targets)
+    return {
+        "probabilities": probabilities,
+        "positions": [f"P{i}" for i in range(1, pause_length + 1)] + ["Answer"],
+        "targets": targets
+    }
+
+
+def create_pause_lens_heatmap(lens: Dict, output_path: str = "project3_pause_lens.png") -> str:
+    """
+    Plots the layer x pause-position heatmap of the correct answer's
+    probability, averaged over riddles, and prints where it peaks.
+    
+    Args:
+        lens: Result of pause_position_lens()
+        output_path: Path to save the visualization
+    """
+    mean = lens["probabilities"].mean(axis=0)  # (layers, positions)
+    layer, position = np.unravel_index(np.argmax(mean), mean.shape)
+    print(f"\n{'='*70}")
+    print("PAUSE-POSITION LOGIT LENS")
+    print(f"{'='*70}")
+    print(f"\nTargets: {', '.join(lens['targets'])}")
+    print(f"Final layer: {mean[-1, 0]:.2f}% at the first pause, {mean[-1, -1]:.2f}% at the answer position")
+    print(f"Peak: {mean[layer, position]:.2f}% at layer {layer}, position {lens['positions'][position]}")
+    
+    fig, ax = plt.subplots(figsize=(12, 6))
+    image = ax.imshow(mean, aspect='auto', origin='lower', cmap='viridis')
+    fig.colorbar(image, ax=ax, label='P(correct answer) %')
+    ax.set_xticks(np.arange(len(lens["positions"])))
+    ax.set_xticklabels(lens["positions"])
+    ax.set_xlabel('Position (pause tokens, then answer)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Layer', fontsize=12, fontweight='bold')
+    ax.set_title('Does the Answer Form During the Pause? (Logit Lens, Mean over Riddles)',
+                 fontsize=14, fontweight='bold', pad=20)
+    
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    print(f"\n✓ Visualization saved to: {output_path}")
+    return output_path
+
+
+# ============================================================================
+# LOG-LIKELIHOOD SCORING
+# ============================================================================
+
+def score_answer_likelihoods(strategies: Optional[List[str]] = None) -> Dict:
+    """
+    Scores every riddle's correct and wrong answer by log-likelihood.
+    
+    For each (strategy, riddle), the strategy's prompt plus
+    SCORING_ANSWER_CUE is encoded once by LOCAL_MODEL_NAME and both
+    candidate answers are teacher-forced together on top of its KV cache
+    (`logit_lens.score_continuations`). Parenthesised explanations are
+    dropped from the answers. No text is generated or sampled, so the
+    result is deterministic: a riddle counts as correct when the correct
+    answer is more likely than the wrong one, and the margin says by how much.
+    
+    Args:
+        strategies: Registered strategy names (default: all)
+        
+    Returns:
+        Dictionary with 'strategies', 'log_likelihood' (strategies x
+        riddles x [correct, wrong], natural log), 'margin' (correct minus
+        wrong), 'accuracy' and 'mean_margin' (per strategy)
+    """
+    strategies = list(strategies or STRATEGIES)
+    logit_lens = _import_logit_lens()
+    model, tokenizer = logit_lens.get_model(LOCAL_MODEL_NAME)
+    last_layer = [model.config.n_layer - 1]
+    
+    log_likelihood = np.zeros((len(strategies), len(RIDDLES), 2))
+    for i, strategy in enumerate(strategies):
+        for j, riddle in enumerate(RIDDLES):
+            prompt = STRATEGIES[strategy]["prompt"](riddle["question"]) + SCORING_ANSWER_CUE
+            candidates = [PARENTHETICAL_RE.sub("", riddle[key]).strip() for key in ("correct", "wrong")]
+            log_likelihood[i, j] = logit_lens.score_continuations(model, tokenizer, prompt, candidates,
+                                                                  layers=last_layer)[:, 0]
+    
+    margin = log_likelihood[:, :, 0] - log_likelihood[:, :, 1]
+    return {
+        "strategies": strategies,
+        "log_likelihood": log_likelihood,
+        "margin": margin,
+        "accuracy": (margin > 0).mean(axis=1),
+        "mean_margin": margin.mean(axis=1)
+    }
+
+
+def print_likelihood_table(scores: Dict):
+    """
+    Prints per-strategy accuracy and log-likelihood margins of a scoring run.
+    
+    Args:
+        scores: Result of score_answer_likelihoods()
+    """
+    print(f"\n{'='*70}")
+    print(f"LOG-LIKELIHOOD SCORING ({LOCAL_MODEL_NAME}, no generation)")
+    print(f"{'='*70}")
+    print("\nMargin = log P(correct answer) - log P(wrong answer), in nats")
+    for i, strategy in enumerate(scores["strategies"]):
+        margins = " ".join(f"{m:+.2f}" for m in scores["margin"][i])
+        print(f"  {strategy:15s}: accuracy {scores['accuracy'][i]:.0%}, mean margin {scores['mean_margin'][i]:+.2f}  "
+              f"per riddle: {margins}")
+
+
+# ============================================================================
+# GRID RUNNER
+# ============================================================================
+
+GRID_COLUMNS = ("strategy", "riddle", "seed", "correct", "prompt_tokens", "completion_tokens", "latency")
+
+# Per-worker state: each worker process or thread builds its backend once
+_WORKER = threading.local()
+
+
+def cell_rng(strategy: str, riddle: int, seed: int) -> np.random.Generator:
+    """
+    The independent random stream of one grid cell.
+    
+    Seeded from GRID_SEED and the cell's own coordinates (the strategy by a
+    stable hash of its name), so a cell draws the same numbers whichever
+    worker runs it and in whatever order.
+    """
+    return np.random.default_rng([GRID_SEED, zlib.crc32(strategy.encode()), riddle, seed])
+
+
+def grid_executor(backend_name: Optional[str] = None) -> str:
+    """
+    Pool type for a backend: threads for API calls, which wait on the
+    network, and processes for the CPU-bound mock and local model.
+    """
+    return "thread" if (backend_name or BACKEND) == "openai" else "process"
+
+
+def grid_seeds(backend_name: Optional[str] = None, n_seeds: int = GRID_SEEDS) -> int:
+    """Seeds per (strategy, riddle) cell: n_seeds, capped at GRID_MAX_REAL_SEEDS on real backends."""
+    return n_seeds if (backend_name or BACKEND) == "mock" else min(n_seeds, GRID_MAX_REAL_SEEDS)
+
+
+def _init_worker(backend_name: str, threads: Optional[int]):
+    """
+    Pool initializer: builds the worker's backend (none for mock) and, for
+    the local model in a process pool, pins torch intra-op threads.
+    """
+    if backend_name == "local" and threads is not None:
+        import torch
+        torch.set_num_threads(threads)
+    _WORKER.backend = None if backend_name == "mock" else create_backend(backend_name)
+
+
+def _run_cells(cells: List[Dict]) -> Dict[str, list]:
+    """
+    Runs a chunk of grid cells in a worker.
+    
+    Mock cells draw from their own stream (`cell_rng`); on other backends
+    the chunk's prompts go to the worker's backend as one batch.
+    
+    Returns:
+        One list per GRID_COLUMNS entry, in cell order
+    """
+    if _WORKER.backend is None:
+        completions = []
+        for cell in cells:
+            response, is_correct = mock_inference(
+                cell["prompt"], cell["strategy"], cell["correct_answer"], cell["wrong_answer"],
+                rng=cell_rng(cell["strategy"], cell["riddle"], cell["seed"]), accuracy=cell["mock_accuracy"]
+            )
+            completions.append(Completion(response, completion_tokens=len(response.split()),
+                                          metadata={"correct": is_correct}))
+    else:
+        completions = run_all(_WORKER.backend, [cell["prompt"] for cell in cells])
+    
+    columns = {name: [] for name in GRID_COLUMNS}
+    for cell, completion in zip(cells, completions):
+        is_correct = completion.metadata.get("correct")
+        if is_correct is None:
+            is_correct = completion.error is None and check_answer(completion.text, cell["correct_answer"])
+        columns["strategy"].append(cell["strategy"])
+        columns["riddle"].append(cell["riddle"])
+        columns["seed"].append(cell["seed"])
+        columns["correct"].append(bool(is_correct))
+        columns["prompt_tokens"].append(completion.prompt_tokens)
+        columns["completion_tokens"].append(completion.completion_tokens)
+        columns["latency"].append(completion.latency)
+    return columns
+
+
+def run_grid(strategies: Optional[List[str]] = None, n_seeds: int = GRID_SEEDS,
+             backend_name: Optional[str] = None, executor: Optional[str] = GRID_EXECUTOR,
+             workers: int = GRID_WORKERS) -> Dict[str, np.ndarray]:
+    """
+    Evaluates every (strategy, riddle, seed) cell on a pool of workers.
+    
+    Prompts are built here, from the strategy registry, so strategies
+    registered at runtime work in spawned processes too. Cells are sent in
+    chunks (a few per worker); each cell's randomness comes from its own
+    stream, so the table is the same for any number of workers.
+    
+    Args:
+        strategies: Registered strategy names (default: all)
+        n_seeds: Repeats of every (strategy, riddle) cell, used as given
+            (main() caps it with grid_seeds())
+        backend_name: "mock", "openai" or "local" (default: BACKEND)
+        executor: "process" or "thread" (default: grid_executor(backend_name))
+        workers: Pool size
+        
+    Returns:
+        Columnar table: one NumPy array per GRID_COLUMNS entry, one row per
+        cell, ordered by strategy, riddle and seed
+    """
+    strategies = list(strategies or STRATEGIES)
+    backend_name = backend_name or BACKEND
+    executor = executor or grid_executor(backend_name)
+    cells = [
+        {
+            "strategy": strategy,
+            "riddle": riddle_idx,
+            "seed": seed,
+            "prompt": STRATEGIES[strategy]["prompt"](riddle["question"]),
+            "correct_answer": riddle["correct"],
+            "wrong_answer": riddle["wrong"],
+            "mock_accuracy": MOCK_ACCURACIES.get(strategy)
+        }
+        for strategy in strategies
+        for riddle_idx, riddle in enumerate(RIDDLES)
+        for seed in range(n_seeds)
+    ]
+    chunk_size = max(1, -(-len(cells) // (workers * 4)))
+    chunks = [cells[i:i + chunk_size] for i in range(0, len(cells), chunk_size)]
+    
+    if executor == "process":
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),  # fork is unsafe once torch has started threads
+            initializer=_init_worker,
+            initargs=(backend_name, threads)
+        )
+    elif executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend_name, None))
+    else:
+        raise ValueError(f"Unknown executor {executor!r}; expected 'process' or 'thread'")
+    
+    with pool:
+        parts = list(pool.map(_run_cells, chunks))  # map keeps chunk order
+    return {name: np.concatenate([np.asarray(part[name]) for part in parts]) for name in GRID_COLUMNS}
+
+
+def print_grid_summary(table: Dict[str, np.ndarray], seconds: float, executor: Optional[str] = GRID_EXECUTOR,
+                       workers: int = GRID_WORKERS):
+    """
+    Prints per-strategy and per-riddle accuracy of a grid run, with
+    bootstrap confidence intervals over its cells.
+    
+    Args:
+        table: Result of run_grid()
+        seconds: Wall-clock time of the run
+        executor: Pool type the grid ran on (default: grid_executor())
+        workers: Pool size the grid ran on
+    """
+    executor = executor or grid_executor()
+    strategies = list(dict.fromkeys(table["strategy"].tolist()))
+    n_riddles = len(np.unique(table["riddle"]))
+    outcomes = table["correct"].reshape(len(strategies), -1)
+    stats = bootstrap_ci(outcomes, seed=GRID_SEED)
+    
+    print(f"\nGrid ({len(strategies)} strategies x {n_riddles} riddles x {len(np.unique(table['seed']))} seeds = "
+          f"{len(table['correct']):,} cells, {executor} pool of {workers}, {seconds:.1f}s):")
+    for i, strategy in enumerate(strategies):
+        per_riddle = outcomes[i].reshape(n_riddles, -1).mean(axis=1)
+        print(f"  {strategy:15s}: {stats['accuracy'][i]:.1%} [{stats['low'][i]:.1%}, {stats['high'][i]:.1%}]  "
+              f"per riddle: {' '.join(f'{a:.0%}' for a in per_riddle)}")
+
+
+# ============================================================================
+# STATISTICS
+# ============================================================================
+
+def report_statistics(all_results: List[Dict], baseline: str = "baseline"):
+    """
+    Prints bootstrap confidence intervals and paired tests for one run.
+    
+    Every strategy answered the same riddles, so differences are tested
+    pairwise against the baseline (McNemar's test).
+    
+    Args:
+        all_results: List of result dictionaries from each strategy
+        baseline: Strategy the others are compared with
+    """
+    strategies = [result["strategy"] for result in all_results]
+    outcomes = np.array([[r["is_correct"] for r in result["results"]] for result in all_results], dtype=bool)
+    stats = bootstrap_ci(outcomes, seed=MONTE_CARLO_SEED)
+    base = strategies.index(baseline)
+    
+    print(f"\nThis Run ({CONFIDENCE:.0%} bootstrap intervals over {outcomes.shape[1]} riddles):")
+    for i, strategy in enumerate(strategies):
+        print(f"  {strategy:15s}: {stats['accuracy'][i]:.1%} [{stats['low'][i]:.1%}, {stats['high'][i]:.1%}]")
+    for i, strategy in enumerate(strategies):
+        if i != base:
+            _, p_value = paired_test(outcomes[i], outcomes[base])
+            print(f"  {strategy} - {baseline}: {stats['difference'][i, base]:+.1%} "
+                  f"[{stats['difference_low'][i, base]:+.1%}, {stats['difference_high'][i, base]:+.1%}], "
+                  f"McNemar p = {float(p_value):.3f}")
+
+
+def simulate_experiment(n_trials: int = MONTE_CARLO_TRIALS, baseline: str = "baseline") -> Dict:
+    """
+    Simulates many runs of the riddle benchmark at MOCK_ACCURACIES.
+    
+    Shows how much a single run's accuracies move by chance, how often a run
+    gets the order of each strategy and the baseline right or finds the
+    difference significant, and how many riddles would reach TARGET_POWER.
+    
+    Args:
+        n_trials: Simulated runs of all riddles
+        baseline: Strategy the others are compared with
+        
+    Returns:
+        Dictionary with 'strategies', 'mean' and 'range' (per strategy),
+        'ahead', 'significant' and 'riddles_needed' (per compared strategy)
+        and 'seconds'
+    """
+    strategies = list(MOCK_ACCURACIES)
+    base = strategies.index(baseline)
+    
+    start = time.perf_counter()
+    outcomes = simulate_outcomes([MOCK_ACCURACIES[s] for s in strategies], len(RIDDLES), n_trials, MONTE_CARLO_SEED)
+    report = {
+        "strategies": strategies,
+        "mean": trial_accuracies(outcomes).mean(axis=1),
+        "range": accuracy_range(outcomes),
+        "ahead": {},
+        "significant": {},
+        "riddles_needed": {}
+    }
+    for i, strategy in enumerate(strategies):
+        if i != base:
+            difference, p_values = paired_test(outcomes[i], outcomes[base])
+            report["ahead"][strategy] = float(np.mean(difference > 0))
+            report["significant"][strategy] = float(np.mean((p_values < SIGNIFICANCE) & (difference > 0)))
+            report["riddles_needed"][strategy] = riddles_needed(
+                MOCK_ACCURACIES[strategy], MOCK_ACCURACIES[baseline], TARGET_POWER, seed=MONTE_CARLO_SEED
+            )
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
 # ============================================================================
 # VISUALIZATION FUNCTION
 # ============================================================================
 
 def create_comparison_chart(all_results: List[Dict], output_path: str = "project3_pause_token.png"):
     """
-    Creates a grouped bar chart comparing the three strategies.
+    Creates a grouped bar chart comparing the strategies.
     
     Args:
         all_results: List of result dictionaries from each strategy
@@ -246,19 +942,12 @@ def create_comparison_chart(all_results: List[Dict], output_path: str = "project
     accuracies = []
     colors = []
     
-    # Define display names and colors for each strategy
-    strategy_display = {
-        "baseline": ("Strategy A:\nBaseline", "#FF6B6B"),  # Red
-        "pause_dots": ("Strategy B:\nPause/Dots", "#4ECDC4"),  # Teal
-        "explicit_cot": ("Strategy C:\nExplicit CoT", "#95E1D3")  # Light green
-    }
-    
+    # Display names and colors come from the strategy registry
     for result in all_results:
-        strategy = result["strategy"]
-        display_name, color = strategy_display[strategy]
-        strategy_names.append(display_name)
+        spec = STRATEGIES[result["strategy"]]
+        strategy_names.append(spec["label"])
         accuracies.append(result["accuracy"])
-        colors.append(color)
+        colors.append(spec["color"])
     
     # Create figure and axis
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -318,30 +1007,35 @@ def main():
     print("Testing: Does 'Stalling' with Dots Improve Performance?")
     print("="*70)
     
-    if MOCK_MODE:
+    backend = create_backend()
+    if BACKEND == "mock":
         print("\n⚠️  MOCK MODE ENABLED - Simulating results without API calls")
         print(f"Expected accuracies:")
-        print(f"  - Baseline: {MOCK_ACCURACIES['baseline']:.0%}")
-        print(f"  - Pause/Dots: {MOCK_ACCURACIES['pause_dots']:.0%}")
-        print(f"  - Explicit CoT: {MOCK_ACCURACIES['explicit_cot']:.0%}")
+        for strategy, spec in STRATEGIES.items():
+            if strategy in MOCK_ACCURACIES:
+                print(f"  - {spec['label'].splitlines()[-1]}: {MOCK_ACCURACIES[strategy]:.0%}")
+    else:
+        print(f"\nBackend: {backend.name} ({backend.model_name})")
     
     # Set random seed for reproducibility
     random.seed(42)
     
-    # Evaluate all three strategies
-    all_results = []
+    # Evaluate every registered strategy
+    metrics = CallMetrics(PRICE_PER_MILLION_PROMPT_TOKENS, PRICE_PER_MILLION_COMPLETION_TOKENS)
+    all_results = [evaluate_strategy(strategy, backend=backend, metrics=metrics) for strategy in STRATEGIES]
+    
+    if RUN_PAUSE_SWEEP:
+        print_sweep_table(sweep_pause_lengths(backend))
     
-    # Strategy A: Baseline
-    baseline_results = evaluate_strategy("baseline", create_prompt_baseline)
-    all_results.append(baseline_results)
+    if RUN_PAUSE_LENS:
+        create_pause_lens_heatmap(pause_position_lens())
     
-    # Strategy B: Pause/Dots
-    pause_results = evaluate_strategy("pause_dots", create_prompt_pause_dots)
-    all_results.append(pause_results)
+    if RUN_LIKELIHOOD_SCORING:
+        print_likelihood_table(score_answer_likelihoods())
     
-    # Strategy C: Explicit CoT
-    cot_results = evaluate_strategy("explicit_cot", create_prompt_explicit_cot)
-    all_results.append(cot_results)
+    if isinstance(backend, HuggingFaceBackend):
+        print(f"\nLocal generation: {backend.generated_tokens} tokens at {backend.tokens_per_second:.1f} tokens/s")
+    backend.close()
     
     # Create comparison visualization
     chart_path = create_comparison_chart(all_results)
@@ -358,6 +1052,36 @@ def main():
         total = result["total"]
         print(f"  {strategy:15s}: {correct}/{total} = {accuracy:.1%}")
     
+    report_statistics(all_results)
+    if MONTE_CARLO_TRIALS > 0:
+        simulation = simulate_experiment()
+        print(f"\nMonte-Carlo ({MONTE_CARLO_TRIALS:,} simulated runs of {len(RIDDLES)} riddles "
+              f"at MOCK_ACCURACIES, {simulation['seconds']:.2f}s):")
+        for strategy, mean, (low, high) in zip(simulation["strategies"], simulation["mean"], simulation["range"]):
+            print(f"  {strategy:15s}: mean {mean:.1%}, {CONFIDENCE:.0%} of runs between {low:.0%} and {high:.0%}")
+        for strategy, ahead in simulation["ahead"].items():
+            needed = simulation["riddles_needed"][strategy]
+            print(f"  {strategy} beats baseline in {ahead:.1%} of runs, significantly in "
+                  f"{simulation['significant'][strategy]:.1%}; {TARGET_POWER:.0%} power needs "
+                  f"{f'{needed:,} riddles' if needed else 'no feasible number of riddles'}")
+    
+    if RUN_GRID:
+        n_seeds = grid_seeds()
+        if BACKEND != "mock":
+            print(f"\nGrid: {len(STRATEGIES) * len(RIDDLES) * n_seeds} {BACKEND} calls "
+                  f"({n_seeds} seeds per cell, capped by GRID_MAX_REAL_SEEDS)")
+        start = time.perf_counter()
+        grid = run_grid(n_seeds=n_seeds)
+        print_grid_summary(grid, time.perf_counter() - start)
+    
+    print("\nLatency and Cost:")
+    for line in metrics.report_lines(baseline="baseline"):
+        print(f"  {line}")
+    if METRICS_PATH is not None:
+        metrics.to_json(METRICS_PATH)
+        metrics.write_prometheus(os.path.splitext(METRICS_PATH)[0] + ".prom")
+        print(f"  Metrics written to {METRICS_PATH}")
+    
     print("\n" + "="*70)
     print("CONCLUSION")
     print("="*70)
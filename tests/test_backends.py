@@ -0,0 +1,136 @@
+"""
+Tests for backends.py: how OpenAICompatibleBackend and HuggingFaceBackend
+turn failures into error completions.
+"""
+
+import email.utils
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backends import HuggingFaceBackend, OpenAICompatibleBackend, parse_retry_after
+
+REPLIES = {
+    "no-usage": (200, {"Content-Type": "application/json"},
+                 json.dumps({"choices": [{"message": {"content": "42"}}]})),
+    "not-json": (200, {"Content-Type": "text/html"}, "<html>Bad gateway</html>"),
+    "no-choices": (200, {"Content-Type": "application/json"}, json.dumps({"usage": {"total_tokens": 3}})),
+    "rate-limited": (429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, "slow down"),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        prompt = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["messages"][0]["content"]
+        status, headers, body = REPLIES[prompt]
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = OpenAICompatibleBackend(api_base=f"http://127.0.0.1:{server.server_port}/v1", max_retries=1,
+                                      retry_base_delay=0.01, timeout=5)
+    yield backend
+    backend.close()
+    server.shutdown()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert 50 < parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+
+
+def test_missing_usage_counts_as_zero_tokens(backend):
+    completion, = backend.generate(["no-usage"])
+    assert completion.error is None
+    assert completion.text == "42"
+    assert completion.total_tokens == 0
+
+
+def test_bad_replies_become_errors_without_aborting_the_batch(backend):
+    completions = backend.generate(["not-json", "no-choices", "rate-limited", "no-usage"])
+    assert "Malformed response" in completions[0].error
+    assert "Malformed response" in completions[1].error
+    assert completions[2].error.startswith("HTTP 429")
+    assert completions[2].retries == 1  # A past HTTP date means retry now
+    assert completions[3].text == "42"
+
+
+BAD_TOKEN = 7  # The stub model fails on any batch holding this token
+
+
+class StubTokenizer:
+    eos_token_id = 0
+    pad_token_id = 0
+    
+    def encode(self, text):
+        return [int(word) for word in text.split()]
+    
+    def decode(self, tokens, skip_special_tokens=True):
+        return " ".join(str(token) for token in tokens)
+
+
+class StubModel:
+    """Echoes each row's last token + 1; runs out of memory on BAD_TOKEN."""
+    
+    config = SimpleNamespace(n_positions=16)
+    
+    def __call__(self, input_ids, attention_mask=None, position_ids=None, past_key_values=None, use_cache=True):
+        import torch
+        
+        if (input_ids == BAD_TOKEN).any():
+            raise RuntimeError("CUDA out of memory")
+        logits = torch.nn.functional.one_hot(input_ids + 1, 32).float()
+        cache = [(torch.zeros(input_ids.shape[0], 1, input_ids.shape[1], 2),) * 2]
+        return SimpleNamespace(logits=logits, past_key_values=cache)
+
+
+def stub_backend(monkeypatch, load=None):
+    backend = HuggingFaceBackend(model_name="stub", max_new_tokens=1)
+    load = load or (lambda: (StubModel(), StubTokenizer(), "cpu", StubModel.config.n_positions))
+    monkeypatch.setattr(backend, "_load", load)
+    return backend
+
+
+def test_local_failed_batch_retries_rows_alone(monkeypatch):
+    pytest.importorskip("torch")
+    backend = stub_backend(monkeypatch)
+    completions = backend.generate(["1 2", f"3 {BAD_TOKEN}", "5"])
+    assert [c.text for c in completions] == ["3", "", "6"]
+    assert [c.error for c in completions] == [None, "RuntimeError: CUDA out of memory", None]
+    
+    completions = backend.generate_shared_prefix("1", [" 2", f" {BAD_TOKEN}", "", " 1" * 16, "2"])
+    assert completions[0].text == "3" and completions[0].prompt_tokens == 2
+    assert completions[1].error == "RuntimeError: CUDA out of memory"
+    assert "at least one token" in completions[2].error
+    assert "16-token context" in completions[3].error
+    # "1" + "2" encodes as [12], not [1, 2]: generated from the whole prompt
+    assert completions[4].text == "13" and completions[4].prompt_tokens == 1
+
+
+def test_local_load_failure_becomes_errors(monkeypatch):
+    def load():
+        raise OSError("stub is not a local folder or a Hub model")
+    
+    backend = stub_backend(monkeypatch, load)
+    for completions in (backend.generate(["1", "2"]), backend.generate_shared_prefix("1", ["2", "3"])):
+        assert [c.error for c in completions] == ["OSError: stub is not a local folder or a Hub model"] * 2
@@ -0,0 +1,74 @@
+"""
+Tests for grading.py: final-answer extraction and number normalisation.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from grading import first_number, grade, grade_batch, majority_vote
+
+
+@pytest.mark.parametrize("response, expected", [
+    # Worked conclusions without an answer marker: the final value, not the first
+    ("x = 4 - 3 = 1", "1"),
+    ("So 2x = 0.10 and x = 0.05.", "0.05"),
+    ("So I'm now in second place, and they drop to third.", "2"),
+    ("He finishes in second place.", "2"),
+    ("So 100 machines take 5 minutes.", "5"),
+    ("So the total is 1,000 dollars, not 900.", "1000"),
+    ("5 minutes. That is because each machine takes 5 minutes to make one widget.", "5"),
+    ("Each machine makes one widget in 5 minutes. So it takes 5 minutes, one widget each.", "5"),
+    # Without digits, number words still count
+    ("He ends up in second place, so one place behind the leader... the answer is second.", "2"),
+    # After an answer marker the first number is the answer
+    ("The answer is 5 cents (0.05)", "0.05"),
+    ("Answer: 1/2", "0.5"),
+    ("The answer is: $1,000.50", "1000.5"),
+    # A parenthesised explanation in the expected answer is ignored
+    ("The answer is 12.", "12 (all months have at least 28 days)"),
+])
+def test_final_answer(response, expected):
+    assert grade(response, expected)
+
+
+@pytest.mark.parametrize("response, expected", [
+    ("x = 4 - 3 = 1", "4"),
+    ("So 2x = 0.10 and x = 0.05.", "0.10"),
+    ("So 100 machines take 5 minutes.", "100"),
+    ("5 minutes. That is because each machine takes 5 minutes to make one widget.", "1"),
+    ("1.5 hours", "1 hour"),
+    ("15", "5"),
+])
+def test_wrong_answers_are_rejected(response, expected):
+    assert not grade(response, expected)
+
+
+@pytest.mark.parametrize("text, value", [
+    ("twenty-five", 25),
+    ("The answer is two hundred", 200),
+    ("two hundred and five", 205),
+    ("3 thousand dollars", 3000),
+    ("1.5 million", 1500000),
+    ("7.5e3", 7500),
+    ("2.5E-1", 0.25),
+    ("twenty-first", 21),
+    ("the first one", 1),
+    ("twenty twenty", 20),
+])
+def test_number_words_and_exponents(text, value):
+    assert first_number(text) == value
+
+
+def test_grade_batch_matches_grade():
+    responses = ["x = 4 - 3 = 1", "twenty-five", "The match", "The candle"]
+    expected = ["1", "25", "The match", "The match"]
+    assert grade_batch(responses, expected).tolist() == [grade(r, e) for r, e in zip(responses, expected)]
+
+
+def test_majority_vote_groups_equal_values():
+    winner, votes = majority_vote(["The answer is $0.05", "5 cents", "The answer is 0.10"])
+    assert winner == 0
+    assert max(votes.values()) == 2
@@ -0,0 +1,69 @@
+"""
+Tests for project3's monte_carlo.py: p-values, bootstrap coverage and sizing.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "project3-pause-token"))
+from monte_carlo import (EXACT_TEST_MAX_DISCORDANT, bootstrap_ci, detection_power, mcnemar_p_values,
+                         paired_test, riddles_needed, simulate_outcomes)
+
+
+def test_equal_discordant_counts_give_p_one():
+    assert mcnemar_p_values([40], [40])[0] == 1.0
+    assert mcnemar_p_values([3], [3])[0] == 1.0
+    assert mcnemar_p_values([0], [0])[0] == 1.0
+
+
+def test_p_values_are_probabilities_on_both_branches():
+    counts = np.arange(0, 2 * EXACT_TEST_MAX_DISCORDANT)
+    first, second = np.meshgrid(counts, counts)
+    p = mcnemar_p_values(first, second)
+    assert np.all((p > 0) & (p <= 1))
+    assert np.array_equal(p, p.T)  # Symmetric in the two strategies
+
+
+def test_p_values_fall_as_the_difference_grows():
+    p = mcnemar_p_values(np.full(60, 60), np.arange(60, 0, -1))  # n from 120 down to 61
+    assert np.all(np.diff(p) <= 1e-12)
+
+
+def test_paired_test_matches_counts():
+    first = np.array([True, True, True, False, False])
+    second = np.array([False, False, True, False, True])
+    difference, p = paired_test(first, second)
+    assert difference == pytest.approx(0.2)
+    assert p == pytest.approx(mcnemar_p_values(2, 1))
+
+
+def test_bootstrap_interval_covers_the_true_accuracy():
+    accuracies = [0.4, 0.7]
+    runs = simulate_outcomes(accuracies, n_riddles=200, n_trials=300, seed=1)
+    rng = np.random.default_rng(2)
+    covered = np.zeros(2)
+    covered_difference = 0
+    for trial in range(runs.shape[2]):
+        stats = bootstrap_ci(runs[:, :, trial], confidence=0.95, n_resamples=2000, seed=rng)
+        covered += (stats["low"] <= accuracies) & (np.array(accuracies) <= stats["high"])
+        covered_difference += stats["difference_low"][1, 0] <= 0.3 <= stats["difference_high"][1, 0]
+    coverage = covered / runs.shape[2]
+    assert np.all((coverage > 0.88) & (coverage < 0.99))
+    assert 0.88 < covered_difference / runs.shape[2] < 0.99
+
+
+def test_riddles_needed_shrinks_as_the_gap_grows():
+    needed = [riddles_needed(first, 0.4, seed=0) for first in (0.5, 0.6, 0.7, 0.9)]
+    assert all(a > b for a, b in zip(needed, needed[1:]))
+    assert riddles_needed(0.4, 0.4) is None
+    assert riddles_needed(0.4, 0.5) is None
+
+
+def test_riddles_needed_reaches_the_target_power():
+    n = riddles_needed(0.9, 0.4, power=0.8, seed=0)
+    assert detection_power(0.9, 0.4, n, seed=0) >= 0.8
+    assert detection_power(0.9, 0.4, n - 1, seed=0) < 0.8
@@ -0,0 +1,68 @@
+"""
+Tests for project1's thinking_cost_benchmark.py: streaming results and resume.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "project1-thinking-cost"))
+import thinking_cost_benchmark as benchmark
+from backends import Completion, MockBackend
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "RESULTS_DIR", str(tmp_path))
+    monkeypatch.setattr(benchmark, "TOKEN_COUNTING", "usage")
+    monkeypatch.setattr(benchmark, "SELF_CONSISTENCY_SAMPLES", 0)
+    monkeypatch.setattr(benchmark, "RESUME", True)
+
+
+def use_backend(monkeypatch, fail_on=()):
+    """Makes run_benchmark use the mock, failing the calls whose prompt contains a string in fail_on."""
+    def respond(prompt):
+        if any(text in prompt for text in fail_on):
+            return Completion("", error="HTTP 503: overloaded")
+        return benchmark.mock_completion(prompt)
+    monkeypatch.setattr(benchmark, "create_backend", lambda name=None: MockBackend(respond))
+
+
+def test_failed_calls_are_recorded_and_retried_on_resume(isolated, monkeypatch):
+    problems = benchmark.MATH_PROBLEMS[:2]
+    use_backend(monkeypatch, fail_on=[problems[1]["question"]])
+    first = benchmark.run_benchmark(problems)
+    assert first.failed == 2
+    assert first.totals["zero_shot"]["calls"] == 1
+    assert first.totals["cot"]["calls"] == 1
+    
+    path = first.path
+    records = list(benchmark.load_records(path))
+    assert sum(record["error"] is not None for record in records) == 2
+    assert benchmark.load_results(path)["question_ids"] == [problems[0]["id"]]
+    assert benchmark.RunningSummary.from_file(path).totals == first.totals
+    
+    use_backend(monkeypatch)
+    second = benchmark.run_benchmark(problems)
+    assert second.failed == 0
+    assert second.totals["zero_shot"]["calls"] == 2
+    assert second.totals["cot"]["calls"] == 2
+    assert len(list(benchmark.load_records(path))) == 6  # Only the failed calls were made again
+    assert benchmark.load_results(path)["question_ids"] == [problem["id"] for problem in problems]
+
+
+def test_cache_entries_are_separated_by_endpoint_and_token_limit(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    completion = Completion("5", prompt_tokens=10, completion_tokens=1)
+    mock_server = benchmark.ResponseCache(path, backend="openai", endpoint="http://127.0.0.1:8000/v1", model="m")
+    mock_server.put("prompt", completion)
+    assert mock_server.get("prompt")["text"] == "5"
+    mock_server.close()
+    
+    for other in ({"endpoint": "https://api.openai.com/v1"}, {"max_tokens": 64}):
+        settings = {"backend": "openai", "endpoint": "http://127.0.0.1:8000/v1", "model": "m", **other}
+        cache = benchmark.ResponseCache(path, **settings)
+        assert cache.get("prompt") is None
+        cache.close()